@@ -1,7 +1,7 @@
 import streamlit as st
-import pandas as pd
 import os
-from utility import *
+from utility import session_folder, run_executable, coverage, cancel_button
+from result_cache import get_cache
 
 st.set_page_config(
     page_title="MKM Input File Generator and Solver",
@@ -19,44 +19,29 @@ def main():
     uploaded_file = st.file_uploader("Upload Excel File", type="xlsx")
     
     if uploaded_file:
+        # pandas and openpyxl load with the first upload, not with the page
+        from workbook import load_mkm_workbook
+        from inp_file import inp_file_gen
+
         try:
-            data = pd.read_excel(uploaded_file)
+            mkm_workbook = load_mkm_workbook(uploaded_file)
             st.write("Data Loaded Successfully!")
         except Exception as e:
             st.error(f"Error Loading Data: {str(e)}")
             return
-        try:
-            data1 = pd.read_excel(uploaded_file, sheet_name="Reactions")
-            st.write("Reactions Loaded Successfully!")
-            df1 = data1
-            st.write("Reactions Preview:", df1.head())
-        except Exception as e:
-            st.error(f"Error reading Reactions sheet: {str(e)}")
-            return
-        
-        try:
-            data2 = pd.read_excel(uploaded_file, sheet_name="Local Environment")
-            st.write("Local Environment Loaded Successfully!")
-            df2 = data2
-            st.write("Local Environment Preview:", df2.head())
-        except Exception as e:
-            st.error(f"Error reading Local Environment sheet: {str(e)}")
-            return
-        
-        try:
-            data3 = pd.read_excel(uploaded_file, sheet_name="Input-Output Species")
-            st.write("Input-output Loaded Successfully!")
-            df3 = data3
-            st.write("Input-output Preview:", df3.head())
-        except Exception as e:
-            st.error(f"Error reading Input-output sheet: {str(e)}")
-            return
+
+        st.write("Reactions Preview:", mkm_workbook.reactions.head())
+        st.write("Local Environment Preview:", mkm_workbook.local_environment.head())
+        st.write("Input-output Preview:", mkm_workbook.species.head())
         
+        # Inputs and solver outputs of this browser session live in their own folder
+        run_folder = session_folder("single_run")
+
         # Generate Input File Button
         if st.button("Generate MKM Input"):
             try:
                 # Call the function to generate the input file
-                input_file_path = inp_file_gen(uploaded_file)
+                input_file_path = inp_file_gen(uploaded_file, run_folder)
                 st.success("Input file generated successfully!")
 
                 # After generating the file, allow the user to download it
@@ -70,13 +55,22 @@ def main():
             except Exception as e:
                 st.error(f"Error generating input file: {str(e)}")
 
-        input_file_path = "single_run/input_file.mkm"
+        input_file_path = os.path.join(run_folder, "input_file.mkm")
+        # Runs exceeding the wall-clock limit are killed; 0 disables the limit
+        timeout = st.number_input("Solver timeout (s, 0 = none)", min_value=0, value=0, step=60)
+        # The in-process solver handles small networks without starting mkmcxx
+        native = st.checkbox("Use the native Python solver (falls back to mkmcxx when it does not converge)")
         # Run Solver Button
         if st.button("Run Solver"):
-            result_message, success = run_executable(input_file_path)
+            if not os.path.exists(input_file_path):
+                st.error("Please generate the MKM input first.")
+                return
+            cancel = cancel_button("Cancel run", "solver_cancel")
+            result_message, success = run_executable(input_file_path, workdir=run_folder, cache=get_cache(),
+                                                     timeout=timeout or None, native=native, cancel=cancel)
             if success:
                 st.success(result_message)
-                coverage()
+                coverage(os.path.join(run_folder, "run", "range", "coverage.dat"))
             else:
                 st.error(result_message)
 
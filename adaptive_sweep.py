@@ -0,0 +1,134 @@
+import os
+import math
+from collections import namedtuple
+
+from sweep_results import read_dat
+
+# Potentials are rounded to this many decimals so they give stable folder names
+V_DIGITS = 4
+
+# Rates below this magnitude are treated as zero when comparing in log scale
+RATE_FLOOR = 1e-30
+
+# What the refinement compares between neighbouring points
+PointSignal = namedtuple("PointSignal", ["coverage", "rates"])
+
+
+def coarse_grid(V_min, V_max, step):
+    """
+    Evenly spaced potentials from V_min to V_max, both included, about `step` apart.
+
+    Returns:
+    list: Rounded potentials.
+    """
+    if V_max < V_min:
+        V_min, V_max = V_max, V_min
+    n = max(1, int(round((V_max - V_min) / step)))
+    return [round(V_min + i * (V_max - V_min) / n, V_DIGITS) for i in range(n + 1)]
+
+
+def read_signal(folder):
+    """
+    Reads the final adsorbate coverages and gas production rates of a finished run.
+
+    Coverages come from run/range/coverage.dat, rates from run/range/derivatives.dat
+    when the solver wrote it.
+
+    Args:
+    folder (str): Point folder holding the run/ tree.
+
+    Returns:
+    PointSignal: Coverage and rate by species name, or None when no coverage.dat exists.
+    """
+    range_folder = os.path.join(folder, "run", "range")
+    coverage_path = os.path.join(range_folder, "coverage.dat")
+    if not os.path.exists(coverage_path):
+        return None
+    names, values = read_dat(coverage_path)
+    if not len(values):
+        return None
+    coverage = {name: values[-1, c] for c, name in enumerate(names) if '*' in name}
+
+    rates = {}
+    derivatives_path = os.path.join(range_folder, "derivatives.dat")
+    if os.path.exists(derivatives_path):
+        names, values = read_dat(derivatives_path)
+        if len(values):
+            rates = {name: values[-1, c] for c, name in enumerate(names) if '*' not in name}
+    return PointSignal(coverage, rates)
+
+
+def _log_rate(rate):
+    return math.log10(max(abs(rate), RATE_FLOOR))
+
+
+def signal_change(a, b):
+    """
+    Largest change between two points.
+
+    Returns:
+    tuple: (largest coverage change, largest rate change in decades)
+    """
+    coverage = max((abs(a.coverage.get(name, 0.0) - b.coverage.get(name, 0.0))
+                    for name in a.coverage.keys() | b.coverage.keys()), default=0.0)
+    rates = max((abs(_log_rate(a.rates.get(name, 0.0)) - _log_rate(b.rates.get(name, 0.0)))
+                 for name in a.rates.keys() | b.rates.keys()), default=0.0)
+    return coverage, rates
+
+
+class AdaptiveGrid:
+    """
+    Potential grid of one pH that is refined where the solution changes.
+
+    The grid starts from a coarse set of potentials. After each round of
+    runs, every interval whose end points differ by more than `tolerance`
+    in any adsorbate coverage, or by more than `rate_tolerance` decades in
+    any gas rate, is bisected, as long as the new spacing stays at or above
+    `min_step`. Intervals touching a failed run are not refined.
+    """
+
+    def __init__(self, V_min, V_max, coarse_step, min_step, tolerance, rate_tolerance=1.0):
+        self.min_step = min_step
+        self.tolerance = tolerance
+        self.rate_tolerance = rate_tolerance
+        self.signals = {}
+        self.pending = coarse_grid(V_min, V_max, coarse_step)
+        self.rounds = 0
+
+    def add(self, V, signal):
+        """Records the result of one run; signal is None for a failed run."""
+        self.signals[round(V, V_DIGITS)] = signal
+
+    def refine(self):
+        """
+        Picks the potentials of the next round from the results recorded so far.
+
+        Returns:
+        list: New potentials to run; empty once the grid has converged.
+        """
+        self.rounds += 1
+        V_done = sorted(self.signals)
+        pending = []
+        for left, right in zip(V_done, V_done[1:]):
+            a, b = self.signals[left], self.signals[right]
+            if a is None or b is None or (right - left) / 2 < self.min_step - 1e-12:
+                continue
+            coverage, rates = signal_change(a, b)
+            if coverage > self.tolerance or rates > self.rate_tolerance:
+                midpoint = round((left + right) / 2, V_DIGITS)
+                if midpoint not in self.signals:
+                    pending.append(midpoint)
+        self.pending = pending
+        return pending
+
+    @property
+    def potentials(self):
+        """Every potential run so far, sorted."""
+        return sorted(self.signals)
+
+    def uniform_runs(self):
+        """Number of runs a uniform grid at min_step over the same range would need."""
+        V_done = self.potentials
+        if len(V_done) < 2:
+            return len(V_done)
+        return int(round((V_done[-1] - V_done[0]) / self.min_step)) + 1
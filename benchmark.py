@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import time
+import runpy
+import shutil
+import tempfile
+import argparse
+import platform
+import tracemalloc
+import subprocess
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Bundled workbooks every stage runs on
+WORKBOOKS = ["inp_file.xlsx", "test.xlsx"]
+
+# Grid shapes as (number of pH values, number of potentials): 1, 10, 100 and 600 points
+GRIDS = [(1, 1), (2, 5), (4, 25), (12, 50)]
+
+
+def grid(n_pH, n_V):
+    """pH and potential values of an n_pH x n_V benchmark grid."""
+    return np.round(np.linspace(1, 13, n_pH), 3).tolist(), np.round(np.linspace(-1.5, 0.5, n_V), 3).tolist()
+
+
+def stand_in_solver(mkm_workbook, folder, pH, V):
+    """
+    Writes the run/range/coverage.dat mkmcxx would write for one point, without running it.
+
+    The values are a smooth function of pH and V, so the plots have something to draw.
+    """
+    network = mkm_workbook.network
+    surface = [name for name in network.species if not network.is_gas(name)]
+    row = [1.0 if network.is_gas(name) else
+           (1 + np.sin(pH + k * V)) / (2 * len(surface)) for k, name in enumerate(network.species)]
+    os.makedirs(os.path.join(folder, "run", "range"), exist_ok=True)
+    with open(os.path.join(folder, "run", "range", "coverage.dat"), "w") as f:
+        f.write("\t".join(network.species) + "\n")
+        f.write("\t".join(f"{value:.12e}" for value in row) + "\n")
+
+
+def clear_workbook_cache():
+    """Drops the parsed workbooks and compiled formulas, so the next stage starts cold."""
+    import workbook
+    with workbook._lock:
+        workbook._workbooks.clear()
+        workbook._compiled_columns.clear()
+
+
+def measure(run, memory=True):
+    """
+    Times one stage and, when memory is set, repeats it under tracemalloc for its peak memory.
+
+    tracemalloc slows allocation-heavy code down, so the time comes from an untraced run.
+
+    Args:
+    run (callable): The stage; must be safe to call twice.
+    memory (bool): Also measure the peak of the Python allocations.
+
+    Returns:
+    tuple: (seconds, peak bytes or None)
+    """
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+    if not memory:
+        return seconds, None
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def stages(path, pH_list, V_list, root, modify_excel):
+    """
+    The benchmarked stages for one workbook and grid, in pipeline order.
+
+    Args:
+    path (str): Workbook path.
+    pH_list (list): pH values of the grid.
+    V_list (list): Potentials of the grid.
+    root (str): Sweep folder; points are written to root/pH_x/V_y.
+    modify_excel (callable): modify_excel() of the multiple-runs page.
+
+    Returns:
+    list: (stage name, callable) pairs.
+    """
+    import matplotlib.pyplot as plt
+    from inp_file import inp_file_gen
+    from inp_file_multiple2 import compile_formulas, evaluate_grid, inp_file_gen_multiple
+    from sweep_results import SweepResults
+    from utility import point_folder, point_coverage_path, get_val, coverage_V, plot_coverage_data
+    from workbook import load_mkm_workbook
+
+    points = [(pH, V) for pH in pH_list for V in V_list]
+
+    def load_cold():
+        clear_workbook_cache()
+        load_mkm_workbook(path)
+
+    def compile_cold():
+        # Includes parsing the workbook, as for the first sweep after an upload
+        clear_workbook_cache()
+        load_mkm_workbook(path)
+        compile_formulas(path)
+
+    def generate_single():
+        inp_file_gen(path, os.path.join(root, "single_run"))
+
+    def generate_points():
+        for pH, V in points:
+            folder = point_folder(root, pH, V)
+            os.makedirs(folder, exist_ok=True)
+            inp_file_gen_multiple(path, folder, pH=pH, V=V)
+
+    def modify_workbooks():
+        for pH, V in points:
+            modify_excel(pH, V, path)
+
+    def solve_points():
+        mkm_workbook = load_mkm_workbook(path)
+        for pH, V in points:
+            stand_in_solver(mkm_workbook, point_folder(root, pH, V), pH, V)
+
+    def read_values():
+        for pH, V in points:
+            get_val(point_coverage_path(root, pH, V))
+
+    def read_coverages():
+        for pH, V in points:
+            coverage_V(root, pH, V)
+
+    def collect():
+        SweepResults.collect(pH_list, V_list, lambda pH, V: point_coverage_path(root, pH, V))
+
+    def plot():
+        plot_coverage_data(pH_list, V_list, root=root)
+        plt.close("all")
+
+    return [
+        ("load_workbook", load_cold),
+        ("compile_formulas", compile_cold),
+        ("inp_file_gen", generate_single),
+        ("evaluate_grid", lambda: evaluate_grid(path, pH_list, V_list)),
+        ("inp_file_gen_multiple", generate_points),
+        ("modify_excel", modify_workbooks),
+        ("stand_in_solver", solve_points),
+        ("get_val", read_values),
+        ("coverage_V", read_coverages),
+        ("collect_results", collect),
+        ("plot_coverage_data", plot),
+    ]
+
+
+def environment():
+    """Versions and machine the measurements were taken on."""
+    import pandas
+    import openpyxl
+    import matplotlib
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "numpy": np.__version__, "pandas": pandas.__version__,
+            "openpyxl": openpyxl.__version__, "matplotlib": matplotlib.__version__,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+
+def run_benchmarks(workbooks=WORKBOOKS, grids=GRIDS, memory=True, log=print):
+    """
+    Runs every stage on every workbook and grid in a scratch folder.
+
+    Args:
+    workbooks (list): Workbook paths, relative to this folder.
+    grids (list): (number of pH values, number of potentials) pairs.
+    memory (bool): Also measure the peak memory of every stage.
+    log (callable): Called with one line per measured stage.
+
+    Returns:
+    list: One dict per (workbook, grid, stage) with seconds, per_point and peak_bytes.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import streamlit.logger
+
+    # modify_excel() lives in the page; running it under another name skips main()
+    page = runpy.run_path(os.path.join(ROOT, "pages", "Multiple runs.py"), run_name="benchmark")
+
+    # Without a Streamlit server every st.* call is a no-op that would log a warning
+    streamlit.logger.set_log_level("error")
+
+    records = []
+    scratch = tempfile.mkdtemp(prefix="mkm-benchmark-")
+    try:
+        for name in workbooks:
+            path = os.path.join(ROOT, name)
+            for n_pH, n_V in grids:
+                pH_list, V_list = grid(n_pH, n_V)
+                root = os.path.join(scratch, f"{os.path.splitext(name)[0]}_{n_pH}x{n_V}")
+                for stage, run in stages(path, pH_list, V_list, root, page["modify_excel"]):
+                    seconds, peak = measure(run, memory)
+                    points = n_pH * n_V
+                    records.append({"workbook": name, "points": points, "pH": n_pH, "V": n_V, "stage": stage,
+                                    "seconds": seconds, "per_point": seconds / points, "peak_bytes": peak})
+                    log(f"{name:15s} {points:4d} points  {stage:22s} {seconds:9.4f} s"
+                        + (f"  {peak / 1024 / 1024:8.2f} MB" if peak is not None else ""))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Times input generation and result handling without the UI.")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file the measurements go to")
+    parser.add_argument("--workbook", action="append", help="Workbook to run on (repeatable), default: all bundled")
+    parser.add_argument("--max-points", type=int, default=None, help="Skip grids larger than this")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass of every stage")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, ROOT)
+    grids = [shape for shape in GRIDS if args.max_points is None or shape[0] * shape[1] <= args.max_points]
+    records = run_benchmarks(args.workbook or WORKBOOKS, grids, not args.no_memory)
+    with open(args.output, "w") as f:
+        json.dump({"environment": environment(), "results": records}, f, indent=2)
+    print(f"Wrote {len(records)} measurements to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
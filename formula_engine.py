@@ -0,0 +1,507 @@
+import re
+import hashlib
+import numpy as np
+from openpyxl.utils.cell import get_column_letter, coordinate_to_tuple
+
+# Tokens of the Excel formula subset used by the MKM workbooks; a name directly
+# followed by '(' is a function, so LOG10( is not read as a reference to cell LOG10
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+      | (?P<function>[A-Za-z][A-Za-z0-9.]*)(?=\s*\()
+      | (?P<ref>(?:(?:'(?P<qsheet>(?:[^']|'')+)'|(?P<sheet>[A-Za-z_][\w.]*))!)?
+               \$?(?P<col>[A-Za-z]{1,3})\$?(?P<row>\d+))
+      | (?P<op>[-+*/^(),:])
+    )""", re.VERBOSE)
+
+
+class FormulaError(ValueError):
+    """Raised when a cell formula cannot be parsed or compiled."""
+
+
+def tokenize(formula):
+    """
+    Splits an Excel formula into tokens.
+
+    Args:
+    formula (str): Formula text, with or without the leading '='.
+
+    Returns:
+    list: (kind, value) tuples, kind being 'number', 'function', 'ref' or 'op'.
+    """
+    text = formula.strip()
+    if text.startswith('='):
+        text = text[1:]
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        if text[pos:].strip() == '':
+            break
+        match = _TOKEN_RE.match(text, pos)
+        if not match:
+            raise FormulaError(f"Unexpected text '{text[pos:]}' in formula '{formula}'")
+        if match.group('number'):
+            tokens.append(('number', float(match.group('number'))))
+        elif match.group('function'):
+            tokens.append(('function', match.group('function').upper()))
+        elif match.group('ref'):
+            sheet = match.group('qsheet') or match.group('sheet')
+            if sheet is not None:
+                sheet = sheet.replace("''", "'")
+            tokens.append(('ref', (sheet, match.group('col').upper() + match.group('row'))))
+        else:
+            tokens.append(('op', match.group('op')))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser following Excel operator precedence (unary minus binds tighter than ^)."""
+
+    def __init__(self, tokens, formula):
+        self.tokens = tokens
+        self.formula = formula
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, value=None):
+        kind, token = self.peek()
+        if kind is None or (value is not None and token != value):
+            raise FormulaError(f"Expected '{value or 'operand'}' in formula '{self.formula}'")
+        self.pos += 1
+        return kind, token
+
+    def parse(self):
+        node = self.expression()
+        if self.pos != len(self.tokens):
+            raise FormulaError(f"Unexpected '{self.peek()[1]}' in formula '{self.formula}'")
+        return node
+
+    def expression(self):
+        node = self.term()
+        while self.peek() in (('op', '+'), ('op', '-')):
+            op = self.take()[1]
+            node = ('binary', op, node, self.term())
+        return node
+
+    def term(self):
+        node = self.power()
+        while self.peek() in (('op', '*'), ('op', '/')):
+            op = self.take()[1]
+            node = ('binary', op, node, self.power())
+        return node
+
+    def power(self):
+        node = self.unary()
+        while self.peek() == ('op', '^'):
+            self.take()
+            node = ('binary', '^', node, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek() == ('op', '-'):
+            self.take()
+            return ('negate', self.unary())
+        if self.peek() == ('op', '+'):
+            self.take()
+            return self.unary()
+        return self.primary()
+
+    def primary(self):
+        kind, token = self.take()
+        if kind == 'number':
+            return ('number', token)
+        if kind == 'ref':
+            if self.peek() == ('op', ':'):
+                # A range such as A2:A5; only valid as a function argument
+                self.take()
+                end_kind, end = self.take()
+                if end_kind != 'ref' or end[0] not in (None, token[0]):
+                    raise FormulaError(f"Invalid range in formula '{self.formula}'")
+                return ('range', token[0], token[1], end[1])
+            return ('ref', token)
+        if kind == 'function':
+            self.take('(')
+            args = []
+            if self.peek() != ('op', ')'):
+                args.append(self.expression())
+                while self.peek() == ('op', ','):
+                    self.take()
+                    args.append(self.expression())
+            self.take(')')
+            return ('call', token, args)
+        if token == '(':
+            node = self.expression()
+            self.take(')')
+            return node
+        raise FormulaError(f"Unexpected '{token}' in formula '{self.formula}'")
+
+
+def parse_formula(formula):
+    """
+    Parses an Excel formula into a small expression tree.
+
+    Args:
+    formula (str): Formula text.
+
+    Returns:
+    tuple: Expression tree of ('number', x), ('ref', (sheet, cell)), ('negate', node),
+    ('binary', op, left, right), ('call', name, [args]) and, as function arguments,
+    ('range', sheet, first cell, last cell) nodes.
+    """
+    return _Parser(tokenize(formula), formula).parse()
+
+
+# Supported worksheet functions: name -> (minimum, maximum argument count, NumPy template).
+# SUM takes any number of arguments, ranges included.
+FUNCTIONS = {
+    'LN': (1, 1, "np.log({0})"),
+    'EXP': (1, 1, "np.exp({0})"),
+    'LOG10': (1, 1, "np.log10({0})"),
+    'LOG': (1, 2, None),
+    'SQRT': (1, 1, "np.sqrt({0})"),
+    'ABS': (1, 1, "np.abs({0})"),
+    'POWER': (2, 2, "np.power({0}, {1})"),
+    'SUM': (1, None, None),
+    'PI': (0, 0, "np.pi"),
+}
+
+
+def range_cells(sheet, first, last):
+    """
+    Cells of a rectangular range, row by row.
+
+    Args:
+    sheet (str): Sheet name, or None for the formula's own sheet.
+    first (str): Top-left corner, e.g. 'A2'.
+    last (str): Bottom-right corner, e.g. 'B5'.
+
+    Returns:
+    list: (sheet, coordinate) tuples.
+    """
+    (min_col, min_row), (max_col, max_row) = (coordinate_to_tuple(cell)[::-1] for cell in (first, last))
+    return [(sheet, f"{get_column_letter(column)}{row}")
+            for row in range(min(min_row, max_row), max(min_row, max_row) + 1)
+            for column in range(min(min_col, max_col), max(min_col, max_col) + 1)]
+
+
+def find_column(sheet, header):
+    """
+    Finds the column letter of a header in the first row of a worksheet.
+
+    Args:
+    sheet: openpyxl worksheet.
+    header (str): Header text.
+
+    Returns:
+    str: Column letter, e.g. 'B'.
+    """
+    for cell in sheet[1]:
+        if cell.value == header:
+            return get_column_letter(cell.column)
+    raise FormulaError(f"Column '{header}' not found in sheet '{sheet.title}'.")
+
+
+def last_row(sheet):
+    """Last row holding any value, mirroring how pandas trims trailing empty rows."""
+    last = 1
+    for row in sheet.iter_rows(min_row=2):
+        if any(cell.value is not None for cell in row):
+            last = row[0].row
+    return last
+
+
+# Stages of the compiled code, by the inputs their cells depend on
+STAGES = {frozenset(): '_constants', frozenset({'pH'}): '_pH_stage', frozenset({'V'}): '_V_stage',
+          frozenset({'pH', 'V'}): '_pH_V_stage'}
+
+
+class CompiledFormulas:
+    """
+    Vectorized evaluator for a set of workbook cells as a function of pH and V.
+
+    The cells form a dependency DAG that is split by the inputs each cell
+    depends on. Cells depending on neither input are folded into constants
+    at compile time; the pH-only and V-only stages are recomputed only when
+    their input changes; only cells depending on both are evaluated for
+    every new (pH, V). Calling it with scalars or NumPy arrays returns an
+    array of shape (number of cells, *broadcast shape of pH and V).
+    """
+
+    def __init__(self, cells, source, constants, inputs_used):
+        self.cells = cells
+        self.source = source
+        # Inputs ('pH', 'V') each cell depends on
+        self.inputs_used = inputs_used
+        namespace = {'np': np, 'K': constants}
+        exec(compile(source, '<workbook formulas>', 'exec'), namespace)
+        # Constant folding: input-free cells become globals of the other stages
+        namespace.update(namespace['_constants']())
+        self._pH_stage = namespace['_pH_stage']
+        self._V_stage = namespace['_V_stage']
+        self._function = namespace['_evaluate']
+        # Last input and outputs of the pH-only and V-only stages
+        self._memo = {}
+
+    def _memoized(self, name, stage, value):
+        key = (value.shape, value.tobytes())
+        last = self._memo.get(name)
+        if last is None or last[0] != key:
+            last = (key, stage(value))
+            self._memo[name] = last
+        return last[1]
+
+    def __call__(self, pH, V):
+        pH = np.asarray(pH, dtype=float)
+        V = np.asarray(V, dtype=float)
+        shape = np.broadcast(pH, V).shape
+        values = self._function(pH, V, self._memoized('pH', self._pH_stage, pH),
+                                self._memoized('V', self._V_stage, V))
+        if not values:
+            return np.empty((0,) + shape)
+        if not shape:
+            # One point: every value is a scalar already
+            return np.array(values, dtype=float)
+        return np.stack([np.broadcast_to(value, shape) for value in values])
+
+    def grid(self, pH_list, V_list):
+        """
+        Evaluates every cell over a full pH x V grid in one pass.
+
+        Args:
+        pH_list (list): pH values.
+        V_list (list): Potential values.
+
+        Returns:
+        np.ndarray: Values of shape (number of cells, len(pH_list), len(V_list)).
+        """
+        # Open grid: pH-only cells are computed once per pH and V-only cells once per V
+        pH = np.asarray(pH_list, dtype=float)[:, None]
+        V = np.asarray(V_list, dtype=float)[None, :]
+        return self(pH, V)
+
+
+class FormulaEngine:
+    """
+    Compiles the formulas of an MKM workbook into NumPy code over (pH, V).
+
+    The pH and V cells of the 'Local Environment' sheet are the inputs of the
+    compiled code; every other cell is either a constant or a formula that is
+    parsed once and inlined.
+    """
+
+    def __init__(self, workbook, environment_sheet='Local Environment'):
+        self.workbook = workbook
+        environment = workbook[environment_sheet]
+        self.inputs = {
+            (environment_sheet, find_column(environment, 'pH') + '2'): 'pH',
+            (environment_sheet, find_column(environment, 'V') + '2'): 'V',
+        }
+        self._trees = {}
+
+    def column_cells(self, sheet_name, header):
+        """
+        Lists the cells below a header, down to the last used row of the sheet.
+
+        Args:
+        sheet_name (str): Worksheet name.
+        header (str): Column header.
+
+        Returns:
+        list: (sheet, coordinate) tuples.
+        """
+        sheet = self.workbook[sheet_name]
+        column = find_column(sheet, header)
+        return [(sheet_name, f"{column}{row}") for row in range(2, last_row(sheet) + 1)]
+
+    def _tree(self, key):
+        if key not in self._trees:
+            sheet, coordinate = key
+            value = self.workbook[sheet][coordinate].value
+            if isinstance(value, str) and value.startswith('='):
+                self._trees[key] = parse_formula(value)
+            elif value is None or isinstance(value, (int, float)):
+                # Blank cells count as zero, like in Excel
+                self._trees[key] = ('number', float(value or 0))
+            else:
+                raise FormulaError(f"Cell {sheet}!{coordinate} holds text '{value}', not a number.")
+        return self._trees[key]
+
+    def compile(self, cells):
+        """
+        Compiles the given cells into a single vectorized function.
+
+        Args:
+        cells (list): (sheet, coordinate) tuples to evaluate.
+
+        Returns:
+        CompiledFormulas: Evaluator for the cells.
+        """
+        names = dict(self.inputs)
+        # Inputs (pH, V) each compiled variable depends on
+        depends = {name: frozenset({name}) for name in self.inputs.values()}
+        constants = []
+        lines = []
+        visiting = set()
+
+        def hoist(parts):
+            # Composite operands whose inputs differ from the whole expression's move into
+            # their own stage, so e.g. a constant SUM inside a V-dependent cell runs once
+            used = frozenset().union(*(part_used for _, part_used, _ in parts))
+            expressions = []
+            for expression, part_used, composite in parts:
+                if composite and part_used != used:
+                    name = f"c{len(lines)}"
+                    lines.append((name, expression, STAGES[part_used]))
+                    expression = name
+                expressions.append(expression)
+            return expressions, used
+
+        def emit(node, sheet):
+            # Returns (expression, inputs it depends on, whether it is more than a name)
+            kind = node[0]
+            if kind == 'number':
+                constants.append(np.float64(node[1]))
+                return f"K[{len(constants) - 1}]", frozenset(), False
+            if kind == 'ref':
+                ref_sheet, coordinate = node[1]
+                name = visit((ref_sheet or sheet, coordinate))
+                return name, frozenset(depends[name]), False
+            if kind == 'negate':
+                (operand,), used = hoist([emit(node[1], sheet)])
+                return f"(-{operand})", used, True
+            if kind == 'range':
+                raise FormulaError(f"A range ({node[2]}:{node[3]}) can only be a function argument.")
+            if kind == 'call':
+                return call(node[1], node[2], sheet)
+            (left, right), used = hoist([emit(node[2], sheet), emit(node[3], sheet)])
+            if node[1] == '^':
+                return f"np.power({left}, {right})", used, True
+            return f"({left} {node[1]} {right})", used, True
+
+        def call(name, args, sheet):
+            if name not in FUNCTIONS:
+                raise FormulaError(f"Function {name}() is not supported.")
+            low, high, template = FUNCTIONS[name]
+            if len(args) < low or (high is not None and len(args) > high):
+                raise FormulaError(f"Wrong number of arguments for {name}().")
+            if name == 'SUM':
+                parts = []
+                for arg in args:
+                    if arg[0] == 'range':
+                        parts += [emit(('ref', cell), sheet) for cell in range_cells(*arg[1:])]
+                    else:
+                        parts.append(emit(arg, sheet))
+                terms, used = hoist(parts)
+                # A flat tuple, so long ranges do not nest the generated expression
+                return f"sum(({''.join(term + ', ' for term in terms)}))", used, True
+            values, used = hoist([emit(arg, sheet) for arg in args])
+            if name == 'LOG':
+                # Excel's LOG defaults to base 10
+                if len(values) == 1:
+                    return f"np.log10({values[0]})", used, True
+                return f"(np.log({values[0]}) / np.log({values[1]}))", used, True
+            return template.format(*values), used, True
+
+        def visit(key):
+            if key in names:
+                return names[key]
+            if key in visiting:
+                raise FormulaError(f"Circular reference through {key[0]}!{key[1]}")
+            if key[0] not in self.workbook.sheetnames:
+                raise FormulaError(f"Sheet '{key[0]}' not found.")
+            visiting.add(key)
+            expression, used, _ = emit(self._tree(key), key[0])
+            visiting.discard(key)
+            names[key] = f"c{len(lines)}"
+            depends[names[key]] = used
+            lines.append((names[key], expression, STAGES[used]))
+            return names[key]
+
+        results = [visit(tuple(cell)) for cell in cells]
+
+        # One function per stage. Constant cells are evaluated once and read as globals;
+        # _evaluate unpacks the pH-only and V-only stage outputs, computes the cells that
+        # depend on both inputs and returns the requested cells.
+        stages = {stage: [name for name, _, line_stage in lines if line_stage == stage] for stage in STAGES.values()}
+
+        def function(name, signature, stage, unpack=(), returned=None):
+            body = [f"    {', '.join(stages[source])}, = {source}" for source in unpack if stages[source]]
+            body += [f"    {name} = {expression}" for name, expression, line_stage in lines if line_stage == stage]
+            if returned is None:
+                returned = "(" + "".join(f"{name}, " for name in stages[stage]) + ")"
+            return f"def {name}({signature}):\n" + "\n".join(body + [f"    return {returned}"]) + "\n\n"
+
+        source = (function('_constants', "", '_constants',
+                           returned="{" + "".join(f"'{name}': {name}, " for name in stages['_constants']) + "}")
+                  + function('_pH_stage', "pH", '_pH_stage')
+                  + function('_V_stage', "V", '_V_stage')
+                  + function('_evaluate', "pH, V, _pH_stage, _V_stage", '_pH_V_stage', ('_pH_stage', '_V_stage'),
+                             "(" + "".join(f"{name}, " for name in results) + ")"))
+        return CompiledFormulas(list(cells), source, constants, [frozenset(depends[name]) for name in results])
+
+    def layout_key(self):
+        """
+        Hash of every cell except the pH/V inputs.
+
+        Workbooks that only differ in pH and V share the same key, so their
+        compiled formulas can be reused.
+
+        Returns:
+        str: Hex digest.
+        """
+        digest = hashlib.sha256()
+        for sheet in self.workbook.worksheets:
+            for row in sheet.iter_rows():
+                for cell in row:
+                    if cell.value is not None and (sheet.title, cell.coordinate) not in self.inputs:
+                        digest.update(repr((sheet.title, cell.coordinate, cell.value)).encode())
+        return digest.hexdigest()
+
+    def compile_columns(self, columns):
+        """
+        Compiles whole columns into a single vectorized function.
+
+        Args:
+        columns (list): (sheet, header) tuples.
+
+        Returns:
+        CompiledColumns: Evaluator returning one array per column.
+        """
+        cells = []
+        slices = {}
+        for sheet_name, header in columns:
+            column_cells = self.column_cells(sheet_name, header)
+            slices[header] = slice(len(cells), len(cells) + len(column_cells))
+            cells += column_cells
+        return CompiledColumns(self.compile(cells), slices)
+
+
+class CompiledColumns:
+    """Splits the output of CompiledFormulas back into the columns it was compiled from."""
+
+    def __init__(self, compiled, slices):
+        self.compiled = compiled
+        self.slices = slices
+
+    def __call__(self, pH, V):
+        """
+        Evaluates the columns at one (pH, V) point or broadcast arrays of them.
+
+        Returns:
+        dict: Column header -> array of shape (rows, *broadcast shape).
+        """
+        values = self.compiled(pH, V)
+        return {header: values[rows] for header, rows in self.slices.items()}
+
+    def grid(self, pH_list, V_list):
+        """
+        Evaluates the columns over a full pH x V grid in one pass.
+
+        Returns:
+        dict: Column header -> array of shape (rows, len(pH_list), len(V_list)).
+        """
+        values = self.compiled.grid(pH_list, V_list)
+        return {header: values[rows] for header, rows in self.slices.items()}
@@ -0,0 +1,96 @@
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+
+# Seconds every page may spend importing on top of streamlit itself, in a fresh interpreter.
+# The containers scale to zero, so this is paid by the first visitor after every cold start.
+PAGE_BUDGETS = {
+    "Homepage.py": 0.3,
+    os.path.join("pages", "Multiple runs.py"): 0.3,
+}
+
+# Libraries no page may import before a workbook is uploaded
+HEAVY = ("numpy", "pandas", "scipy", "matplotlib", "openpyxl", "sympy", "xlwings")
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+# Runs one page without calling its main(); prints the timing as the last stdout line
+_PROBE = """
+import sys, time, json, runpy
+import streamlit
+start = time.perf_counter()
+runpy.run_path(sys.argv[1], run_name="import_audit")
+print(json.dumps({"seconds": time.perf_counter() - start, "modules": sorted(sys.modules)}))
+"""
+
+
+def audit_page(page, root=None):
+    """
+    Imports one page in a fresh interpreter under `python -X importtime`.
+
+    Args:
+    page (str): Page script, relative to root.
+    root (str): Folder of the app, defaults to the folder of this file.
+
+    Returns:
+    dict: seconds (import time beyond streamlit), heavy (HEAVY libraries loaded) and
+        slowest ((name, cumulative seconds) of the ten slowest top-level imports).
+    """
+    root = root or os.path.dirname(os.path.abspath(__file__))
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", _PROBE, page],
+                               cwd=root, capture_output=True, text=True, check=False)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {page} failed:\n{completed.stderr[-2000:]}")
+    probe = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    # Top-level packages imported by the page, i.e. reported after streamlit finished
+    # importing; their cumulative time includes everything they pulled in
+    cumulative, page_started = {}, False
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match or "." in match.group(4):
+            continue
+        if page_started:
+            cumulative[match.group(4)] = int(match.group(2)) / 1e6
+        page_started = page_started or match.group(4) == "streamlit"
+    slowest = sorted(cumulative.items(), key=lambda item: -item[1])[:10]
+
+    loaded = {name.split(".")[0] for name in probe["modules"]}
+    return {"seconds": probe["seconds"], "heavy": [name for name in HEAVY if name in loaded],
+            "slowest": slowest}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measures the cold-start import time of every page.")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiplies every budget, e.g. for a slower machine")
+    parser.add_argument("--json", action="store_true", help="Print the measurements as JSON")
+    args = parser.parse_args(argv)
+
+    report, over_budget = {}, []
+    for page, budget in PAGE_BUDGETS.items():
+        result = audit_page(page)
+        report[page] = dict(result, budget=budget * args.scale)
+        if result["seconds"] > budget * args.scale:
+            over_budget.append(f"{page}: {result['seconds']:.2f} s > {budget * args.scale:.2f} s")
+        if result["heavy"]:
+            over_budget.append(f"{page} imports {', '.join(result['heavy'])} at startup")
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for page, result in report.items():
+            print(f"{page}: {result['seconds']:.3f} s (budget {result['budget']:.2f} s)")
+            print(f"  heavy libraries loaded: {', '.join(result['heavy']) or 'none'}")
+            for name, seconds in result["slowest"]:
+                print(f"  {seconds:8.3f} s  {name}")
+    for problem in over_budget:
+        print(f"OVER BUDGET: {problem}", file=sys.stderr)
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,171 +1,183 @@
 import os
-import streamlit as st
-import pandas as pd
 import numpy as np
-from openpyxl import load_workbook
-from sympy import sympify, symbols
+from workbook import load_mkm_workbook
+from mkm_writer import runs_line
+from sweep_results import SweepResults, warm_start_activities
+from native_solver import solve_batch
 from mkm_parameters import *
 
-def evaluate_excel_formula(formula, context, sheet_data):
+# Formula columns that feed the .mkm file
+FORMULA_COLUMNS = [
+    ('Input-Output Species', 'Input MKMCXX'),
+    ('Reactions', 'G_f'),
+    ('Reactions', 'G_b'),
+]
+
+def compile_formulas(uploaded_file):
     """
-    Evaluates an Excel-style formula by replacing references with actual values.
-    
+    Compiles the G_f, G_b and Input MKMCXX formulas of a workbook into a vectorized function of (pH, V).
+
+    Workbooks that only differ in their pH and V cells, like the per-point
+    copies of one upload, share a single compilation.
+
     Args:
-    formula (str): The formula to evaluate.
-    context (dict): A dictionary for variable substitution.
-    sheet_data (dict): Dictionary of sheet names to DataFrame mappings.
-    
+    uploaded_file (str or file): Excel workbook.
+
     Returns:
-    float: The evaluated result.
+    CompiledColumns: Evaluator returning the 'Input MKMCXX', 'G_f' and 'G_b' columns.
     """
-    try:
-        import re
-
-        def replace_reference(match):
-            # Extract reference like 'SheetName'!Cell
-            ref = match.group(1)
-            sheet, cell = ref.split('!')
-            sheet = sheet.strip("'")  # Remove quotes
-            col, row = re.match(r"([A-Z]+)(\d+)", cell).groups()  # Extract column and row
-            row_idx = int(row) - 1  # Convert to 0-based index
-            col_idx = ord(col.upper()) - ord('A')  # Convert column letter to index
-            return str(sheet_data[sheet].iloc[row_idx, col_idx])  # Lookup value
-
-        # Replace Excel-style references with actual values
-        pattern = r"'([^']+)'!([A-Z]+\d+)"
-        formula = re.sub(pattern, replace_reference, formula)
-
-        # Evaluate the modified formula using sympy
-        expr = sympify(formula)
-        result = expr.evalf(subs=context)
-        return result
+    return load_mkm_workbook(uploaded_file).compile_columns(FORMULA_COLUMNS)
 
-    except Exception as e:
-        st.error(f"Error evaluating formula '{formula}': {e}")
-        return np.nan
+def evaluate_grid(uploaded_file, pH_list, V_list):
+    """
+    Evaluates the formula columns over a whole pH x V grid in one array operation.
+
+    Args:
+    uploaded_file (str or file): Excel workbook.
+    pH_list (list): pH values.
+    V_list (list): Potential values.
+
+    Returns:
+    dict: Column header -> array of shape (rows, len(pH_list), len(V_list)).
+    """
+    return compile_formulas(uploaded_file).grid(pH_list, V_list)
 
-def read_and_compute(file_name, sheet_name, column_name, sheet_data):
+def solve_grid_native(uploaded_file, pH_list, V_list):
     """
-    Reads formulas from an Excel sheet, computes their values, and returns a Series.
+    Solves every point of a pH x V grid in one batched native computation, without writing input files.
 
     Args:
-    file_name (str): Path to the Excel file.
-    sheet_name (str): Name of the sheet to process.
-    column_name (str): Column containing formulas.
-    sheet_data (dict): Mapping of sheet names to DataFrames.
+    uploaded_file (str or file): Excel workbook.
+    pH_list (list): pH values.
+    V_list (list): Potential values.
 
     Returns:
-    pd.Series: Series with computed values for the specified column.
+    tuple: (SweepResults with the gas concentrations, final surface coverages and net reaction rates of every point,
+    boolean array (len(pH_list), len(V_list)) telling which points converged,
+    array of the same shape with the reason a point did not converge, '' where it did)
     """
-    try:
-        # Load the workbook and extract the desired sheet as a DataFrame
-        data = pd.read_excel(file_name, sheet_name=sheet_name)
+    mkm_workbook = load_mkm_workbook(uploaded_file)
+    # A formula dividing by zero at some point (#DIV/0! in Excel) is reported per point below
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        values = evaluate_grid(uploaded_file, pH_list, V_list)
+    points = len(pH_list) * len(V_list)
+    gases = mkm_workbook.species['Species'].tolist()
+    concentrations = values['Input MKMCXX'].reshape(len(gases), points)
+    solution = solve_batch(mkm_workbook.network, gases, concentrations,
+                           values['G_f'].reshape(-1, points), values['G_b'].reshape(-1, points),
+                           Temp, mkm_workbook.pressure, Time, Reltol)
+
+    # Same columns as a coverage.dat: gas concentrations, then the surface species
+    gas_rows = [gases.index(name) for name in solution.gases]
+    coverage = np.concatenate([concentrations[gas_rows].T, solution.coverage], axis=1)
+    shape = (len(pH_list), len(V_list))
+    network = mkm_workbook.network
+    results = SweepResults(pH_list, V_list, solution.gases + solution.surface,
+                           coverage.reshape(shape + (coverage.shape[1],)),
+                           network.reactions, solution.rates.reshape(shape + (len(network),)))
+    converged = solution.converged.reshape(shape)
+    results.coverage[~converged] = np.nan
+    results.rates[~converged] = np.nan
+
+    finite = np.ones(shape, dtype=bool)
+    for name in ('Input MKMCXX', 'G_f', 'G_b'):
+        finite &= np.isfinite(values[name]).all(axis=0)
+    reasons = np.where(converged, '', np.where(finite, 'No steady state within the integration time',
+                                               'Non-finite concentration or barrier in the workbook'))
+    return results, converged, reasons
+
+def inp_file_gen_multiple(uploaded_file, children_folder, pH=None, V=None, seed=None):
+    """
+    Generates an input file based on Excel file data, evaluating formulas manually.
+
+    Errors are raised, not shown; reporting them is left to the caller.
 
-        # Compute values for the specified column
-        if column_name not in data.columns:
-            raise ValueError(f"Column '{column_name}' not found in the sheet.")
+    Args:
+    uploaded_file (str or file): Excel workbook.
+    children_folder (str): Folder the input_file.mkm is written to.
+    pH (float): pH of the run; defaults to the value in the 'Local Environment' sheet.
+    V (float): Potential of the run; defaults to the value in the 'Local Environment' sheet.
+    seed (str): coverage.dat of a converged neighbouring run whose coverages become the
+        initial activities; None starts from a clean surface.
 
-        computed_values = []
-        for formula in data[column_name]:
-            if isinstance(formula, str) and '=' in formula:  # Formula detected
-                computed_values.append(evaluate_excel_formula(formula.strip('='), {}, sheet_data))
-            else:  # Not a formula, use value as is
-                computed_values.append(formula)
+    Returns:
+    str: Path of the written input file.
+    """
+    if not uploaded_file:
+        raise ValueError("No Excel workbook was given.")
+    try:
+        # Parsed sheets shared with the other generators
+        mkm_workbook = load_mkm_workbook(uploaded_file)
+        sheet_data = mkm_workbook.values
+
+        # Extract parameters
+        data2 = sheet_data['Local Environment']
+
+        dependencies = {
+            'pH': data2['pH'].iloc[0] if pH is None else pH,
+            'V': data2['V'].iloc[0] if V is None else V,
+            'Pressure': data2['Pressure'].iloc[0],
+        }
+
+        # Compute formula columns at this point's pH and V; a division by zero
+        # (#DIV/0! in Excel) gives inf or NaN, which is rejected below
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            values = compile_formulas(uploaded_file)(dependencies['pH'], dependencies['V'])
+        concentrations = values['Input MKMCXX']
+        Ea = values['G_f']
+        Eb = values['G_b']
+        labels = {'Input MKMCXX': mkm_workbook.species['Species'].tolist(),
+                  'G_f': mkm_workbook.network.reactions, 'G_b': mkm_workbook.network.reactions}
+        for column, names in labels.items():
+            bad = [name for name, value in zip(names, values[column]) if not np.isfinite(value)]
+            if bad:
+                raise ValueError(f"'{column}' is not finite for {', '.join(bad)} "
+                                 f"at pH={dependencies['pH']}, V={dependencies['V']}")
+    except Exception as e:
+        raise ValueError(f"Error extracting parameters or computing formulas: {str(e)}") from e
 
-        return pd.Series(computed_values, name=column_name)
+    try:
+        # Adsorbates from the shared reaction network
+        adsorbates = mkm_workbook.network.adsorbates
+        # Continue from the neighbour's steady state when one is given
+        activity, site_activity = warm_start_activities(seed, adsorbates)
+        if activity is None:
+            activity = np.zeros(len(adsorbates))
+    except Exception as e:
+        raise ValueError(f"Error processing reactions: {str(e)}") from e
 
+    # Write input file
+    inp_file_path = os.path.join(children_folder, 'input_file.mkm')
+    try:
+        # Only the per-point numbers are filled into the skeleton rendered once per workbook
+        mkm_workbook.template.write(inp_file_path, concentrations, Ea, Eb,
+                                    [runs_line(dependencies['V'])], activity, site_activity)
     except Exception as e:
-        st.error(f"Error reading and computing formulas: {e}")
-        return pd.Series(dtype=float)
+        raise OSError(f"Error writing input file: {str(e)}") from e
+    return inp_file_path
 
-def inp_file_gen_multiple(uploaded_file, children_folder):
+def write_point_input(uploaded_file, folder, pH, V, seed=None):
     """
-    Generates an input file based on Excel file data, evaluating formulas manually.
+    Writes a fresh input_file.mkm for one grid point.
+
+    The previous input is removed first, so a failed generation never leaves a
+    stale input behind for the solver to run.
+
+    Args:
+    uploaded_file (str or file): Excel workbook.
+    folder (str): Point folder.
+    pH (float): pH of the point.
+    V (float): Potential of the point.
+    seed (str): coverage.dat to warm-start from, see inp_file_gen_multiple().
+
+    Returns:
+    str: Path of the written input file.
     """
-    if uploaded_file:
-        try:
-            # Read all required sheets into a dictionary for formula evaluation
-            sheet_data = {
-                'Local Environment': pd.read_excel(uploaded_file, sheet_name='Local Environment'),
-                'Input-Output Species': pd.read_excel(uploaded_file, sheet_name='Input-Output Species'),
-                'Reactions': pd.read_excel(uploaded_file, sheet_name='Reactions')
-            }
-
-            # Extract parameters
-            data2 = sheet_data['Local Environment']
-            data3 = sheet_data['Input-Output Species']
-
-            dependencies = {
-                'pH': data2['pH'].iloc[0],
-                'V': data2['V'].iloc[0],
-                'Pressure': data2['Pressure'].iloc[0],
-            }
-
-            # Compute formula columns
-            concentrations = read_and_compute(uploaded_file, 'Input-Output Species', 'Input MKMCXX', sheet_data)
-            Ea = read_and_compute(uploaded_file, 'Reactions', 'G_f', sheet_data)
-            Eb = read_and_compute(uploaded_file, 'Reactions', 'G_b', sheet_data)
-            gases = data3["Species"].tolist()
-            rxn = sheet_data['Reactions']["Reactions"]
-
-            st.write("Parameters extracted and formulas computed successfully!")
-        except Exception as e:
-            st.error(f"Error extracting parameters or computing formulas: {str(e)}")
-            return
-
-        try:
-            # Process reactions
-            Reactant1, Reactant2, Reactant3 = [], [], []
-            Product1, Product2, Product3 = [], [], []
-            adsorbates = []
-
-            for reaction in rxn:
-                reactants, products = reaction.split("→")
-                reactants = [r.strip() for r in reactants.split("+")]
-                products = [p.strip() for p in products.split("+")]
-
-                Reactant1.append(f"{{{reactants[0]}}}")
-                Reactant2.append(f"{{{reactants[1]}}}" if len(reactants) > 1 else "")
-                Reactant3.append(f"{{{reactants[2]}}}" if len(reactants) > 2 else "")
-
-                Product1.append(f"{{{products[0]}}}")
-                Product2.append(f"{{{products[1]}}}" if len(products) > 1 else "")
-                Product3.append(f"{{{products[2]}}}" if len(products) > 2 else "")
-
-                for item in reactants + products:
-                    if "*" in item and item not in adsorbates:
-                        adsorbates.append(item)
-
-            adsorbates = [a for a in adsorbates if a != "*"]
-            activity = np.zeros(len(adsorbates))
-        except Exception as e:
-            st.error(f"Error processing reactions: {str(e)}")
-            return
-
-        # Write input file
-        inp_file_path = os.path.join(children_folder, 'input_file.mkm')
-        try:
-            with open(inp_file_path, 'w') as inp_file:
-                inp_file.write('&compounds\n\n#gas-phase compounds\n\n#Name; isSite; concentration\n\n')
-                for compound, concentration in zip(gases, concentrations):
-                    inp_file.write(f"{compound:<15}; 0; {concentration}\n")
-
-                inp_file.write("\n\n#adsorbates\n\n#Name; isSite; activity\n\n")
-                for compound, activity_value in zip(adsorbates, activity):
-                    inp_file.write(f"{compound:<15}; 1; {activity_value}\n")
-
-                inp_file.write("\n#free sites on the surface \n\n#Name; isSite; activity\n\n")
-                inp_file.write("*; 1; 1.0\n\n")
-
-                inp_file.write('&reactions\n\n')
-                pre_exp = 6.21e12
-                for j in range(len(rxn)):
-                    line = f"AR; {Reactant1[j]} + {Reactant2[j]} => {Product1[j]} + {Product2[j]}; {pre_exp:.2e}; {pre_exp:.2e}; {Ea[j]}; {Eb[j]}\n"
-                    inp_file.write(line)
-
-                inp_file.write("\n\n&settings\nTYPE = SEQUENCERUN\nPRESSURE = {}\nPOTAXIS=1\nDEBUG=0\n".format(dependencies['Pressure']))
-                inp_file.write("NETWORK_RATES=1\nNETWORK_FLUX=1\nUSETIMESTAMP=0\n\n&runs\n# Temp; Potential;Time;AbsTol;RelTol\n")
-                inp_file.write("{:<5};{:<5};{:<5.2e};{:<5};{:<5}\n".format(Temp, dependencies['V'], Time, Abstol, Reltol))
-            st.write(f"Input file successfully created at {inp_file_path}")
-        except Exception as e:
-            st.error(f"Error writing input file: {str(e)}")
+    os.makedirs(folder, exist_ok=True)
+    inp_file_path = os.path.join(folder, 'input_file.mkm')
+    if os.path.exists(inp_file_path):
+        os.remove(inp_file_path)
+    inp_file_gen_multiple(uploaded_file, folder, pH=pH, V=V, seed=seed)
+    if not os.path.exists(inp_file_path):
+        raise FileNotFoundError(f"No input file was written to {inp_file_path}")
+    return inp_file_path
@@ -0,0 +1,462 @@
+import os
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import itertools
+import threading
+import subprocess
+from contextlib import closing
+from collections import namedtuple
+
+# Job and point states
+QUEUED, RUNNING, CANCELLING, DONE, FAILED, CANCELLED = "queued", "running", "cancelling", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+# A worker whose heartbeat is older than this is presumed dead and its job is requeued
+HEARTBEAT_TIMEOUT = 30.0
+# Seconds between heartbeats (and cancellation checks) of a worker
+HEARTBEAT_INTERVAL = 1.0
+# A worker exits after this many seconds without queued jobs
+IDLE_EXIT = 60.0
+
+# Queue database shared by every browser session; the jobs say which session folder they write to
+DEFAULT_DB = os.path.join(os.getcwd(), "multiple_run", "jobs.sqlite")
+
+# One sweep in the queue; pH_list, V_list and options are decoded from JSON
+Job = namedtuple("Job", ["id", "root", "workbook", "pH_list", "V_list", "options", "status", "message",
+                         "created", "started", "finished"])
+
+# One grid point of a job
+JobPoint = namedtuple("JobPoint", ["pH", "V", "status", "stage", "message", "elapsed"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    workbook TEXT NOT NULL,
+    pH_list TEXT NOT NULL,
+    V_list TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL,
+    message TEXT NOT NULL DEFAULT '',
+    worker TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS points (
+    job TEXT NOT NULL,
+    pH REAL NOT NULL,
+    V REAL NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT NOT NULL DEFAULT '',
+    message TEXT NOT NULL DEFAULT '',
+    elapsed REAL,
+    PRIMARY KEY (job, pH, V)
+);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    heartbeat REAL NOT NULL
+);
+"""
+
+# Databases whose journal mode and tables this process has already set up
+_prepared = set()
+_prepared_lock = threading.Lock()
+
+
+def connect(db_path=DEFAULT_DB):
+    """
+    Opens the queue database, creating its tables on first use.
+
+    Every thread and process opens its own connection; WAL mode lets the page
+    read while a worker writes. The setup runs once per database and process,
+    not on every poll of the page.
+
+    Args:
+    db_path (str): Path of the SQLite file.
+
+    Returns:
+    sqlite3.Connection: Connection in autocommit mode.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    with _prepared_lock:
+        if os.path.abspath(db_path) not in _prepared:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            _prepared.add(os.path.abspath(db_path))
+    return connection
+
+
+def _job(row):
+    return Job(row[0], row[1], row[2], json.loads(row[3]), json.loads(row[4]), json.loads(row[5]), *row[6:])
+
+
+_JOB_COLUMNS = "id, root, workbook, pH_list, V_list, options, status, message, created, started, finished"
+
+
+def store_workbook(data, db_path=DEFAULT_DB):
+    """
+    Saves an uploaded workbook next to the queue database, named by its content hash.
+
+    Returns:
+    str: Path of the stored copy; the same content is stored only once.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    folder = os.path.join(os.path.dirname(os.path.abspath(db_path)), "workbooks")
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{digest}.xlsx")
+    if not os.path.exists(path):
+        partial = f"{path}.{uuid.uuid4().hex}.partial"
+        with open(partial, "wb") as f:
+            f.write(data)
+        os.replace(partial, path)
+    return path
+
+
+def submit(workbook_data, pH_list, V_list, root, options=None, db_path=DEFAULT_DB):
+    """
+    Adds a sweep to the queue and makes sure a worker is running to pick it up.
+
+    Args:
+    workbook_data (bytes): Content of the Excel workbook.
+    pH_list (list): pH values.
+    V_list (list): Potential values.
+    root (str): Session folder the points are solved in (root/pH_x/V_y).
+    options (dict): Solver settings: workers, omp_threads, cache_bytes (None = no cache),
+        timeout, native, warm_start.
+    db_path (str): Queue database.
+
+    Returns:
+    str: Id of the new job.
+    """
+    workbook = store_workbook(workbook_data, db_path)
+    job_id = uuid.uuid4().hex[:12]
+    with closing(connect(db_path)) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute(f"INSERT INTO jobs ({_JOB_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, '', ?, NULL, NULL)",
+                           (job_id, os.path.abspath(root), workbook, json.dumps(sorted(pH_list)),
+                            json.dumps(sorted(V_list)), json.dumps(options or {}), QUEUED, time.time()))
+        connection.executemany("INSERT INTO points (job, pH, V, status) VALUES (?, ?, ?, ?)",
+                               [(job_id, pH, V, QUEUED) for pH in pH_list for V in V_list])
+        connection.execute("COMMIT")
+    ensure_worker(db_path)
+    return job_id
+
+
+def get_job(job_id, db_path=DEFAULT_DB):
+    """The job with the given id, or None."""
+    with closing(connect(db_path)) as connection:
+        row = connection.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _job(row) if row else None
+
+
+def list_jobs(root=None, db_path=DEFAULT_DB):
+    """Jobs of one session folder (or of every session), newest first."""
+    with closing(connect(db_path)) as connection:
+        if root is None:
+            rows = connection.execute(f"SELECT {_JOB_COLUMNS} FROM jobs ORDER BY created DESC").fetchall()
+        else:
+            rows = connection.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE root = ? ORDER BY created DESC",
+                                      (os.path.abspath(root),)).fetchall()
+    return [_job(row) for row in rows]
+
+
+def job_points(job_id, db_path=DEFAULT_DB):
+    """Status of every point of a job, in grid order."""
+    with closing(connect(db_path)) as connection:
+        rows = connection.execute("SELECT pH, V, status, stage, message, elapsed FROM points "
+                                  "WHERE job = ? ORDER BY pH, V", (job_id,)).fetchall()
+    return [JobPoint(*row) for row in rows]
+
+
+def job_progress(job_id, db_path=DEFAULT_DB):
+    """
+    Point counts of a job by status.
+
+    Returns:
+    dict: Status -> number of points.
+    """
+    with closing(connect(db_path)) as connection:
+        rows = connection.execute("SELECT status, COUNT(*) FROM points WHERE job = ? GROUP BY status",
+                                  (job_id,)).fetchall()
+    return dict(rows)
+
+
+def cancel(job_id, db_path=DEFAULT_DB):
+    """
+    Cancels a job: a queued job is dropped at once, a running one is stopped by its worker.
+    """
+    with closing(connect(db_path)) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute("UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?",
+                           (CANCELLED, time.time(), job_id, QUEUED))
+        connection.execute("UPDATE jobs SET status = ? WHERE id = ? AND status = ?", (CANCELLING, job_id, RUNNING))
+        connection.execute("COMMIT")
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _requeue_orphans(connection):
+    # Jobs of workers that stopped sending heartbeats go back to the queue;
+    # their finished points are kept and not run again
+    stale = time.time() - HEARTBEAT_TIMEOUT
+    dead = [worker for worker, pid, heartbeat in connection.execute("SELECT id, pid, heartbeat FROM workers")
+            if heartbeat < stale or not _alive(pid)]
+    for worker in dead:
+        for (job_id,) in connection.execute("SELECT id FROM jobs WHERE worker = ? AND status IN (?, ?)",
+                                            (worker, RUNNING, CANCELLING)).fetchall():
+            connection.execute("UPDATE jobs SET status = ?, worker = NULL WHERE id = ? AND status = ?",
+                               (QUEUED, job_id, RUNNING))
+            connection.execute("UPDATE jobs SET status = ?, worker = NULL, finished = ? WHERE id = ? AND status = ?",
+                               (CANCELLED, time.time(), job_id, CANCELLING))
+            connection.execute("UPDATE points SET status = ?, stage = '' WHERE job = ? AND status = ?",
+                               (QUEUED, job_id, RUNNING))
+        connection.execute("DELETE FROM workers WHERE id = ?", (worker,))
+
+
+def ensure_worker(db_path=DEFAULT_DB, count=1):
+    """
+    Starts worker processes until `count` are alive.
+
+    Workers run `python job_queue.py <db> <worker id>` in their own session, so
+    they outlive the Streamlit script run (and its reruns) that started them.
+    The worker row is inserted here, before the worker registers itself, so a
+    call made while it is still starting up does not spawn another one; a
+    worker that dies before its first heartbeat is removed as an orphan.
+
+    Returns:
+    int: Number of workers started.
+    """
+    log_path = os.path.join(os.path.dirname(os.path.abspath(db_path)), "worker.log")
+    started = 0
+    with closing(connect(db_path)) as connection:
+        # The write lock is held while spawning, so concurrent callers count the new rows
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            _requeue_orphans(connection)
+            alive = connection.execute("SELECT COUNT(*) FROM workers").fetchone()[0]
+            for _ in range(count - alive):
+                worker = uuid.uuid4().hex[:12]
+                with open(log_path, "a") as log:
+                    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), os.path.abspath(db_path),
+                                                worker],
+                                               cwd=os.getcwd(), stdout=log, stderr=subprocess.STDOUT,
+                                               stdin=subprocess.DEVNULL, start_new_session=True)
+                connection.execute("INSERT INTO workers (id, pid, heartbeat) VALUES (?, ?, ?)",
+                                   (worker, process.pid, time.time()))
+                started += 1
+        finally:
+            connection.execute("COMMIT")
+    return started
+
+
+def claim(connection, worker):
+    """
+    Takes the oldest queued job whose session folder is not busy with another job.
+
+    Returns:
+    Job: The claimed job, now running on `worker`, or None when nothing can run.
+    """
+    connection.execute("BEGIN IMMEDIATE")
+    row = connection.execute(
+        f"SELECT {_JOB_COLUMNS} FROM jobs WHERE status = ? AND root NOT IN "
+        f"(SELECT root FROM jobs WHERE status IN (?, ?)) ORDER BY created LIMIT 1",
+        (QUEUED, RUNNING, CANCELLING)).fetchone()
+    if row is not None:
+        connection.execute("UPDATE jobs SET status = ?, worker = ?, started = ? WHERE id = ?",
+                           (RUNNING, worker, time.time(), row[0]))
+    connection.execute("COMMIT")
+    return _job(row)._replace(status=RUNNING) if row else None
+
+
+def run_job(job, db_path=DEFAULT_DB, cancel_event=None):
+    """
+    Solves the points of a job that are not finished yet and records each result as it arrives.
+
+    Inputs are generated from the stored workbook and points the sweep manifest
+    shows as up to date are skipped; when every point is done, the coverages
+    and reaction fluxes are consolidated into root/results.json.
+
+    Args:
+    job (Job): Claimed job.
+    db_path (str): Queue database.
+    cancel_event (threading.Event): Set when the job is cancelled.
+
+    Returns:
+    tuple: (final status, message)
+    """
+    # Solver modules are imported here, so the page can submit and poll without loading them
+    from utility import point_folder, point_coverage_path
+    from sweep import (PointResult, StageUpdate, UP_TO_DATE, run_sweep, continuation_chains, run_continuation,
+                       timing_summary)
+    from sweep_results import SweepResults
+    from result_cache import get_cache
+    from inp_file_multiple2 import write_point_input
+    from workbook import load_mkm_workbook
+    from network_flux import net_rates
+    from sweep_manifest import SweepManifest
+
+    options = job.options
+    cache = get_cache(options["cache_bytes"]) if options.get("cache_bytes") else None
+    workbook = load_mkm_workbook(job.workbook).digest
+    points = [(pH, V, point_folder(job.root, pH, V)) for pH in job.pH_list for V in job.V_list]
+
+    def prepare(pH, V, folder, seed=None):
+        write_point_input(job.workbook, folder, pH, V, seed)
+
+    # Points the manifest shows as solved from the same input are not run again,
+    # which also resumes a job requeued after its worker died
+    manifest = SweepManifest(job.root)
+    warm_start = options.get("warm_start")
+    unwritten = []
+    if not warm_start:
+        for pH, V, folder in points:
+            try:
+                prepare(pH, V, folder)
+            except Exception as e:
+                unwritten.append(PointResult(pH, V, folder, False, f"Input generation failed: {e}", 0.0))
+        failed_folders = {result.folder for result in unwritten}
+        points = [point for point in points if point[2] not in failed_folders]
+        points, up_to_date = manifest.split(points, workbook)
+    else:
+        # Warm-started inputs are written during the sweep and compared once rewritten
+        up_to_date = []
+
+    settings = dict(workers=options.get("workers"), omp_threads=options.get("omp_threads", 1), cache=cache,
+                    timeout=options.get("timeout"), stream=True, native=options.get("native", False),
+                    cancel=cancel_event)
+    if warm_start:
+        sweep = run_continuation(continuation_chains(points), prepare,
+                                 current=lambda folder: manifest.is_current(folder, workbook), **settings)
+    else:
+        sweep = run_sweep(points, **settings)
+
+    results = []
+    start = time.perf_counter()
+    with closing(connect(db_path)) as connection, closing(sweep):
+        connection.executemany("UPDATE points SET status = ?, stage = '', message = 'Up to date' "
+                               "WHERE job = ? AND pH = ? AND V = ?",
+                               [(DONE, job.id, pH, V) for pH, V, _ in up_to_date])
+        connection.execute("UPDATE points SET status = ? WHERE job = ? AND status != ?", (RUNNING, job.id, DONE))
+        # Points whose input could not be written fail without reaching the solver
+        for event in itertools.chain(unwritten, sweep):
+            if isinstance(event, StageUpdate):
+                connection.execute("UPDATE points SET stage = ? WHERE job = ? AND pH = ? AND V = ?",
+                                   (event.stage, job.id, event.pH, event.V))
+            elif isinstance(event, PointResult) and event.message == UP_TO_DATE:
+                connection.execute("UPDATE points SET status = ?, stage = '', message = 'Up to date' "
+                                   "WHERE job = ? AND pH = ? AND V = ?", (DONE, job.id, event.pH, event.V))
+            elif isinstance(event, PointResult):
+                results.append(event)
+                manifest.record(event.folder, event.success, event.elapsed, event.message, workbook)
+                connection.execute("UPDATE points SET status = ?, stage = '', message = ?, elapsed = ? "
+                                   "WHERE job = ? AND pH = ? AND V = ?",
+                                   (DONE if event.success else FAILED, event.message, event.elapsed,
+                                    job.id, event.pH, event.V))
+        # Points a cancelled sweep did not finish go back to queued
+        connection.execute("UPDATE points SET status = ?, stage = '' WHERE job = ? AND status = ?",
+                           (QUEUED, job.id, RUNNING))
+
+    manifest.compact()
+    if cancel_event is not None and cancel_event.is_set():
+        return CANCELLED, f"Cancelled after {len(results)} of {len(points) + len(unwritten)} points."
+
+    # Consolidate the coverages and fluxes of the whole grid for the page to load
+    network = load_mkm_workbook(job.workbook).network
+    unmatched = []
+
+    def rates_of(pH, V):
+        try:
+            return net_rates(point_folder(job.root, pH, V), network)
+        except ValueError:
+            unmatched.append((pH, V))
+            return None
+
+    # A failed rerun leaves the outputs of an earlier run behind; those points stay empty
+    results_store = SweepResults.collect(job.pH_list, job.V_list,
+                                         lambda pH, V: point_coverage_path(job.root, pH, V), rates_of,
+                                         lambda pH, V: manifest.failed(point_folder(job.root, pH, V)))
+    results_store.save(os.path.join(job.root, "results.json"))
+    failed = sum(not result.success for result in results)
+    message = timing_summary(results, time.perf_counter() - start) if results else "Every point was already solved."
+    if unmatched:
+        message += f" The flux files of {len(unmatched)} points match none of the workbook's reactions."
+    if failed:
+        return FAILED, f"{failed} of {len(points) + len(unwritten)} points failed. {message}"
+    return DONE, message
+
+
+def work(db_path=DEFAULT_DB, idle_exit=IDLE_EXIT, worker=None):
+    """
+    Worker loop: claims queued jobs one after the other and runs them.
+
+    A heartbeat thread keeps the worker registered and turns a 'cancelling'
+    job status into the cancel event of the running sweep. The worker exits
+    after idle_exit seconds without work.
+
+    Args:
+    db_path (str): Queue database.
+    idle_exit (float): Idle time before the worker exits.
+    worker (str): Id of the worker row ensure_worker inserted for this process; a new one when None.
+    """
+    worker = worker or uuid.uuid4().hex[:12]
+    connection = connect(db_path)
+    connection.execute("INSERT OR REPLACE INTO workers (id, pid, heartbeat) VALUES (?, ?, ?)",
+                       (worker, os.getpid(), time.time()))
+    current = {"job": None, "cancel": threading.Event()}
+    stopped = threading.Event()
+
+    def heartbeat():
+        beat = connect(db_path)
+        while not stopped.wait(HEARTBEAT_INTERVAL):
+            beat.execute("UPDATE workers SET heartbeat = ? WHERE id = ?", (time.time(), worker))
+            job_id = current["job"]
+            if job_id is not None:
+                row = beat.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                if row is None or row[0] == CANCELLING:
+                    current["cancel"].set()
+        beat.close()
+
+    thread = threading.Thread(target=heartbeat, name="job-heartbeat", daemon=True)
+    thread.start()
+    idle_since = time.time()
+    try:
+        while time.time() - idle_since < idle_exit:
+            job = claim(connection, worker)
+            if job is None:
+                time.sleep(HEARTBEAT_INTERVAL)
+                continue
+            current["cancel"] = threading.Event()
+            current["job"] = job.id
+            try:
+                status, message = run_job(job, db_path, current["cancel"])
+            except Exception as e:
+                status, message = FAILED, f"{type(e).__name__}: {e}"
+            current["job"] = None
+            connection.execute("UPDATE jobs SET status = ?, message = ?, finished = ? WHERE id = ?",
+                               (status, message, time.time(), job.id))
+            print(f"Job {job.id}: {status}. {message}", flush=True)
+            idle_since = time.time()
+    finally:
+        stopped.set()
+        thread.join()
+        connection.execute("DELETE FROM workers WHERE id = ?", (worker,))
+        connection.close()
+
+
+if __name__ == "__main__":
+    work(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB, worker=sys.argv[2] if len(sys.argv) > 2 else None)
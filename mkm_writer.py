@@ -0,0 +1,103 @@
+from mkm_parameters import *
+
+# Pre-exponential factor written for every forward and backward reaction
+PRE_EXP = 6.21e12
+
+# Column widths of the species on each side of the &reactions lines, by species count.
+# They reproduce the layout the generators have always written; other counts use 15 per species.
+_REACTANT_WIDTHS = {1: (15,), 2: (15, 15), 3: (15, 15, 5)}
+_PRODUCT_WIDTHS = {1: (15,), 2: (15, 20), 3: (10, 15, 7)}
+_REACTANT_SIDE = 33
+_PRODUCT_SIDE = 38
+
+
+def _escape(text):
+    """Escapes braces so species names like {CO*} survive str.format."""
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _side(names, widths, minimum):
+    widths = widths.get(len(names), (15,) * len(names))
+    text = " + ".join(("{" + name + "}").ljust(width) for name, width in zip(names, widths))
+    return _escape(text.ljust(minimum))
+
+
+def runs_line(V, temp=Temp, time=Time, abstol=Abstol, reltol=Reltol):
+    """
+    Formats one '# Temp; Potential;Time;AbsTol;RelTol' row of the &runs block.
+
+    Args:
+    V (float): Potential of the run.
+
+    Returns:
+    str: The row, without a line break.
+    """
+    return "{:<5};{:<5};{:<5.2e};{:<5};{:<5}".format(temp, V, time, abstol, reltol)
+
+
+class MkmTemplate:
+    """
+    Pre-rendered .mkm skeleton of a workbook.
+
+    Species names, reaction lines and settings are rendered once; only the
+    concentrations, activities, barriers and &runs rows are filled in per
+    grid point, with a single str.format call.
+    """
+
+    def __init__(self, network, gases, pressure):
+        self.network = network
+        self.gases = list(gases)
+        self.adsorbates = list(network.adsorbates)
+
+        parts = ['&compounds\n\n', "#gas-phase compounds\n\n#Name; isSite; concentration\n\n"]
+        parts += [_escape("{:<15}; 0; ".format(str(compound))) + "{}\n" for compound in self.gases]
+        parts.append("\n\n#adsorbates\n\n#Name; isSite; activity\n\n")
+        parts += [_escape("{:<15}; 1; ".format(compound)) + "{}\n" for compound in self.adsorbates]
+        parts.append("\n#free sites on the surface \n\n#Name; isSite; activity\n\n*; 1; {}\n\n")
+
+        parts.append('&reactions\n\n')
+        rates = "{:<10.2e} ;  {:<10.2e} ;  ".format(PRE_EXP, PRE_EXP)
+        for j in range(len(network)):
+            parts.append("AR; " + _side(network.reactants(j), _REACTANT_WIDTHS, _REACTANT_SIDE)
+                         + " => " + _side(network.products(j), _PRODUCT_WIDTHS, _PRODUCT_SIDE)
+                         + ";" + rates + "{:<10} ;  {:<10} \n")
+
+        parts.append("\n\n&settings\nTYPE = SEQUENCERUN\nPRESSURE = {}".format(_escape(str(pressure))))
+        parts.append("\nPOTAXIS=1\nDEBUG=0\nNETWORK_RATES=1\nNETWORK_FLUX=1\nUSETIMESTAMP=0")
+        parts.append('\n\n&runs\n# Temp; Potential;Time;AbsTol;RelTol\n')
+        self._template = "".join(parts)
+
+    def render(self, concentrations, Ea, Eb, runs, activities=None, site_activity=1.0):
+        """
+        Fills in the per-point numbers.
+
+        Args:
+        concentrations (list): Gas concentrations, in the order of the Species sheet.
+        Ea (list): Forward barriers (G_f), one per reaction.
+        Eb (list): Backward barriers (G_b), one per reaction.
+        runs (list): &runs rows, see runs_line().
+        activities (list): Initial adsorbate activities, zero by default.
+        site_activity (float): Initial activity of the free site.
+
+        Returns:
+        str: Content of the .mkm file.
+        """
+        if activities is None:
+            activities = [0.0] * len(self.adsorbates)
+        if len(concentrations) != len(self.gases) or len(Ea) != len(self.network) or len(Eb) != len(self.network):
+            raise ValueError("Concentrations or barriers do not match the workbook.")
+        barriers = [float(value) for pair in zip(Ea, Eb) for value in pair]
+        values = [float(c) for c in concentrations] + [float(a) for a in activities] + [float(site_activity)] + barriers
+        return self._template.format(*values) + "\n".join(runs)
+
+    def write(self, path, concentrations, Ea, Eb, runs, activities=None, site_activity=1.0):
+        """
+        Renders the .mkm file and writes it with a single buffered call.
+
+        Returns:
+        str: The path written.
+        """
+        content = self.render(concentrations, Ea, Eb, runs, activities, site_activity)
+        with open(path, 'w') as inp_file:
+            inp_file.write(content)
+        return path
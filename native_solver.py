@@ -0,0 +1,466 @@
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+from scipy.sparse import coo_matrix, identity
+from scipy.sparse.linalg import spsolve
+
+from reaction_network import ReactionNetwork, GAS
+from mkm_writer import PRE_EXP
+from network_flux import write_flux, write_dot
+
+# Gas constant in J/(mol K); the barriers of the .mkm files are in J/mol
+R_GAS = 8.314462618
+
+# Backward-Euler continuation controls
+FIRST_STEP = 1e-12
+MIN_STEP = 1e-30
+NEWTON_STEPS = 12
+NEWTON_ATOL = 1e-14
+# Largest net rate of a surface species, relative to its gross production plus consumption,
+# for the final state to count as steady
+STEADY_RTOL = 1e-6
+
+# Content of an input file, as needed by the native solver
+MkmInput = namedtuple("MkmInput", ["compounds", "values", "is_site", "reactions",
+                                   "pre_f", "pre_b", "Ea", "Eb", "pressure", "runs"])
+
+# One &runs row
+MkmRun = namedtuple("MkmRun", ["temperature", "potential", "time", "abstol", "reltol"])
+
+# Result of solve_batch(); arrays have the points on their first axis
+BatchSolution = namedtuple("BatchSolution", ["surface", "coverage", "gases", "gas_activity", "gas_rates",
+                                             "rates", "converged"])
+
+
+class NativeSolverError(RuntimeError):
+    """Raised when the native solver cannot handle an input or does not converge."""
+
+
+def _species(side):
+    return [name.strip().strip("{}").strip() for name in side.split("+")]
+
+
+def read_mkm(path):
+    """
+    Reads the parts of a .mkm file the native solver understands.
+
+    Args:
+    path (str): Path of the input file.
+
+    Returns:
+    MkmInput: Compounds, Arrhenius reactions, pressure and &runs rows.
+    """
+    compounds, values, is_site = [], [], []
+    reactions, pre_f, pre_b, Ea, Eb = [], [], [], [], []
+    pressure, runs = 1.0, []
+    section = None
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("&"):
+                section = line[1:].strip().lower()
+                continue
+            fields = [field.strip() for field in line.split(";")]
+            if section == "compounds":
+                compounds.append(fields[0])
+                is_site.append(int(fields[1]) == 1)
+                values.append(float(fields[2]))
+            elif section == "reactions":
+                if fields[0] != "AR":
+                    raise NativeSolverError(f"Reaction type '{fields[0]}' is not supported by the native solver.")
+                lhs, rhs = fields[1].split("=>")
+                reactions.append("+".join(_species(lhs)) + "→" + "+".join(_species(rhs)))
+                pre_f.append(float(fields[2]))
+                pre_b.append(float(fields[3]))
+                Ea.append(float(fields[4]))
+                Eb.append(float(fields[5]))
+            elif section == "settings" and "=" in line:
+                key, value = (part.strip() for part in line.split("=", 1))
+                if key.upper() == "TYPE" and value.upper() != "SEQUENCERUN":
+                    raise NativeSolverError(f"Run type '{value}' is not supported by the native solver.")
+                if key.upper() == "PRESSURE":
+                    pressure = float(value)
+            elif section == "runs":
+                runs.append(MkmRun(*(float(field) for field in fields[:5])))
+    return MkmInput(compounds, np.array(values), np.array(is_site), reactions,
+                    np.array(pre_f), np.array(pre_b), np.array(Ea), np.array(Eb), pressure, runs)
+
+
+class SteadyStateModel:
+    """
+    Mean-field rate equations of a reaction network.
+
+    Gas-phase activities are held fixed; the surface species (adsorbates and
+    the free site) evolve as d(theta)/dt = S @ (r_f - r_b), where S is the
+    surface part of the stoichiometry and each rate is k times the product
+    of the activities of its reactants (products for r_b).
+    """
+
+    def __init__(self, network):
+        self.network = network
+        self.surface = list(network.adsorbates) + list(network.sites)
+        surface_ids = [network.index[name] for name in self.surface]
+        self.position = np.full(len(network.species), -1)
+        self.position[surface_ids] = np.arange(len(surface_ids))
+        self.stoichiometry = network.stoichiometry.tocsr()[surface_ids, :]
+        self.gas_stoichiometry = network.stoichiometry.tocsr()[network.kind == GAS, :]
+        self.gases = [name for name in network.species if network.kind[network.index[name]] == GAS]
+        self.forward = self._orders(network.reactant_ptr, network.reactant_ids)
+        self.backward = self._orders(network.product_ptr, network.product_ids)
+
+    def _orders(self, ptr, ids):
+        # Species of every reaction side padded to a dense (reactions x width) table;
+        # padding slots have order 0, so they contribute a factor 1
+        sides = [dict() for _ in range(len(ptr) - 1)]
+        for j, side in enumerate(sides):
+            for species_id in ids[ptr[j]:ptr[j + 1]]:
+                side[species_id] = side.get(species_id, 0) + 1
+        width = max((len(side) for side in sides), default=1)
+        species = np.zeros((len(sides), width), dtype=np.int64)
+        order = np.zeros((len(sides), width))
+        for j, side in enumerate(sides):
+            species[j, :len(side)] = list(side)
+            order[j, :len(side)] = list(side.values())
+        # Jacobian entries (reaction, surface position) each slot contributes to
+        keep = (self.position[species] >= 0) & (order > 0)
+        entries = [(np.nonzero(keep[:, slot])[0], self.position[species[keep[:, slot], slot]])
+                   for slot in range(width)]
+        return species, order, keep, entries
+
+    def activities(self, theta, gas):
+        """
+        Activities of every network species from the surface state and the fixed gas activities.
+
+        theta and gas may carry leading batch axes: (..., surface) and (..., species).
+        """
+        a = np.array(gas, dtype=float, copy=True)
+        surface = self.position >= 0
+        a[..., surface] = theta[..., self.position[surface]]
+        return a
+
+    def _terms(self, orders, k, a):
+        # Rate terms k * prod(a^order) and their derivatives towards the surface activities,
+        # for any leading batch axes of k (..., reactions) and a (..., species)
+        species, order, keep, entries = orders
+        factors = np.power(a[..., species], order)
+        terms = k * np.prod(factors, axis=-1)
+        values = []
+        for slot in range(species.shape[1]):
+            # d(term)/d(a) of the slot's species: order * a^(order - 1) times the other factors
+            others = np.prod(np.delete(factors, slot, axis=-1), axis=-1)
+            slope = order[:, slot] * np.power(a[..., species[:, slot]], np.maximum(order[:, slot] - 1, 0))
+            values.append((k * slope * others)[..., keep[:, slot]])
+        rows = np.concatenate([rows for rows, _ in entries])
+        cols = np.concatenate([cols for _, cols in entries])
+        return terms, rows, cols, np.concatenate(values, axis=-1)
+
+    def fluxes(self, theta, gas, kf, kb):
+        """Forward and backward rate of every reaction at a surface state."""
+        a = self.activities(theta, gas)
+        return self._terms(self.forward, kf, a)[0], self._terms(self.backward, kb, a)[0]
+
+    def evaluate(self, theta, gas, kf, kb):
+        """
+        Rates and their Jacobian at a surface state.
+
+        Returns:
+        tuple: (d(theta)/dt, sparse Jacobian, net rate of every reaction,
+        gross production plus consumption rate of every surface species)
+        """
+        a = self.activities(theta, gas)
+        shape = (len(kf), len(self.surface))
+        forward, rows, cols, values = self._terms(self.forward, kf, a)
+        d_forward = coo_matrix((values, (rows, cols)), shape=shape).tocsr()
+        backward, rows, cols, values = self._terms(self.backward, kb, a)
+        d_backward = coo_matrix((values, (rows, cols)), shape=shape).tocsr()
+        rates = forward - backward
+        jacobian = self.stoichiometry @ (d_forward - d_backward)
+        gross = abs(self.stoichiometry) @ (forward + backward)
+        return self.stoichiometry @ rates, jacobian.tocsc(), rates, gross
+
+    def evaluate_batch(self, theta, gas, kf, kb):
+        """
+        Rates and Jacobians of many points at once.
+
+        Args:
+        theta (ndarray): Surface states, (points, surface).
+        gas (ndarray): Gas activities, (points, species).
+        kf, kb (ndarray): Rate constants, (points, reactions).
+
+        Returns:
+        tuple: (d(theta)/dt (points, surface), Jacobians (points, surface, surface),
+        net rates (points, reactions), gross rates (points, surface))
+        """
+        a = self.activities(theta, gas)
+        S = self.stoichiometry.toarray()
+        derivative = np.zeros(kf.shape + (len(self.surface),))
+        forward, rows, cols, values = self._terms(self.forward, kf, a)
+        derivative[:, rows, cols] += values
+        backward, rows, cols, values = self._terms(self.backward, kb, a)
+        derivative[:, rows, cols] -= values
+        rates = forward - backward
+        return rates @ S.T, S @ derivative, rates, (forward + backward) @ np.abs(S).T
+
+
+def rate_constants(pre_exp, barrier, temperature):
+    """Arrhenius rate constants k = A exp(-E / RT), with E in J/mol."""
+    return pre_exp * np.exp(-barrier / (R_GAS * temperature))
+
+
+def integrate(model, gas, kf, kb, theta0, t_end, reltol=1e-10):
+    """
+    Integrates the surface state to t_end with backward Euler and growing steps.
+
+    Every step solves theta - theta_old - dt * f(theta) = 0 with Newton's
+    method on the sparse Jacobian; converged steps grow dt, failed steps
+    shrink it. Large late steps make this a pseudo-transient continuation
+    onto the steady state.
+
+    Returns:
+    tuple: (theta at t_end, number of steps)
+
+    Raises:
+    NativeSolverError: When the step size collapses or the final state is not steady.
+    """
+    theta = np.array(theta0, dtype=float)
+    eye = identity(len(theta), format="csc")
+    t, dt, steps = 0.0, FIRST_STEP, 0
+    while t < t_end:
+        dt = min(dt, t_end - t)
+        x = theta.copy()
+        converged = False
+        for iteration in range(NEWTON_STEPS):
+            f, jacobian, _, _ = model.evaluate(x, gas, kf, kb)
+            dx = spsolve(eye - dt * jacobian, -(x - theta - dt * f))
+            if not np.all(np.isfinite(dx)):
+                break
+            x = x + dx
+            if np.all(np.abs(dx) <= reltol * np.abs(x) + NEWTON_ATOL):
+                converged = True
+                break
+        if converged and np.all(x >= -NEWTON_ATOL):
+            theta = np.maximum(x, 0.0)
+            t += dt
+            steps += 1
+            dt *= 10.0 if iteration < 4 else 2.0
+        else:
+            dt /= 10.0
+            if dt < MIN_STEP:
+                raise NativeSolverError(f"Step size collapsed at t={t:.3e} s.")
+
+    # Net rates must vanish against the flux through every species
+    f, _, _, gross = model.evaluate(theta, gas, kf, kb)
+    if np.any(np.abs(f) > STEADY_RTOL * gross + NEWTON_ATOL):
+        raise NativeSolverError("No steady state reached within the integration time.")
+    return theta, steps
+
+
+def integrate_batch(model, gas, kf, kb, theta0, t_end, reltol=1e-10):
+    """
+    integrate() for many points at once, on a stacked (points, surface) state.
+
+    All points take their Newton iterations together, with one batched dense
+    solve per iteration; step sizes are kept per point, so stiff points do not
+    hold back the others. Points whose step size collapses or that end up
+    off steady state are reported as not converged instead of raising.
+
+    Args:
+    model (SteadyStateModel): Rate equations shared by every point.
+    gas (ndarray): Gas activities, (points, species).
+    kf, kb (ndarray): Rate constants, (points, reactions).
+    theta0 (ndarray): Initial surface states, (points, surface).
+    t_end (float): Integration time.
+    reltol (float): Relative tolerance of the Newton iterations.
+
+    Returns:
+    tuple: (theta (points, surface), converged (points,) bool array)
+    """
+    theta = np.array(theta0, dtype=float)
+    points = len(theta)
+    eye = np.eye(theta.shape[1])
+    t = np.zeros(points)
+    dt = np.full(points, FIRST_STEP)
+    # Points with non-finite inputs or diverging iterates are flagged below, not warned about
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        failed = ~np.isfinite(kf).all(axis=1) | ~np.isfinite(kb).all(axis=1) | ~np.isfinite(gas).all(axis=1)
+        while True:
+            active = np.nonzero((t < t_end) & ~failed)[0]
+            if not len(active):
+                break
+            h = np.minimum(dt[active], t_end - t[active])
+            old = theta[active]
+            x = old.copy()
+            done = np.zeros(len(active), dtype=bool)
+            bad = np.zeros(len(active), dtype=bool)
+            iterations = np.full(len(active), NEWTON_STEPS)
+            for iteration in range(NEWTON_STEPS):
+                f, jacobian, _, _ = model.evaluate_batch(x, gas[active], kf[active], kb[active])
+                system = eye - h[:, None, None] * jacobian
+                rhs = -(x - old - h[:, None] * f)
+                try:
+                    dx = np.linalg.solve(system, rhs[..., None])[..., 0]
+                except np.linalg.LinAlgError:
+                    # One singular system spoils the batched call; solve the points one by one
+                    dx = np.full_like(x, np.nan)
+                    for p in range(len(active)):
+                        try:
+                            dx[p] = np.linalg.solve(system[p], rhs[p])
+                        except np.linalg.LinAlgError:
+                            pass
+                dx[done | bad] = 0.0
+                bad |= ~np.isfinite(dx).all(axis=1)
+                dx[bad] = 0.0
+                x += dx
+                newly = ~done & ~bad & np.all(np.abs(dx) <= reltol * np.abs(x) + NEWTON_ATOL, axis=1)
+                iterations[newly] = iteration
+                done |= newly
+                if np.all(done | bad):
+                    break
+            accepted = done & ~bad & np.all(x >= -NEWTON_ATOL, axis=1)
+            ok, rejected = active[accepted], active[~accepted]
+            theta[ok] = np.maximum(x[accepted], 0.0)
+            t[ok] += h[accepted]
+            dt[ok] = h[accepted] * np.where(iterations[accepted] < 4, 10.0, 2.0)
+            dt[rejected] = h[~accepted] / 10.0
+            failed[rejected[dt[rejected] < MIN_STEP]] = True
+
+        # Net rates must vanish against the flux through every species
+        f, _, _, gross = model.evaluate_batch(theta, gas, kf, kb)
+        steady = np.all(np.abs(f) <= STEADY_RTOL * gross + NEWTON_ATOL, axis=1)
+    return theta, ~failed & steady & np.isfinite(theta).all(axis=1)
+
+
+def solve_batch(network, gas_names, concentrations, Ea, Eb, temperature, pressure, t_end,
+                reltol=1e-10, pre_exp=PRE_EXP, theta0=None):
+    """
+    Steady states of one network at many points, e.g. a whole pH x V grid.
+
+    The rate constants of every point come out of one array expression; the
+    points are then integrated together by integrate_batch().
+
+    Args:
+    network (ReactionNetwork): Network shared by every point.
+    gas_names (list): Names of the rows of concentrations.
+    concentrations (ndarray): Gas concentrations, (gases, points).
+    Ea, Eb (ndarray): Forward and backward barriers in J/mol, (reactions, points).
+    temperature (float): Temperature in K.
+    pressure (float): Total pressure the concentrations are scaled by.
+    t_end (float): Integration time.
+    reltol (float): Relative Newton tolerance.
+    pre_exp (float): Pre-exponential factor of every reaction.
+    theta0 (ndarray): Initial surface states (points, surface); a clean surface by default.
+
+    Returns:
+    BatchSolution: Surface states, gas rates and convergence flags of every point.
+    """
+    model = SteadyStateModel(network)
+    Ea = np.asarray(Ea, dtype=float).T
+    Eb = np.asarray(Eb, dtype=float).T
+    points = Ea.shape[0]
+    # Barriers far below zero overflow to inf; integrate_batch() marks those points as not converged
+    with np.errstate(over="ignore"):
+        kf = rate_constants(pre_exp, Ea, temperature)
+        kb = rate_constants(pre_exp, Eb, temperature)
+
+    concentration = dict(zip(gas_names, np.asarray(concentrations, dtype=float)))
+    gas = np.zeros((points, len(network.species)))
+    for name in model.gases:
+        if name not in concentration:
+            raise NativeSolverError(f"Gas-phase compound '{name}' has no concentration.")
+        gas[:, network.index[name]] = concentration[name] * pressure
+    if theta0 is None:
+        theta0 = np.zeros((points, len(model.surface)))
+        theta0[:, [model.surface.index(site) for site in network.sites]] = 1.0
+
+    theta, converged = integrate_batch(model, gas, kf, kb, theta0, t_end, reltol)
+    with np.errstate(over="ignore", invalid="ignore"):
+        _, _, rates, _ = model.evaluate_batch(theta, gas, kf, kb)
+        gas_rates = rates @ model.gas_stoichiometry.toarray().T
+    return BatchSolution(model.surface, theta, model.gases, gas[:, network.kind == GAS], gas_rates, rates,
+                         converged)
+
+
+def _write_dat(path, names, rows):
+    with open(path, "w") as f:
+        f.write("\t".join(names) + "\n")
+        for row in rows:
+            f.write("\t".join(f"{value:.12e}" for value in row) + "\n")
+
+
+def solve_input(input_file, workdir):
+    """
+    Solves every &runs row of an input file in-process and writes run/range like mkmcxx.
+
+    run/range/coverage.dat holds the final activity of every compound and
+    run/range/derivatives.dat the time derivatives (for gases: production
+    rates), one row per &runs row. run/networkplots receives a flux file in
+    the mkmcxx layout, read back by network_flux, and a Graphviz .dot network
+    per &runs row.
+
+    Args:
+    input_file (str): Path of the .mkm file.
+    workdir (str): Folder the run/ tree is written to.
+
+    Returns:
+    str: Log of the run, in the spirit of the mkmcxx stdout.
+
+    Raises:
+    NativeSolverError: When the input is not supported or a run does not converge.
+    """
+    start = time.perf_counter()
+    mkm = read_mkm(input_file)
+    if not mkm.runs:
+        raise NativeSolverError("The input file has no &runs rows.")
+    for name, value in zip(mkm.compounds, mkm.values):
+        if not np.isfinite(value):
+            raise NativeSolverError(f"Compound '{name}' has a non-finite concentration or activity ({value}).")
+    if not (np.all(np.isfinite(mkm.Ea)) and np.all(np.isfinite(mkm.Eb))):
+        raise NativeSolverError("The input file has non-finite barriers.")
+    try:
+        model = SteadyStateModel(ReactionNetwork(mkm.reactions))
+    except ValueError as e:
+        raise NativeSolverError(str(e))
+
+    value = dict(zip(mkm.compounds, mkm.values))
+    site = dict(zip(mkm.compounds, mkm.is_site))
+    network = model.network
+    gas = np.zeros(len(network.species))
+    for name in model.gases:
+        if site.get(name, True):
+            raise NativeSolverError(f"Gas-phase compound '{name}' is missing from &compounds.")
+        gas[network.index[name]] = value[name] * mkm.pressure
+    theta0 = np.array([value.get(name, 0.0) for name in model.surface])
+
+    log = ["Native steady-state solver", "Opening input file", "Performing SEQUENCERUN"]
+    coverage_rows, derivative_rows, fluxes = [], [], []
+    for n, run in enumerate(mkm.runs, start=1):
+        kf = rate_constants(mkm.pre_f, mkm.Ea, run.temperature)
+        kb = rate_constants(mkm.pre_b, mkm.Eb, run.temperature)
+        theta, steps = integrate(model, gas, kf, kb, theta0, run.time, run.reltol)
+        f, _, rates, _ = model.evaluate(theta, gas, kf, kb)
+        surface = dict(zip(model.surface, theta))
+        surface_rate = dict(zip(model.surface, f))
+        gas_rate = dict(zip(model.gases, model.gas_stoichiometry @ rates))
+        fluxes.append((run.temperature, model.fluxes(theta, gas, kf, kb), rates))
+        coverage_rows.append([surface.get(name, value[name]) for name in mkm.compounds])
+        derivative_rows.append([surface_rate.get(name, gas_rate.get(name, 0.0)) for name in mkm.compounds])
+        log.append(f"Run {n}: T={run.temperature:g} K, V={run.potential:g}, {steps} steps")
+    log.append("Finalizing SEQUENCERUN")
+
+    range_folder = os.path.join(workdir, "run", "range")
+    os.makedirs(range_folder, exist_ok=True)
+    _write_dat(os.path.join(range_folder, "coverage.dat"), mkm.compounds, coverage_rows)
+    _write_dat(os.path.join(range_folder, "derivatives.dat"), mkm.compounds, derivative_rows)
+    # Same file names as the mkmcxx networkplots: flux_<run>_<temperature>K.txt
+    plots_folder = os.path.join(workdir, "run", "networkplots")
+    os.makedirs(plots_folder, exist_ok=True)
+    for n, (temperature, (forward, backward), rates) in enumerate(fluxes, start=1):
+        name = f"{n:02d}_{int(round(temperature)):04d}K"
+        write_flux(os.path.join(plots_folder, f"flux_{name}.txt"), network, forward, backward)
+        write_dot(os.path.join(plots_folder, f"network_{name}.dot"), network, rates)
+    log.append(f"Total execution time: {time.perf_counter() - start:.3f} s")
+    return "\n".join(log)
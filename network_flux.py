@@ -0,0 +1,234 @@
+import os
+import re
+import glob
+from collections import namedtuple
+
+import numpy as np
+
+from reaction_network import GAS, FREE_SITE
+
+# One link of a flux file: a reagent node -> product node edge of the network.
+# reaction is the 0-based index of the only reaction with that edge, None if unknown or ambiguous
+FluxRecord = namedtuple("FluxRecord", ["reaction", "source", "target", "forward", "backward", "net"])
+
+# Column headers of the mkmcxx flux_*.txt files
+FLUX_COLUMNS = ("Left", "Right", "Flux", "R_FORW", "R_BACK")
+
+
+def normalize_node(name):
+    """Node name without braces or whitespace, e.g. '{CO*}' -> 'CO*'."""
+    return re.sub(r"[{}\s]", "", name)
+
+
+def edge_index(network):
+    """
+    Maps every reactant -> product edge of the network to the reaction it belongs to.
+
+    Edges shared by several reactions cannot tell them apart and map to None.
+
+    Args:
+    network (ReactionNetwork): Network of the workbook.
+
+    Returns:
+    dict: (source, target) -> reaction index or None.
+    """
+    index = {}
+    for j in range(len(network)):
+        for source in dict.fromkeys(network.reactants(j)):
+            for target in dict.fromkeys(network.products(j)):
+                index[source, target] = j if index.get((source, target), j) == j else None
+    return index
+
+
+def iter_flux(path, network=None):
+    """
+    Streams the links of an mkmcxx flux file, one line at a time.
+
+    The layout is the one mkmcxx writes to run/networkplots/flux_<run>_<T>K.txt:
+    a header row 'Left  Right  Flux  R_FORW  R_BACK' followed by one row per
+    network edge, the five fields tab separated and right-aligned to 20
+    characters ('%20s\t%20s\t%20.6e\t%20.6e\t%20.6e'). Flux is the net rate
+    of the reaction the edge belongs to, R_FORW and R_BACK its forward and
+    backward rates. Lines without five tab-separated fields are skipped.
+
+    Args:
+    path (str): Path of a flux_*.txt file.
+    network (ReactionNetwork): Network of the workbook, used to resolve edges to reactions.
+
+    Yields:
+    FluxRecord: One record per edge.
+    """
+    index = edge_index(network) if network is not None else {}
+    with open(path, errors="replace") as f:
+        for line in f:
+            fields = [field.strip() for field in line.rstrip("\n").split("\t")]
+            if len(fields) != len(FLUX_COLUMNS) or fields[0] == FLUX_COLUMNS[0]:
+                continue
+            source, target = normalize_node(fields[0]), normalize_node(fields[1])
+            net, forward, backward = (float(value) for value in fields[2:])
+            yield FluxRecord(index.get((source, target)), source, target, forward, backward, net)
+
+
+def flux_files(folder):
+    """flux_*.txt files of a run folder, in run order."""
+    return sorted(glob.glob(os.path.join(folder, "run", "networkplots", "flux_*.txt")))
+
+
+def point_fluxes(folder, network, run=-1):
+    """
+    Edge records of one run of a point folder.
+
+    Args:
+    folder (str): Point folder holding run/networkplots.
+    network (ReactionNetwork): Network of the workbook.
+    run (int): Which flux file to read when the run had several &runs rows.
+
+    Returns:
+    list: FluxRecord entries; empty when the solver wrote no flux file.
+    """
+    files = flux_files(folder)
+    return list(iter_flux(files[run], network)) if files else []
+
+
+def net_rates(folder, network, run=-1):
+    """
+    Net flux of every reaction of a point, keyed by reaction string (for SweepResults.collect).
+
+    Reactions none of whose edges could be told apart from another
+    reaction's are left out, and are NaN in the collected results.
+
+    Args:
+    folder (str): Point folder holding run/networkplots.
+    network (ReactionNetwork): Network of the workbook.
+    run (int): Which flux file to read when the run had several &runs rows.
+
+    Returns:
+    dict: Reaction -> net flux, or None when the point has no flux file.
+
+    Raises:
+    ValueError: When the flux file has no edge of the workbook's network.
+    """
+    files = flux_files(folder)
+    if not files:
+        return None
+    rates = {}
+    for record in iter_flux(files[run], network):
+        if record.reaction is not None:
+            rates.setdefault(network.reactions[record.reaction], record.net)
+    if not rates:
+        raise ValueError(f"{files[run]} has no edge of the workbook's reaction network.")
+    return rates
+
+
+def dominant_pathway(results, pH, V, fraction=0.05):
+    """
+    Reactions carrying most of the flux at one grid point.
+
+    Args:
+    results (SweepResults): Store holding net reaction rates.
+    pH (float): pH of the point.
+    V (float): Potential of the point.
+    fraction (float): Reactions whose |net flux| is below fraction x the largest are left out.
+
+    Returns:
+    DataFrame: Reaction, net flux and share of the largest flux, largest first.
+    """
+    import pandas as pd
+
+    i = int(np.argmin(np.abs(results.pH - pH)))
+    j = int(np.argmin(np.abs(results.V - V)))
+    net = np.asarray(results.rates[i, j])
+    magnitude = np.abs(net)
+    if not np.isfinite(magnitude).any() or np.nanmax(magnitude) == 0:
+        return pd.DataFrame(columns=["Reaction", "Net flux", "Share"])
+    share = magnitude / np.nanmax(magnitude)
+    order = [k for k in np.argsort(-np.nan_to_num(magnitude)) if share[k] >= fraction]
+    return pd.DataFrame({"Reaction": [results.reactions[k] for k in order],
+                         "Net flux": net[order], "Share": share[order]})
+
+
+def write_flux(path, network, forward, backward):
+    """Writes a flux file in the mkmcxx layout iter_flux() reads, one row per reactant -> product edge."""
+    with open(path, "w") as f:
+        f.write("\t".join(f"{name:>20s}" for name in FLUX_COLUMNS) + "\n")
+        for j in range(len(network)):
+            for source in dict.fromkeys(network.reactants(j)):
+                for target in dict.fromkeys(network.products(j)):
+                    f.write(f"{source:>20s}\t{target:>20s}\t{forward[j] - backward[j]:20.6e}\t"
+                            f"{forward[j]:20.6e}\t{backward[j]:20.6e}\n")
+
+
+def write_dot(path, network, net):
+    """Writes a Graphviz network of reactant -> product edges labelled with the net flux."""
+    with open(path, "w") as f:
+        f.write("digraph network {\n")
+        for j in range(len(network)):
+            reactants, products = network.reactants(j), network.products(j)
+            if net[j] < 0:
+                reactants, products = products, reactants
+            for source in dict.fromkeys(reactants):
+                for target in dict.fromkeys(products):
+                    f.write(f'  "{source}" -> "{target}" [label="{abs(net[j]):.3e}"];\n')
+        f.write("}\n")
+
+
+def _layout(network):
+    # Gases on the left, adsorbates in the middle, free sites on the right
+    columns = {GAS: [], FREE_SITE: []}
+    adsorbates = []
+    for name in network.species:
+        kind = network.kind[network.index[name]]
+        columns.get(kind, adsorbates).append(name)
+    positions = {}
+    for x, names in enumerate((columns[GAS], adsorbates, columns[FREE_SITE])):
+        for y, name in enumerate(names):
+            positions[name] = (x, -y + (len(names) - 1) / 2)
+    return positions
+
+
+def draw_flux_graph(network, net, title=None):
+    """
+    Draws the reaction network with matplotlib, with arrows along the net flux.
+
+    Arrow widths scale with log10 |net flux|; no Graphviz is needed.
+
+    Args:
+    network (ReactionNetwork): Network of the workbook.
+    net (list): Net flux of every reaction, NaN where unknown.
+    title (str): Figure title.
+
+    Returns:
+    Figure: The matplotlib figure.
+    """
+    import matplotlib.pyplot as plt
+
+    positions = _layout(network)
+    net = np.asarray(net, dtype=float)
+    magnitude = np.log10(np.maximum(np.abs(np.nan_to_num(net)), 1e-300))
+    known = np.isfinite(net) & (net != 0)
+    low, high = (magnitude[known].min(), magnitude[known].max()) if known.any() else (0.0, 1.0)
+
+    fig, ax = plt.subplots(figsize=(9, max(4, 0.8 * len(network.species))))
+    for j in np.nonzero(known)[0]:
+        reactants, products = network.reactants(j), network.products(j)
+        if net[j] < 0:
+            reactants, products = products, reactants
+        width = 0.5 + 4.0 * (magnitude[j] - low) / (high - low if high > low else 1.0)
+        for source in dict.fromkeys(reactants):
+            for target in dict.fromkeys(products):
+                (x0, y0), (x1, y1) = positions[source], positions[target]
+                ax.annotate("", xy=(x1, y1), xytext=(x0, y0),
+                            arrowprops=dict(arrowstyle="-|>", lw=width, alpha=0.6, color="tab:blue",
+                                            shrinkA=14, shrinkB=14, connectionstyle="arc3,rad=0.15"))
+                ax.text((x0 + x1) / 2, (y0 + y1) / 2, f"{abs(net[j]):.1e}", fontsize=7, ha="center")
+    for name, (x, y) in positions.items():
+        ax.text(x, y, name, ha="center", va="center", fontsize=10,
+                bbox=dict(boxstyle="round", facecolor="white", edgecolor="gray"))
+    xs = [x for x, _ in positions.values()]
+    ys = [y for _, y in positions.values()]
+    ax.set_xlim(min(xs) - 0.5, max(xs) + 0.5)
+    ax.set_ylim(min(ys) - 0.8, max(ys) + 0.8)
+    ax.axis("off")
+    if title:
+        ax.set_title(title)
+    return fig
@@ -1,63 +1,84 @@
 import streamlit as st
-import pandas as pd
 import os
 import sys
-import shutil
-from openpyxl import load_workbook
 from io import BytesIO
-import numpy as np
+import time
+from contextlib import closing
 
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
 sys.path.append(parent_dir)
-from inp_file_multiple2 import *
-from utility import *
+from utility import session_folder, point_folder, point_coverage_path, coverage, plot_coverage_data, cancel_button
+from sweep import (default_workers, run_sweep, timing_summary, StageUpdate, continuation_chains,
+                   run_continuation, run_pipeline, UP_TO_DATE)
+from result_cache import get_cache
+import job_queue
+from sweep_manifest import SweepManifest, MANIFEST_NAME
+
+# numpy, pandas, scipy and openpyxl are imported by the handlers that use them, so the
+# page renders before a workbook is uploaded without loading them; see import_audit.py
 
 st.set_page_config(
     page_title="MKM Input File Generator and Solver",
-    page_icon=":coffee:",
+    page_icon="☕",
 )
 
 st.title("MKM Input File Generator and Solver")
-st.page_icon = ":coffee:"
+
+st.page_icon = "☕"
 
 def main():
     #os.chdir("D:/projects/mkm_shell/alternative")  # Adjust as per your directory
 
+    # Every browser session sweeps in its own folder: multiple_run/session_x/pH_y/V_z
+    run_root = session_folder("multiple_run")
+    # Coverages and reaction fluxes of the last sweep, as (pH, V, species) and (pH, V, reaction) arrays
+    results_file = os.path.join(run_root, "results.json")
+
+    def coverage_path(pH, V):
+        return point_coverage_path(run_root, pH, V)
+
     # Upload Excel file
     uploaded_file = st.file_uploader("Upload Excel File", type="xlsx")
 
+    def point_rates(pH, V):
+        # Net reaction fluxes from the point's run/networkplots, matched to the workbook's reactions
+        if not uploaded_file:
+            return None
+        from network_flux import net_rates
+        from workbook import load_mkm_workbook
+        try:
+            return net_rates(point_folder(run_root, pH, V), load_mkm_workbook(uploaded_file).network)
+        except ValueError as e:
+            st.warning(f"No fluxes for pH={pH}, V={V}: {str(e)}")
+            return None
+
     # Lists for dropdown selection
     pH_l = [round(x * 0.5, 1) for x in range(0, 29)]  # pH from 0.0 to 14.0
     V_l = [round(x * 0.1, 1) for x in range(-10, 11)]  # V from -1.0 to 1.0
 
     # Dropdowns for selecting pH and potential
     pH_list = st.multiselect("Select pH Values", pH_l)
+
+    # The adaptive mode picks the potentials itself, refining only where coverages change
+    mode = st.radio("Potential grid", ["Fixed grid", "Adaptive refinement"], horizontal=True)
+    if mode == "Adaptive refinement":
+        adaptive_sweep(uploaded_file, pH_list, run_root, results_file)
+        with st.expander("Reaction flux"):
+            flux_view(uploaded_file, results_file)
+        return
+
     V_list = st.multiselect("Select Potential Values", V_l)
 
-    # Generate Input Files Button
-    if st.button("Generate Modified Excel Files"):
+    # Per-point workbooks are only materialized when the user wants to download them
+    if st.button("Download Modified Excel Files"):
         if not uploaded_file:
             st.error("Please upload an Excel file first.")
             return
 
         for pH in pH_list:
-            #parent_folder = os.path.join(os.getcwd(), f"pH_{pH}")
-            parent_folder = os.path.join(os.getcwd(), "multiple_run", f"pH_{pH}")
-
-            #print(f"Parent folder for pH={pH}: {parent_folder}")  # Debugging line
-            if not os.path.exists(parent_folder):
-                os.makedirs(parent_folder)
-
             for V in V_list:
-                children_folder = os.path.join(parent_folder, f"V_{V}")
-                #print(f"Children folder for pH={pH}, V={V}: {children_folder}")  # Debugging line
-
-                if not os.path.exists(children_folder):
-                    os.makedirs(children_folder)
-
                 try:
-                    buffer = modify_excel(children_folder, pH, V, uploaded_file)
-                    st.write(f"Excel file modified for pH={pH}, V={V} in {children_folder}")
+                    buffer = modify_excel(pH, V, uploaded_file)
 
                     # Display download button with a unique key for Excel file
                     st.download_button(
@@ -76,27 +97,19 @@ def main():
         if not uploaded_file:
             st.error("Please upload an Excel file first.")
             return
+        from inp_file_multiple2 import write_point_input
 
         if not pH_list or not V_list:
             st.error("Please select at least one pH and potential value.")
             return
 
         for pH in pH_list:
-            #parent_folder = os.path.join(os.getcwd(), f"pH_{pH}")
-            parent_folder = os.path.join(os.getcwd(), "multiple_run", f"pH_{pH}")
-
             for V in V_list:
-                children_folder = os.path.join(parent_folder, f"V_{V}")
-                input_file_path = os.path.join(children_folder, "inp_file.xlsx")
-
-                if not os.path.exists(input_file_path):
-                    st.write(input_file_path)
-                    st.error(f"Input file not found for pH={pH}, V={V}. Generate files first.")
-                    return
+                children_folder = point_folder(run_root, pH, V)
 
                 try:
-                    inp_file_gen_multiple(input_file_path, children_folder)  # Call the function to generate .mkm files
-                    mkm_file_path = os.path.join(children_folder, "input_file.mkm")
+                    # pH and V go straight to the generator; no per-point workbook is written
+                    mkm_file_path = write_point_input(uploaded_file, children_folder, pH, V)
                     if os.path.exists(mkm_file_path):
                         st.success(f"Solver successfully generated files for pH={pH}, V={V}. .mkm file found: {mkm_file_path}")
 
@@ -121,51 +134,540 @@ def main():
 
                     return
 
-    if st.button("Run Solver for All Files"):
+    omp_threads, workers, cache, timeout, native = solver_settings()
+
+    # Continuation: each potential starts from the converged coverages of the previous one
+    warm_start = st.checkbox("Warm-start every potential from its converged neighbour "
+                             "(the potentials of a pH run in order along V)")
+
+    # The sweep manifest remembers which points were solved from which input
+    resume = st.checkbox("Skip points already solved from the same inputs (resumes an interrupted sweep)", value=True)
+
+    # Background sweeps run in a worker process, so reruns of this page do not abandon them
+    background = st.checkbox("Run in the background (the sweep survives page reruns; inputs are written by the worker)")
+
+    run_all = st.button("Run Solver for All Files")
+
+    # Writes every input during the sweep, so the first solver starts right after the first input
+    pipelined = st.button("Run Sweep (generate inputs and solve in one pass)")
+    run_all = run_all or pipelined
+
+    if run_all and background:
+        if not uploaded_file:
+            st.error("Please upload an Excel file first; the worker writes the inputs from it.")
+            return
+        if not pH_list or not V_list:
+            st.error("Please select at least one pH and potential value.")
+            return
+        from workbook import load_mkm_workbook
+        options = dict(workers=workers, omp_threads=omp_threads, timeout=timeout, native=native,
+                       warm_start=warm_start, cache_bytes=cache.max_bytes if cache is not None else None)
+        job_id = job_queue.submit(load_mkm_workbook(uploaded_file).data, pH_list, V_list, run_root, options)
+        st.success(f"Sweep queued as job {job_id}; its progress is shown under Background jobs.")
+
+    if run_all and not background:
         if not pH_list or not V_list:
             st.error("Please select at least one pH and potential value.")
             return
+        if (warm_start or pipelined) and not uploaded_file:
+            st.error("Please upload an Excel file first; the inputs are written during the sweep.")
+            return
+        from inp_file_multiple2 import write_point_input
+        from sweep_results import SweepResults
+        from workbook import load_mkm_workbook
 
         all_success = True  # To track overall success
+        points = []
         for pH in pH_list:
-            #parent_folder = os.path.join(os.getcwd(), f"pH_{pH}")
-            parent_folder = os.path.join(os.getcwd(), "multiple_run", f"pH_{pH}")
-
             for V in V_list:
-                children_folder = os.path.join(parent_folder, f"V_{V}")
+                children_folder = point_folder(run_root, pH, V)
                 input_file_path = os.path.join(children_folder, "input_file.mkm")
 
-                if not os.path.exists(input_file_path):
+                if not warm_start and not pipelined and not os.path.exists(input_file_path):
                     st.error(f".mkm file not found for pH={pH}, V={V}. Generate files first.")
                     all_success = False
                     continue
-
-                try:
-                    # Run the executable for the input file
-                    result_message, success = run_executable(input_file_path)
-                    if success:
-                        st.success(f"Solver successfully ran for pH={pH}, V={V}: {result_message}")
-                        #coverage()  # If there's additional functionality, include it here
-                        #plot_coverage_data([pH], [V])  # Plot for this particular pH and V combination
-                        coverage()
-
+                points.append((pH, V, children_folder))
+
+        # Only missing, failed or stale points run; the others keep their results.
+        # Inputs written during the sweep are only compared once they are rewritten.
+        manifest = SweepManifest(run_root)
+        workbook_digest = load_mkm_workbook(uploaded_file).digest if uploaded_file else None
+        current = ((lambda folder: manifest.is_current(folder, workbook_digest))
+                   if resume and (warm_start or pipelined) else None)
+        if resume and not (warm_start or pipelined):
+            points, up_to_date = manifest.split(points, workbook_digest)
+            if up_to_date:
+                st.info(f"{len(up_to_date)} points are up to date and were skipped; running {len(points)}.")
+
+        # Stream results into the page as the runs finish. Cancel sets the event the sweep
+        # polls; Stop interrupts this script, and closing the sweep then kills every running solver.
+        cancel = cancel_button("Cancel sweep", "sweep_cancel")
+        progress = st.progress(0.0)
+        stage_panel = st.empty()
+        stages = {}
+        results = []
+        skipped = 0
+        start = time.perf_counter()
+        try:
+            if warm_start:
+                def prepare(pH, V, folder, seed):
+                    write_point_input(uploaded_file, folder, pH, V, seed)
+
+                sweep = run_continuation(continuation_chains(points), prepare, workers=workers,
+                                         omp_threads=omp_threads, cache=cache, timeout=timeout, stream=True,
+                                         native=native, cancel=cancel, current=current)
+            elif pipelined:
+                def prepare(pH, V, folder):
+                    write_point_input(uploaded_file, folder, pH, V)
+
+                sweep = run_pipeline(points, prepare, workers=workers, omp_threads=omp_threads, cache=cache,
+                                     timeout=timeout, stream=True, native=native, cancel=cancel,
+                                     current=current)
+            else:
+                sweep = run_sweep(points, workers=workers, omp_threads=omp_threads, cache=cache,
+                                  timeout=timeout, stream=True, native=native, cancel=cancel)
+            with closing(sweep):
+                for result in sweep:
+                    if isinstance(result, StageUpdate):
+                        # Live view of the stage every in-flight run has reached
+                        stages[result.pH, str(result.V)] = result.stage
+                        stage_panel.text("\n".join(f"pH={pH}, V={V}: {stage}" for (pH, V), stage in stages.items()))
+                        continue
+                    stages.pop((result.pH, str(result.V)), None)
+                    stage_panel.text("\n".join(f"pH={pH}, V={V}: {stage}" for (pH, V), stage in stages.items()))
+                    if result.message == UP_TO_DATE:
+                        # Rewritten input identical to the one solved before; its results stand
+                        skipped += 1
+                        progress.progress((len(results) + skipped) / len(points))
+                        continue
+                    results.append(result)
+                    manifest.record(result.folder, result.success, result.elapsed, result.message, workbook_digest)
+                    progress.progress((len(results) + skipped) / len(points))
+                    if result.success:
+                        st.success(f"Solver successfully ran for pH={result.pH}, V={result.V} "
+                                   f"in {result.elapsed:.2f} s: {result.message}")
+                        coverage(os.path.join(result.folder, "run", "range", "coverage.dat"))
                     else:
-                        st.error(f"Solver failed for pH={pH}, V={V}: {result_message}")
+                        st.error(f"Solver failed for pH={result.pH}, V={result.V}: {result.message}")
                         all_success = False
-                except Exception as e:
-                    st.error(f"Error running solver for pH={pH}, V={V}: {str(e)}")
-                    all_success = False
+        except Exception as e:
+            st.error(f"Error running solver sweep: {str(e)}")
+            all_success = False
+
+        if cancel.is_set():
+            st.warning(f"Sweep cancelled after {len(results)} of {len(points)} points.")
+            all_success = False
+        if skipped:
+            st.info(f"{skipped} points were up to date and were not run again.")
+        if results:
+            manifest.compact()
+            st.info(timing_summary(results, time.perf_counter() - start))
+
+        if cache is not None:
+            stats = cache.stats()
+            hits, misses, size = st.columns(3)
+            hits.metric("Cache hits", stats["hits"])
+            misses.metric("Cache misses", stats["misses"])
+            size.metric("Cache size", f"{stats['bytes'] / 1024 / 1024:.1f} MB ({stats['entries']} runs)")
+
+        # Consolidate the coverages of the sweep into one array file for plotting
+        results_store = SweepResults.collect(sorted(pH_list), sorted(V_list), coverage_path, point_rates,
+                                             last_run_failed(run_root))
+        results_store.save(results_file)
 
         if all_success:
             st.success("Solver ran successfully for all files.")
         else:
             st.warning("Solver encountered errors for some files.")
 
+    # Sweeps queued by this session, polled without rerunning the rest of the page
+    job_panel(run_root)
+
+    # Every grid point in one vectorized native solve; points that do not converge go to mkmcxx
+    if st.button("Solve All Points in One Batch (native solver)"):
+        if not uploaded_file:
+            st.error("Please upload an Excel file first.")
+            return
+        if not pH_list or not V_list:
+            st.error("Please select at least one pH and potential value.")
+            return
+        import numpy as np
+        from inp_file_multiple2 import solve_grid_native, write_point_input
+        from sweep_results import SweepResults
+        from workbook import load_mkm_workbook
+
+        start = time.perf_counter()
+        results_store, converged, reasons = solve_grid_native(uploaded_file, sorted(pH_list), sorted(V_list))
+        st.info(f"Solved {converged.sum()} of {converged.size} points in one batch "
+                f"in {time.perf_counter() - start:.2f} s.")
+
+        failed = [(pH, V) for i, pH in enumerate(results_store.pH) for j, V in enumerate(results_store.V)
+                  if not converged[i, j]]
+        if failed:
+            st.warning(f"{len(failed)} points did not converge; running them with mkmcxx.")
+            st.dataframe([{"pH": pH, "V": V, "Reason": reasons[i, j]}
+                          for i, pH in enumerate(results_store.pH) for j, V in enumerate(results_store.V)
+                          if not converged[i, j]])
+            # Failures are recorded, so the outputs of earlier runs of those points are not merged
+            manifest = SweepManifest(run_root)
+            workbook_digest = load_mkm_workbook(uploaded_file).digest
+            points = []
+            for pH, V in failed:
+                folder = point_folder(run_root, pH, V)
+                try:
+                    write_point_input(uploaded_file, folder, pH, V)
+                except Exception as e:
+                    st.error(f"Error writing the input for pH={pH}, V={V}: {str(e)}")
+                    manifest.record(folder, False, 0.0, str(e), workbook_digest)
+                    continue
+                points.append((pH, V, folder))
+            sweep = run_sweep(points, workers=workers, omp_threads=omp_threads, cache=cache, timeout=timeout)
+            with closing(sweep):
+                for result in sweep:
+                    manifest.record(result.folder, result.success, result.elapsed, result.message, workbook_digest)
+                    if not result.success:
+                        st.error(f"Solver failed for pH={result.pH}, V={result.V}: {result.message}")
+            # Merge the mkmcxx results of those points into the batch results
+            fallback = SweepResults.collect(results_store.pH, results_store.V, coverage_path, point_rates,
+                                            last_run_failed(run_root))
+            for k, name in enumerate(results_store.species):
+                if name in fallback.species:
+                    missing = np.isnan(results_store.coverage[..., k])
+                    results_store.coverage[..., k][missing] = fallback.coverage[..., fallback.species_index(name)][missing]
+            for k, name in enumerate(results_store.reactions):
+                if name in fallback.reactions:
+                    missing = np.isnan(results_store.rates[..., k])
+                    results_store.rates[..., k][missing] = fallback.rates[..., fallback.reaction_index(name)][missing]
+
+        results_store.save(results_file)
+        plot_coverage_data(pH_list, V_list, results_store)
+
+    # Degree of rate control and apparent activation energy over the selected grid
+    with st.expander("Sensitivity analysis"):
+        sensitivity_analysis(uploaded_file, pH_list, V_list, run_root, workers, omp_threads, cache, timeout, native)
+
+    # Dominant pathway and flux graph of one point of the last sweep
+    with st.expander("Reaction flux"):
+        flux_view(uploaded_file, results_file)
+
+    if st.button("Plot Coverage"):
+        if not pH_list or not V_list:
+            st.error("Please select at least one pH and potential value.")
+            return
+        from sweep_results import SweepResults, outdated
+
+        # Reuse the consolidated results when they cover the selected grid and no point
+        # was solved, and no sweep or background job recorded a run, since they were saved
+        sources = [coverage_path(pH, V) for pH in pH_list for V in V_list]
+        sources.append(os.path.join(run_root, MANIFEST_NAME))
+        results_store = None
+        if not outdated(results_file, sources):
+            results_store = SweepResults.load(results_file)
+        if results_store is None or not results_store.matches(sorted(pH_list), sorted(V_list)):
+            results_store = SweepResults.collect(sorted(pH_list), sorted(V_list), coverage_path, point_rates,
+                                                 last_run_failed(run_root))
+            results_store.save(results_file)
+        plot_coverage_data(pH_list, V_list, results_store)
+
+
+def last_run_failed(run_root):
+    """
+    skip() for SweepResults.collect: points whose last recorded run failed.
+
+    A failed rerun leaves the run/ of an earlier run in place, which must not be shown as its result.
+    """
+    manifest = SweepManifest(run_root)
+    return lambda pH, V: manifest.failed(point_folder(run_root, pH, V))
+
+
+@st.fragment(run_every=2)
+def job_panel(run_root):
+    """
+    Progress of the background sweeps of this session, refreshed every two seconds.
+    """
+    jobs = job_queue.list_jobs(run_root)
+    if not jobs:
+        return
+    active = [job for job in jobs if job.status not in job_queue.FINISHED]
+    if active:
+        # Restarts a worker that died or went idle, and requeues the jobs it held
+        job_queue.ensure_worker()
+
+    st.subheader("Background jobs")
+    for job in jobs[:5]:
+        counts = job_queue.job_progress(job.id)
+        total = sum(counts.values())
+        finished = counts.get(job_queue.DONE, 0) + counts.get(job_queue.FAILED, 0)
+        st.write(f"Job {job.id} ({len(job.pH_list)} pH x {len(job.V_list)} V): {job.status}, "
+                 f"{finished} of {total} points finished")
+        st.progress(finished / total if total else 1.0)
+        if job in active:
+            stages = [f"pH={point.pH}, V={point.V}: {point.stage}" for point in job_queue.job_points(job.id)
+                      if point.status == job_queue.RUNNING and point.stage]
+            if stages:
+                st.text("\n".join(stages))
+            if st.button("Cancel job", key=f"cancel_{job.id}"):
+                job_queue.cancel(job.id)
+        elif job.status == job_queue.DONE:
+            st.success(f"{job.message} Press Plot Coverage to load the results.")
+        elif job.message:
+            st.warning(job.message)
+            failed = [point for point in job_queue.job_points(job.id) if point.status == job_queue.FAILED]
+            for point in failed[:10]:
+                st.error(f"Solver failed for pH={point.pH}, V={point.V}: {point.message}")
+
+
+def solver_settings():
+    """
+    Solver controls shared by the fixed and adaptive sweeps.
+
+    Returns:
+    tuple: (omp_threads, workers, cache, timeout, native)
+    """
+    # The in-process solver handles small networks without starting mkmcxx
+    native = st.checkbox("Use the native Python solver (falls back to mkmcxx when it does not converge)")
+
+    # Solver parallelism: one mkmcxx process per worker, each with its own OpenMP threads
+    omp_threads = st.number_input("OpenMP threads per solver run", min_value=1, value=1, step=1)
+    workers = st.number_input("Parallel solver runs", min_value=1, value=default_workers(omp_threads), step=1)
+
+    # Byte-identical inputs are served from the on-disk result cache
+    use_cache = st.checkbox("Reuse cached solver results", value=True)
+    cache_size = st.number_input("Result cache size (MB)", min_value=1, value=512, step=64)
+    cache = get_cache(int(cache_size) * 1024 * 1024) if use_cache else None
+
+    # Runs exceeding the wall-clock limit are killed and reported as failed; 0 disables the limit
+    timeout = st.number_input("Timeout per solver run (s, 0 = none)", min_value=0, value=0, step=60)
+    return int(omp_threads), int(workers), cache, timeout or None, native
+
+
+def adaptive_sweep(uploaded_file, pH_list, run_root, results_file):
+    """
+    Adaptive potential sweep: runs a coarse grid, then bisects only the intervals where
+    an adsorbate coverage or a gas rate changes by more than the tolerance.
+
+    Args:
+    uploaded_file (file): Uploaded Excel workbook.
+    pH_list (list): Selected pH values.
+    run_root (str): Session folder of the sweep.
+    results_file (str): Where the consolidated coverages are saved.
+    """
+    V_min, V_max = st.slider("Potential range (V)", -1.0, 1.0, (-1.0, 1.0), step=0.05)
+    coarse_step = st.number_input("Coarse step (V)", min_value=0.01, value=0.2, step=0.05)
+    min_step = st.number_input("Minimum step (V)", min_value=0.001, value=0.025, step=0.005, format="%.3f")
+    tolerance = st.number_input("Coverage tolerance", min_value=0.0, value=0.05, step=0.01)
+    rate_tolerance = st.number_input("Rate tolerance (decades)", min_value=0.0, value=1.0, step=0.5)
+    omp_threads, workers, cache, timeout, native = solver_settings()
+
+    if not st.button("Run Adaptive Sweep"):
+        return
+    if not uploaded_file:
+        st.error("Please upload an Excel file first.")
+        return
+    if not pH_list:
+        st.error("Please select at least one pH value.")
+        return
+    from adaptive_sweep import AdaptiveGrid, read_signal
+    from inp_file_multiple2 import write_point_input
+    from network_flux import net_rates
+    from sweep_results import SweepResults
+    from workbook import load_mkm_workbook
+
+    grids = {pH: AdaptiveGrid(V_min, V_max, coarse_step, min_step, tolerance, rate_tolerance) for pH in pH_list}
+    # Failures are recorded, so the outputs of earlier runs of those points are not collected
+    manifest = SweepManifest(run_root)
+    workbook_digest = load_mkm_workbook(uploaded_file).digest
+    status = st.empty()
+    runs = 0
+    start = time.perf_counter()
+    results = []
+    while any(grid.pending for grid in grids.values()):
+        # Write the inputs of this round, then solve them all in parallel
+        points = []
+        for pH, grid in grids.items():
+            for V in grid.pending:
+                folder = point_folder(run_root, pH, V)
+                try:
+                    write_point_input(uploaded_file, folder, pH, V)
+                except Exception as e:
+                    # Counted as a failed point, so the grid does not ask for it again
+                    st.error(f"Error writing the input for pH={pH}, V={V}: {str(e)}")
+                    manifest.record(folder, False, 0.0, str(e), workbook_digest)
+                    grid.add(V, None)
+                    continue
+                points.append((pH, V, folder))
+        status.info(f"Round {max(grid.rounds for grid in grids.values()) + 1}: running {len(points)} points")
+
+        sweep = run_sweep(points, workers=workers, omp_threads=omp_threads, cache=cache, timeout=timeout, native=native)
+        with closing(sweep):
+            for result in sweep:
+                results.append(result)
+                manifest.record(result.folder, result.success, result.elapsed, result.message, workbook_digest)
+                if not result.success:
+                    st.error(f"Solver failed for pH={result.pH}, V={result.V}: {result.message}")
+                grids[result.pH].add(result.V, read_signal(result.folder) if result.success else None)
+        runs += len(points)
+        for grid in grids.values():
+            grid.refine()
+
+    uniform = sum(grid.uniform_runs() for grid in grids.values())
+    status.success(f"Adaptive sweep finished with {runs} solver runs "
+                   f"(a uniform {min_step} V grid would need {uniform}).")
+    if results:
+        st.info(timing_summary(results, time.perf_counter() - start))
+
+    # Consolidate every potential that was run; points not run at some pH stay NaN
+    V_all = sorted(set().union(*(grid.potentials for grid in grids.values())))
+    network = load_mkm_workbook(uploaded_file).network
+
+    def rates_of(pH, V):
+        try:
+            return net_rates(point_folder(run_root, pH, V), network)
+        except ValueError as e:
+            st.warning(f"No fluxes for pH={pH}, V={V}: {str(e)}")
+            return None
+
+    results_store = SweepResults.collect(sorted(pH_list), V_all, lambda pH, V: point_coverage_path(run_root, pH, V),
+                                         rates_of, last_run_failed(run_root))
+    results_store.save(results_file)
+    plot_coverage_data(sorted(pH_list), V_all, results_store)
+
+
+def sensitivity_analysis(uploaded_file, pH_list, V_list, run_root, workers, omp_threads, cache, timeout, native):
+    """
+    Perturbs every reaction's G_f/G_b (and the temperature) at each grid point, runs all
+    distinct perturbed inputs concurrently and shows the degree of rate control and the
+    apparent activation energy.
+    """
+    if not uploaded_file:
+        st.write("Upload an Excel file to run a sensitivity analysis.")
+        return
+    import numpy as np
+    from sensitivity import DEFAULT_DELTA, DEFAULT_DT, build_variants, production_rate, analyse
+    from workbook import load_mkm_workbook
+
+    mkm_workbook = load_mkm_workbook(uploaded_file)
+    product = st.selectbox("Product whose rate is analysed", mkm_workbook.network.gases)
+    delta = st.number_input("Barrier perturbation (J/mol)", min_value=1.0, value=DEFAULT_DELTA, step=100.0)
+    dT = st.number_input("Temperature perturbation (K)", min_value=0.1, value=DEFAULT_DT, step=0.5)
+
+    if not st.button("Run Sensitivity Analysis"):
+        return
+    if not pH_list or not V_list:
+        st.error("Please select at least one pH and potential value.")
+        return
+
+    root = os.path.join(run_root, "sensitivity")
+    variants, folders = build_variants(uploaded_file, sorted(pH_list), sorted(V_list), root, delta, dT)
+    st.info(f"{len(variants)} perturbed runs, {len(folders)} distinct inputs after deduplication.")
+
+    # One run per distinct input; the result cache serves inputs solved before
+    first = {}
+    for variant in variants:
+        first.setdefault(variant.key, variant)
+    points = [(first[key].pH, first[key].V, folder) for key, folder in folders.items()]
+    progress = st.progress(0.0)
+    done = 0
+    start = time.perf_counter()
+    sweep = run_sweep(points, workers=workers, omp_threads=omp_threads, cache=cache, timeout=timeout, native=native)
+    with closing(sweep):
+        for result in sweep:
+            done += 1
+            progress.progress(done / len(points))
+            if not result.success:
+                st.error(f"Perturbed run failed for pH={result.pH}, V={result.V}: {result.message}")
+    st.info(f"Sensitivity runs finished in {time.perf_counter() - start:.2f} s.")
+
+    rates = {key: production_rate(folder, product) for key, folder in folders.items()}
+    if np.isnan(list(rates.values())).all():
+        st.error(f"No production rate of {product} found; the solver wrote no derivatives.dat.")
+        return
+    reactions = mkm_workbook.network.reactions
+    drc, eapp, skipped = analyse(variants, rates, reactions, delta, dT)
+    consumed = (eapp['Sign'] < 0).sum()
+    if consumed:
+        st.info(f"{product} is consumed at {consumed} points; the analysis there uses the magnitude of its rate.")
+    if len(skipped):
+        st.warning(f"{len(skipped)} perturbations were skipped, their rates were missing, zero or changed sign:")
+        st.dataframe(skipped)
+
+    table = drc.pivot_table(index=['pH', 'V'], columns='Reaction', values='DRC', sort=False, dropna=False)[reactions]
+    st.write(f"Degree of rate control for the production of {product}:")
+    st.dataframe(table)
+    st.write("Apparent activation energy:")
+    st.dataframe(eapp)
+
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(max(6, 0.4 * len(table)), 0.5 * len(reactions) + 2))
+    image = ax.imshow(table.T.values, aspect='auto', cmap='coolwarm', vmin=-1, vmax=1)
+    ax.set_yticks(range(len(reactions)), reactions)
+    ax.set_xticks(range(len(table)), [f"pH {pH}, {V} V" for pH, V in table.index], rotation=90)
+    ax.set_title(f"Degree of rate control ({product})")
+    fig.colorbar(image, ax=ax, label='DRC')
+    st.pyplot(fig)
+
+
+def flux_view(uploaded_file, results_file):
+    """
+    Shows the reactions carrying most of the flux at one grid point of the saved
+    sweep results, and the network drawn along the net flux.
+    """
+    if not uploaded_file or not os.path.exists(results_file):
+        st.write("Run a sweep to see the reaction fluxes.")
+        return
+    import numpy as np
+    from network_flux import dominant_pathway, draw_flux_graph
+    from sweep_results import SweepResults
+    from workbook import load_mkm_workbook
+
+    results_store = SweepResults.load(results_file)
+    if results_store is None or not results_store.reactions:
+        st.write("The last sweep wrote no flux files (run/networkplots/flux_*.txt).")
+        return
+
+    pH_column, V_column = st.columns(2)
+    pH = pH_column.selectbox("pH", results_store.pH.tolist(), key="flux_pH")
+    V = V_column.selectbox("Potential", results_store.V.tolist(), key="flux_V")
+    fraction = st.slider("Hide reactions below this share of the largest flux", 0.0, 1.0, 0.05, 0.01)
+
+    pathway = dominant_pathway(results_store, pH, V, fraction)
+    if pathway.empty:
+        st.write("No reaction fluxes at this point.")
+        return
+    st.dataframe(pathway)
+    i = int(np.argmin(np.abs(results_store.pH - pH)))
+    j = int(np.argmin(np.abs(results_store.V - V)))
+    network = load_mkm_workbook(uploaded_file).network
+    net = [results_store.rates[i, j, results_store.reaction_index(reaction)]
+           if reaction in results_store.reactions else np.nan for reaction in network.reactions]
+    import matplotlib.pyplot as plt
+
+    fig = draw_flux_graph(network, net, f"Net flux at pH {pH}, {V} V")
+    st.pyplot(fig)
+    plt.close(fig)
+
+
+def modify_excel(pH, potential, uploaded_file):
+    """
+    Builds a copy of the uploaded workbook with the given pH and potential, for download only.
+
+    Args:
+    pH (float): pH written to the 'Local Environment' sheet.
+    potential (float): Potential written to the 'Local Environment' sheet.
+    uploaded_file (file): Uploaded Excel workbook.
+
+    Returns:
+    BytesIO: The modified workbook.
+    """
+    from openpyxl import load_workbook
+    from formula_engine import find_column
+    from workbook import load_mkm_workbook
 
-def modify_excel(children_folder, pH, potential, uploaded_file):
     try:
-        # Load the uploaded Excel workbook
-        workbook = load_workbook(filename=uploaded_file)
+        # Start from the bytes of the shared parsed upload
+        workbook = load_workbook(filename=BytesIO(load_mkm_workbook(uploaded_file).data))
 
         if "Local Environment" not in workbook.sheetnames:
             st.error("Sheet 'Local Environment' not found.")
@@ -173,21 +675,13 @@ def modify_excel(children_folder, pH, potential, uploaded_file):
 
         # Access the "Local Environment" sheet
         sheet = workbook["Local Environment"]
-        sheet["B2"].value = potential
-        sheet["C2"].value = pH
+        sheet[find_column(sheet, "V") + "2"].value = potential
+        sheet[find_column(sheet, "pH") + "2"].value = pH
 
         # Save updated workbook to BytesIO buffer
         buffer = BytesIO()
         workbook.save(buffer)
         buffer.seek(0)
-
-        # Save to a file and copy to children folder
-        with open("inp_file.xlsx", "wb") as f:
-            f.write(buffer.read())
-        shutil.copy("inp_file.xlsx", children_folder)
-
-        # Return buffer for download
-        buffer.seek(0)
         return buffer
     except Exception as e:
         st.error(f"Error: {str(e)}")
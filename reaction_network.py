@@ -0,0 +1,130 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# Name of the free surface site
+SITE = '*'
+
+# Species kinds stored in ReactionNetwork.kind
+GAS, ADSORBATE, FREE_SITE = 0, 1, 2
+
+
+def species_kind(name):
+    """Classifies a species name as GAS, ADSORBATE or FREE_SITE."""
+    if name == SITE:
+        return FREE_SITE
+    return ADSORBATE if SITE in name else GAS
+
+
+def parse_reaction(reaction):
+    """
+    Splits a reaction string like 'CO*+H2O→CHO*+OH' into its two sides.
+
+    Args:
+    reaction (str): Reaction from the Reactions column.
+
+    Returns:
+    tuple: (reactants, products) lists of species names.
+    """
+    if not isinstance(reaction, str) or reaction.count("→") != 1:
+        raise ValueError(f"Reaction '{reaction}' must contain exactly one '→'.")
+    sides = []
+    for side in reaction.strip().split("→"):
+        names = [name.strip() for name in side.split("+")]
+        if not all(names):
+            raise ValueError(f"Reaction '{reaction}' has an empty species.")
+        sides.append(names)
+    return sides[0], sides[1]
+
+
+class ReactionNetwork:
+    """
+    Array-backed reaction network built from the Reactions column.
+
+    Species are interned to integer ids in order of first appearance. The
+    reactants and products of reaction j are
+    `reactant_ids[reactant_ptr[j]:reactant_ptr[j + 1]]` and
+    `product_ids[product_ptr[j]:product_ptr[j + 1]]`, and `stoichiometry`
+    is the sparse (species x reactions) matrix of net coefficients.
+    """
+
+    def __init__(self, reactions):
+        self.reactions = [str(reaction).strip() for reaction in reactions]
+        self.species = []
+        self.index = {}
+        reactant_ids, product_ids = [], []
+        self.reactant_ptr = np.zeros(len(self.reactions) + 1, dtype=np.int32)
+        self.product_ptr = np.zeros(len(self.reactions) + 1, dtype=np.int32)
+
+        for j, reaction in enumerate(self.reactions):
+            reactants, products = parse_reaction(reaction)
+            reactant_ids += [self._intern(name) for name in reactants]
+            product_ids += [self._intern(name) for name in products]
+            self.reactant_ptr[j + 1] = len(reactant_ids)
+            self.product_ptr[j + 1] = len(product_ids)
+
+        self.reactant_ids = np.array(reactant_ids, dtype=np.int32)
+        self.product_ids = np.array(product_ids, dtype=np.int32)
+        self.kind = np.array([species_kind(name) for name in self.species], dtype=np.int8)
+
+        # Net stoichiometric coefficients; repeated species (CO* + CO*) are summed
+        reaction_of = lambda ptr: np.repeat(np.arange(len(self.reactions)), np.diff(ptr))
+        self.stoichiometry = csr_matrix(
+            (np.concatenate([-np.ones(len(reactant_ids)), np.ones(len(product_ids))]),
+             (np.concatenate([self.reactant_ids, self.product_ids]),
+              np.concatenate([reaction_of(self.reactant_ptr), reaction_of(self.product_ptr)]))),
+            shape=(len(self.species), len(self.reactions)))
+
+        self.gases = [name for name in self.species if self.kind[self.index[name]] == GAS]
+        self.sites = [name for name in self.species if self.kind[self.index[name]] == FREE_SITE]
+        self.adsorbates = self._adsorbates_by_slot()
+
+    def _intern(self, name):
+        if name not in self.index:
+            self.index[name] = len(self.species)
+            self.species.append(name)
+        return self.index[name]
+
+    def _adsorbates_by_slot(self):
+        # Same order the generators have always written to &compounds: first
+        # species of every reaction, then second species, ..., reactants before products
+        ordered = {}
+        for ptr, ids in ((self.reactant_ptr, self.reactant_ids), (self.product_ptr, self.product_ids)):
+            counts = np.diff(ptr)
+            for slot in range(counts.max(initial=0)):
+                for j in np.nonzero(counts > slot)[0]:
+                    species_id = ids[ptr[j] + slot]
+                    if self.kind[species_id] == ADSORBATE:
+                        ordered.setdefault(self.species[species_id], None)
+        return list(ordered)
+
+    def __len__(self):
+        return len(self.reactions)
+
+    def is_gas(self, name):
+        """True when the species is a gas-phase compound of the network."""
+        return name in self.index and self.kind[self.index[name]] == GAS
+
+    def reactants(self, j):
+        """Reactant names of reaction j."""
+        return [self.species[i] for i in self.reactant_ids[self.reactant_ptr[j]:self.reactant_ptr[j + 1]]]
+
+    def products(self, j):
+        """Product names of reaction j."""
+        return [self.species[i] for i in self.product_ids[self.product_ptr[j]:self.product_ptr[j + 1]]]
+
+    def slot_columns(self, count=3):
+        """
+        Reactants and products as fixed slot columns of braced names, '' where a reaction has fewer species.
+
+        Args:
+        count (int): Number of slots per side.
+
+        Returns:
+        tuple: (reactant_columns, product_columns), each a list of `count` lists.
+        """
+        columns = []
+        for side in (self.reactants, self.products):
+            names = [side(j) for j in range(len(self))]
+            columns.append([["{" + species[slot] + "}" if slot < len(species) else "" for species in names]
+                            for slot in range(count)])
+        return columns[0], columns[1]
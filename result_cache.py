@@ -0,0 +1,218 @@
+import os
+import re
+import time
+import shutil
+import fcntl
+import hashlib
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+
+# Default location and size bound of the on-disk cache
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".mkm_cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Solver outputs kept for every cached run, relative to the run folder
+CACHED_OUTPUTS = [os.path.join("run", "range"), os.path.join("run", "networkplots")]
+
+_VERSION_RE = re.compile(r"Executing: mkmcxx version (.+)")
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def parse_version(stdout):
+    """
+    Extracts the version from the 'Executing: mkmcxx version ...' banner.
+
+    Returns:
+    str: The version, or None when the banner is missing.
+    """
+    match = _VERSION_RE.search(stdout or "")
+    return match.group(1).strip() if match else None
+
+
+def solver_version(executable):
+    """
+    Version of the mkmcxx binary, read once per binary from its startup banner.
+
+    Falls back to a hash of the binary when it does not print a banner.
+
+    Args:
+    executable (str): Path of the mkmcxx binary.
+
+    Returns:
+    str: Version string.
+    """
+    stat = os.stat(executable)
+    key = (executable, stat.st_mtime, stat.st_size)
+    with _versions_lock:
+        if key in _versions:
+            return _versions[key]
+        version = None
+        try:
+            # In a throwaway folder, so whatever the binary writes without an input is not left behind
+            with tempfile.TemporaryDirectory(prefix="mkm-version-") as scratch:
+                result = subprocess.run([os.path.abspath(executable)], capture_output=True, text=True,
+                                        stdin=subprocess.DEVNULL, timeout=30, cwd=scratch)
+            version = parse_version(result.stdout)
+        except Exception:
+            pass
+        if version is None:
+            with open(executable, "rb") as f:
+                version = "sha256:" + hashlib.sha256(f.read()).hexdigest()
+        _versions[key] = version
+        return version
+
+
+def _tree_size(path):
+    size = 0
+    for folder, _, files in os.walk(path):
+        for name in files:
+            size += os.path.getsize(os.path.join(folder, name))
+    return size
+
+
+class ResultCache:
+    """
+    On-disk cache of mkmcxx outputs keyed by the input file content and solver version.
+
+    Every entry is a folder holding the cached run/ outputs. Entries are
+    touched on every hit and the least recently used ones are evicted once
+    the cache grows past max_bytes. Restores hold a shared and evictions an
+    exclusive lock on root/.lock, so no entry is removed while it is copied.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @contextmanager
+    def _locked(self, mode):
+        with open(os.path.join(self.root, ".lock"), "a") as lock:
+            fcntl.flock(lock, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def key(self, input_file, version):
+        """
+        Cache key of an input file.
+
+        Args:
+        input_file (str): Path of the .mkm file.
+        version (str): Solver version.
+
+        Returns:
+        str: Hex digest of the file content and version.
+        """
+        digest = hashlib.sha256()
+        with open(input_file, "rb") as f:
+            digest.update(f.read())
+        digest.update(b"\0" + version.encode())
+        return digest.hexdigest()
+
+    def lookup(self, key, workdir):
+        """
+        Restores the cached outputs of a key into workdir.
+
+        Returns:
+        bool: True on a hit.
+        """
+        entry = os.path.join(self.root, key)
+        with self._locked(fcntl.LOCK_SH):
+            hit = os.path.isdir(entry)
+            if hit:
+                try:
+                    for output in CACHED_OUTPUTS:
+                        if os.path.isdir(os.path.join(entry, output)):
+                            shutil.copytree(os.path.join(entry, output), os.path.join(workdir, output),
+                                            dirs_exist_ok=True)
+                    now = time.time()
+                    os.utime(entry, (now, now))
+                except OSError:
+                    # The entry was damaged outside the cache; a partial restore is a miss
+                    for output in CACHED_OUTPUTS:
+                        shutil.rmtree(os.path.join(workdir, output), ignore_errors=True)
+                    hit = False
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return hit
+
+    def store(self, key, workdir):
+        """
+        Copies the outputs of a finished run into the cache and evicts old entries.
+        """
+        entry = os.path.join(self.root, key)
+        if os.path.isdir(entry):
+            return
+        staging = tempfile.mkdtemp(dir=self.root, prefix=".staging-")
+        for output in CACHED_OUTPUTS:
+            if os.path.isdir(os.path.join(workdir, output)):
+                shutil.copytree(os.path.join(workdir, output), os.path.join(staging, output))
+        try:
+            os.rename(staging, entry)
+        except OSError:
+            # Another worker stored the same key first
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        """Cached entries as (mtime, size, path), oldest first."""
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if os.path.isdir(path) and not name.startswith("."):
+                entries.append((os.path.getmtime(path), _tree_size(path), path))
+        return sorted(entries)
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        with self._lock, self._locked(fcntl.LOCK_EX):
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+    def stats(self):
+        """
+        Hit/miss counters and current size.
+
+        Returns:
+        dict: hits, misses, entries and bytes.
+        """
+        with self._locked(fcntl.LOCK_SH):
+            entries = self.entries()
+        return {"hits": self.hits, "misses": self.misses,
+                "entries": len(entries), "bytes": sum(size for _, size, _ in entries)}
+
+
+_default_cache = None
+
+
+def get_cache(max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Process-wide cache instance, so counters survive Streamlit reruns.
+
+    Args:
+    max_bytes (int): Size bound applied to the shared cache.
+
+    Returns:
+    ResultCache: The shared cache.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache()
+    _default_cache.max_bytes = max_bytes
+    return _default_cache
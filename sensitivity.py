@@ -0,0 +1,154 @@
+import os
+import hashlib
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from mkm_parameters import *
+from mkm_writer import runs_line
+from native_solver import R_GAS
+from sweep_results import read_dat
+from workbook import load_mkm_workbook
+from inp_file_multiple2 import evaluate_grid
+
+# Default perturbations: barrier shift in J/mol and temperature step in K
+DEFAULT_DELTA = 1000.0
+DEFAULT_DT = 2.0
+
+# One perturbed run of a grid point. kind is 'barrier' (index = reaction) or 'temperature';
+# sign is +1 for a raised barrier or temperature and -1 for a lowered one.
+Variant = namedtuple("Variant", ["pH", "V", "kind", "index", "sign", "key"])
+
+
+def build_variants(uploaded_file, pH_list, V_list, root, delta=DEFAULT_DELTA, dT=DEFAULT_DT):
+    """
+    Writes the perturbed input files of a degree-of-rate-control analysis.
+
+    For every grid point, the G_f and G_b of each reaction are shifted together
+    by +delta and -delta (moving the transition state, leaving the reaction
+    energy unchanged) and the temperature is shifted by +dT and -dT. Every
+    input is stored under root/<content hash>/, so identical inputs, such as
+    the same point at potentials the barriers do not depend on, are written
+    and solved only once.
+
+    Args:
+    uploaded_file (str or file): Excel workbook.
+    pH_list (list): pH values.
+    V_list (list): Potential values.
+    root (str): Folder receiving one sub-folder per distinct input.
+    delta (float): Barrier shift in J/mol.
+    dT (float): Temperature shift in K.
+
+    Returns:
+    tuple: (list of Variant, dict of key -> folder holding input_file.mkm)
+    """
+    mkm_workbook = load_mkm_workbook(uploaded_file)
+    template = mkm_workbook.template
+    values = evaluate_grid(uploaded_file, pH_list, V_list)
+    reactions = len(mkm_workbook.network)
+    variants, folders = [], {}
+
+    def add(pH, V, kind, index, sign, concentrations, Ea, Eb, temperature):
+        content = template.render(concentrations, Ea, Eb, [runs_line(V, temp=temperature)])
+        key = hashlib.sha256(content.encode()).hexdigest()[:16]
+        if key not in folders:
+            folder = os.path.join(root, key)
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, "input_file.mkm"), "w") as f:
+                f.write(content)
+            folders[key] = folder
+        variants.append(Variant(pH, V, kind, index, sign, key))
+
+    for i, pH in enumerate(pH_list):
+        for j, V in enumerate(V_list):
+            concentrations = values['Input MKMCXX'][:, i, j]
+            Ea, Eb = values['G_f'][:, i, j], values['G_b'][:, i, j]
+            for reaction in range(reactions):
+                for sign in (1, -1):
+                    shift = np.zeros(reactions)
+                    shift[reaction] = sign * delta
+                    add(pH, V, 'barrier', reaction, sign, concentrations, Ea + shift, Eb + shift, Temp)
+            for sign in (1, -1):
+                add(pH, V, 'temperature', None, sign, concentrations, Ea, Eb, Temp + sign * dT)
+    return variants, folders
+
+
+def production_rate(folder, gas):
+    """
+    Production rate of a gas from the run/range/derivatives.dat of a finished run.
+
+    Returns:
+    float: The rate of the last &runs row, NaN when the file or the column is missing.
+    """
+    path = os.path.join(folder, "run", "range", "derivatives.dat")
+    if not os.path.exists(path):
+        return np.nan
+    names, values = read_dat(path)
+    if gas not in names or not len(values):
+        return np.nan
+    return values[-1, names.index(gas)]
+
+
+def _skip_reason(up, down):
+    # Why a central difference of ln|r| cannot be taken, or None when it can
+    if not (np.isfinite(up) and np.isfinite(down)):
+        return "rate missing"
+    if up == 0 or down == 0:
+        return "rate is zero"
+    if np.sign(up) != np.sign(down):
+        return "rate changes sign"
+    return None
+
+
+def analyse(variants, rates, reactions, delta=DEFAULT_DELTA, dT=DEFAULT_DT, temperature=Temp):
+    """
+    Degree of rate control and apparent activation energy by central differences.
+
+    X_i = -RT / (2 delta) * (ln |r(G_i + delta)| - ln |r(G_i - delta)|)
+    E_app = R T^2 / (2 dT) * (ln |r(T + dT)| - ln |r(T - dT)|)
+
+    A consumed gas has a negative rate, so the magnitude is differentiated and
+    the sign of the rate is reported next to the result. Pairs of runs whose
+    rates are missing, zero or of opposite sign give NaN and are listed as skipped.
+
+    Args:
+    variants (list): Variant entries from build_variants().
+    rates (dict): Variant key -> production rate.
+    reactions (list): Reaction labels, by index.
+    delta (float): Barrier shift used for the variants, J/mol.
+    dT (float): Temperature shift used for the variants, K.
+    temperature (float): Temperature of the unperturbed runs, K.
+
+    Returns:
+    tuple: (DataFrame of pH, V, Reaction, DRC, Sign; DataFrame of pH, V, Eapp (kJ/mol), Sign;
+        DataFrame of pH, V, Perturbation, Reason of every skipped pair)
+    """
+    rate = {}
+    for variant in variants:
+        rate[variant.pH, variant.V, variant.kind, variant.index, variant.sign] = rates.get(variant.key, np.nan)
+
+    skipped = []
+
+    def log_ratio(pH, V, kind, index, label):
+        # ln |r+| - ln |r-| and the sign of the rate, NaN and 0 when skipped
+        up = rate.get((pH, V, kind, index, 1), np.nan)
+        down = rate.get((pH, V, kind, index, -1), np.nan)
+        reason = _skip_reason(up, down)
+        if reason is not None:
+            skipped.append({'pH': pH, 'V': V, 'Perturbation': label, 'Reason': reason})
+            return np.nan, 0
+        return np.log(abs(up)) - np.log(abs(down)), int(np.sign(up))
+
+    points = list(dict.fromkeys((variant.pH, variant.V) for variant in variants))
+    drc, eapp = [], []
+    for pH, V in points:
+        for index, reaction in enumerate(reactions):
+            difference, sign = log_ratio(pH, V, 'barrier', index, reaction)
+            drc.append({'pH': pH, 'V': V, 'Reaction': reaction,
+                        'DRC': -R_GAS * temperature / (2 * delta) * difference, 'Sign': sign})
+        difference, sign = log_ratio(pH, V, 'temperature', None, 'Temperature')
+        eapp.append({'pH': pH, 'V': V, 'Eapp (kJ/mol)': R_GAS * temperature ** 2 / (2 * dT) * difference / 1000,
+                     'Sign': sign})
+    return (pd.DataFrame(drc), pd.DataFrame(eapp),
+            pd.DataFrame(skipped, columns=['pH', 'V', 'Perturbation', 'Reason']))
@@ -0,0 +1,268 @@
+import os
+import re
+import signal
+import shutil
+import tempfile
+import asyncio
+from collections import namedtuple
+
+from result_cache import solver_version
+
+# Result of one mkmcxx invocation
+SolverOutcome = namedtuple("SolverOutcome", ["message", "success", "stdout", "stderr", "timed_out"])
+
+# One run for run_many(); tag is passed back untouched to the callbacks
+SolverJob = namedtuple("SolverJob", ["tag", "input_file", "workdir", "omp_threads"])
+
+# Progress markers printed by mkmcxx, in order, with the stage they start
+STAGES = [
+    ("Opening input file", "Reading input"),
+    ("Performing SEQUENCERUN", "Integrating"),
+    ("Finalizing SEQUENCERUN", "Finalizing"),
+    ("Calculating production patterns", "Production patterns"),
+    ("Calculating selectivity patterns", "Selectivity patterns"),
+    ("Writing network files", "Writing network files"),
+    ("Writing graphs", "Writing graphs"),
+    ("Total execution time", "Done"),
+]
+
+_RUN_PROGRESS_RE = re.compile(r"RUN-\d+-END\s*\((\d+(?:\.\d+)?)%\)")
+
+
+def parse_stage(line):
+    """
+    Recognizes the mkmcxx progress lines.
+
+    Args:
+    line (str): One line of solver stdout.
+
+    Returns:
+    tuple: (stage label, fraction done) or None for other lines.
+    """
+    for i, (marker, label) in enumerate(STAGES):
+        if marker in line:
+            return label, (i + 1) / len(STAGES)
+    match = _RUN_PROGRESS_RE.search(line)
+    if match:
+        percent = float(match.group(1))
+        return f"Integrating ({percent:.1f}% of runs)", (2 + percent / 100) / len(STAGES)
+    return None
+
+
+def _kill(process):
+    """Kills the solver together with anything it spawned (it runs in its own session)."""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, AttributeError):
+        process.kill()
+
+
+def publish_outputs(scratch, workdir):
+    """
+    Moves the run/ tree of a finished scratch directory into workdir.
+
+    The new tree is only renamed into place once it is complete, so readers
+    never see a half-written run/. The outputs of an earlier run are moved
+    aside into the scratch directory and removed with it.
+
+    Args:
+    scratch (str): Scratch directory the solver ran in.
+    workdir (str): Folder whose run/ tree is replaced.
+    """
+    produced = os.path.join(scratch, "run")
+    target = os.path.join(workdir, "run")
+    if not os.path.isdir(produced):
+        return
+    for attempt in range(3):
+        if os.path.isdir(target):
+            os.rename(target, os.path.join(scratch, f"previous-run-{attempt}"))
+        try:
+            os.rename(produced, target)
+            return
+        except OSError:
+            # A concurrent run of the same point published first; replace its outputs
+            continue
+    raise OSError(f"Could not publish solver outputs to {target}")
+
+
+async def run_solver(executable, input_file, workdir=None, omp_threads=None, timeout=None, cache=None, on_line=None,
+                     native=False):
+    """
+    Runs mkmcxx as an asyncio subprocess, streaming its stdout line by line.
+
+    The solver runs in a fresh scratch directory inside workdir; its run/ tree
+    only replaces workdir/run once the run succeeded (see publish_outputs).
+    The process is killed when the timeout expires or when the calling task
+    is cancelled, so no solver outlives the run that started it.
+
+    Args:
+    executable (str): Path of the mkmcxx binary.
+    input_file (str): Path of the .mkm input file.
+    workdir (str): Folder receiving the run/ outputs, defaults to the CWD.
+    omp_threads (int): OMP_NUM_THREADS for the run, or None to inherit it.
+    timeout (float): Wall-clock limit in seconds, or None for no limit.
+    cache (ResultCache): Result cache consulted before and filled after the run, or None.
+    on_line (callable): Called as on_line(line, stage) for every stdout line; stage is the
+        latest parse_stage() result.
+    native (bool): Try the in-process solver of native_solver first and only run mkmcxx
+        when it cannot handle the input or does not converge.
+
+    Returns:
+    SolverOutcome: Message, success flag and captured output.
+    """
+    workdir = workdir or os.getcwd()
+
+    # Every invocation gets its own scratch directory
+    os.makedirs(workdir, exist_ok=True)
+    scratch = tempfile.mkdtemp(dir=workdir, prefix=".run-")
+    try:
+        input_file = os.path.abspath(input_file)
+        fallback = ""
+        if native:
+            # numpy/scipy are only loaded once the native solver is actually used
+            from native_solver import solve_input
+            try:
+                log = await asyncio.to_thread(solve_input, input_file, scratch)
+            except Exception as e:
+                # Unsupported input or no convergence: mkmcxx takes over
+                fallback = f"Native solver failed ({e}); "
+                shutil.rmtree(os.path.join(scratch, "run"), ignore_errors=True)
+            else:
+                publish_outputs(scratch, workdir)
+                stage = None
+                for line in log.splitlines():
+                    stage = parse_stage(line) or stage
+                    if on_line is not None:
+                        on_line(line, stage)
+                return SolverOutcome("Native solver converged.", True, log, "", False)
+
+        outcome = await _run_in(executable, input_file, workdir, scratch, omp_threads, timeout, cache, on_line)
+        return outcome._replace(message=fallback + outcome.message) if fallback else outcome
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+async def _run_in(executable, input_file, workdir, scratch, omp_threads, timeout, cache, on_line):
+    if not os.path.exists(executable):
+        return SolverOutcome("Executable not found at the given path.", False, "", "", False)
+    if not os.access(executable, os.X_OK):
+        os.chmod(executable, os.stat(executable).st_mode | 0o111)
+
+    # Serve byte-identical inputs from the result cache
+    if cache is not None:
+        # Probing the version and copying cache entries block, so they run off the event loop
+        key = cache.key(input_file, await asyncio.to_thread(solver_version, executable))
+        if await asyncio.to_thread(cache.lookup, key, scratch):
+            publish_outputs(scratch, workdir)
+            return SolverOutcome("Solver result served from cache.", True, "", "", False)
+
+    env = None
+    if omp_threads is not None:
+        env = dict(os.environ, OMP_NUM_THREADS=str(omp_threads))
+    try:
+        process = await asyncio.create_subprocess_exec(
+            executable, '-i', input_file,
+            cwd=scratch, env=env,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
+        )
+    except Exception as e:
+        return SolverOutcome(f"Error executing command: {str(e)}", False, "", "", False)
+
+    stdout, stderr = [], []
+
+    async def read_stdout():
+        stage = None
+        async for raw in process.stdout:
+            line = raw.decode(errors="replace").rstrip("\r\n")
+            stdout.append(line)
+            stage = parse_stage(line) or stage
+            if on_line is not None:
+                on_line(line, stage)
+
+    async def read_stderr():
+        stderr.append((await process.stderr.read()).decode(errors="replace"))
+
+    try:
+        await asyncio.wait_for(asyncio.gather(read_stdout(), read_stderr(), process.wait()), timeout)
+    except asyncio.TimeoutError:
+        return SolverOutcome(f"Solver timed out after {timeout} s.", False, "\n".join(stdout), "".join(stderr), True)
+    finally:
+        if process.returncode is None:
+            _kill(process)
+            await process.wait()
+
+    stdout, stderr = "\n".join(stdout), "".join(stderr)
+    if process.returncode == 0:
+        if cache is not None:
+            await asyncio.to_thread(cache.store, key, scratch)
+        publish_outputs(scratch, workdir)
+        return SolverOutcome("Solver ran successfully!", True, stdout, stderr, False)
+    return SolverOutcome(f"Error running solver: {stderr}", False, stdout, stderr, False)
+
+
+async def run_many(executable, jobs, max_in_flight, timeout=None, cache=None, on_line=None, on_done=None, stop=None,
+                   native=False):
+    """
+    Runs several solver jobs concurrently, at most max_in_flight at a time.
+
+    Jobs are taken from `jobs` only when a slot is free, so it may be a
+    generator that produces them while the first ones already run (see
+    sweep.run_pipeline); it is advanced on a worker thread and may block.
+
+    Args:
+    executable (str): Path of the mkmcxx binary.
+    jobs (iterable): SolverJob entries.
+    max_in_flight (int): Number of concurrent mkmcxx processes.
+    timeout (float): Wall-clock limit per run in seconds, or None.
+    cache (ResultCache): Shared result cache, or None.
+    on_line (callable): Called as on_line(job, line, stage) for every stdout line.
+    on_done (callable): Called as on_done(job, outcome, elapsed) when a run finishes.
+    stop (threading.Event): When set, every pending and running job is cancelled.
+    native (bool): Try the in-process native solver first, see run_solver().
+    """
+    loop = asyncio.get_running_loop()
+    max_in_flight = max(1, max_in_flight)
+
+    async def run(job):
+        start = loop.time()
+        forward = None if on_line is None else (lambda line, stage: on_line(job, line, stage))
+        try:
+            outcome = await run_solver(executable, job.input_file, job.workdir, job.omp_threads,
+                                       timeout, cache, forward, native)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            outcome = SolverOutcome(f"Error executing command: {str(e)}", False, "", "", False)
+        if on_done is not None:
+            on_done(job, outcome, loop.time() - start)
+
+    end = object()
+    iterator = iter(jobs)
+    tasks = set()
+    fetch = None
+    exhausted = False
+    try:
+        while tasks or not exhausted:
+            if stop is not None and stop.is_set():
+                break
+            if fetch is None and not exhausted and len(tasks) < max_in_flight:
+                fetch = asyncio.ensure_future(asyncio.to_thread(next, iterator, end))
+            waiting = tasks | ({fetch} if fetch is not None else set())
+            done, _ = await asyncio.wait(waiting, timeout=0.2, return_when=asyncio.FIRST_COMPLETED)
+            tasks -= done
+            if fetch in done:
+                job, fetch = fetch.result(), None
+                if job is end:
+                    exhausted = True
+                else:
+                    tasks.add(asyncio.ensure_future(run(job)))
+    finally:
+        # Cancelling a task kills its mkmcxx process
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if fetch is not None:
+            await asyncio.gather(fetch, return_exceptions=True)
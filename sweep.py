@@ -0,0 +1,264 @@
+import os
+import queue
+import asyncio
+import threading
+import time
+from collections import namedtuple
+
+from utility import EXECUTABLE_PATH
+from solver_runner import SolverJob, run_many
+
+# Outcome of one solver run in a pH x V sweep
+PointResult = namedtuple("PointResult", ["pH", "V", "folder", "success", "message", "elapsed"])
+
+# Progress of a running point: the solver stage it just entered and the fraction done
+StageUpdate = namedtuple("StageUpdate", ["pH", "V", "stage", "fraction"])
+
+# Message of the PointResult of a point whose regenerated input was already solved
+UP_TO_DATE = "Up to date; already solved from the same input."
+
+
+def default_workers(omp_threads=1):
+    """
+    Number of mkmcxx processes to keep running at once.
+
+    Args:
+    omp_threads (int): OpenMP threads given to every mkmcxx process.
+
+    Returns:
+    int: Number of cores divided by the threads per run, at least 1.
+    """
+    return max(1, (os.cpu_count() or 1) // max(1, int(omp_threads)))
+
+
+def run_sweep(points, workers=None, omp_threads=1, cache=None, timeout=None, stream=False, native=False,
+              cancel=None):
+    """
+    Runs the solver for every grid point, keeping up to `workers` mkmcxx processes in flight.
+
+    The runs are driven by an asyncio loop on a background thread. Closing
+    the generator (e.g. when the Streamlit script is interrupted) cancels the
+    sweep and kills every running solver.
+
+    Args:
+    points (iterable): (pH, V, folder) tuples; a generator is consumed as solver slots free up.
+    workers (int): Number of concurrent solver processes, defaults to default_workers(omp_threads).
+    omp_threads (int): OMP_NUM_THREADS for every run.
+    cache (ResultCache): Result cache shared by all runs, or None.
+    timeout (float): Wall-clock limit per run in seconds, or None.
+    stream (bool): Also yield a StageUpdate whenever a run reaches a new solver stage.
+    native (bool): Solve in-process with native_solver first, falling back to mkmcxx.
+    cancel (threading.Event): Optional; setting it from another thread ends the sweep and kills the solvers.
+
+    Yields:
+    PointResult: One result per point, in order of completion, interleaved with
+    StageUpdate entries when stream is set.
+    """
+    workers = workers or default_workers(omp_threads)
+    events = queue.Queue()
+    stop = threading.Event()
+    # Built lazily, so points may come from a generator that is still writing inputs
+    jobs = (SolverJob((pH, V, folder), os.path.join(folder, "input_file.mkm"), folder, omp_threads)
+            for pH, V, folder in points)
+    last_stage = {}
+
+    def on_line(job, line, stage):
+        if stream and stage is not None and last_stage.get(job.tag) != stage:
+            last_stage[job.tag] = stage
+            events.put(StageUpdate(job.tag[0], job.tag[1], stage[0], stage[1]))
+
+    def on_done(job, outcome, elapsed):
+        pH, V, folder = job.tag
+        events.put(PointResult(pH, V, folder, outcome.success, outcome.message, elapsed))
+
+    def drive():
+        try:
+            asyncio.run(run_many(EXECUTABLE_PATH, jobs, workers, timeout, cache, on_line, on_done, stop, native))
+        except BaseException as e:
+            events.put(e)
+        finally:
+            events.put(None)
+
+    thread = threading.Thread(target=drive, name="mkm-sweep", daemon=True)
+    thread.start()
+    try:
+        while True:
+            if cancel is not None and cancel.is_set():
+                break
+            try:
+                event = events.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if event is None:
+                break
+            if isinstance(event, BaseException):
+                raise event
+            yield event
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_pipeline(points, prepare, workers=None, omp_threads=1, cache=None, timeout=None, stream=False,
+                 native=False, cancel=None, depth=None, current=None):
+    """
+    Writes the inputs and solves them in one pass, so solving starts with the first input.
+
+    A producer thread calls prepare() for every point and hands the prepared
+    points to the solver workers through a bounded queue, so input
+    generation overlaps with the solver runs and runs at most `depth`
+    points ahead of them.
+
+    Args:
+    points (list): (pH, V, folder) tuples.
+    prepare (callable): prepare(pH, V, folder) writes the point's input_file.mkm.
+    workers, omp_threads, cache, timeout, stream, native, cancel: As for run_sweep().
+    depth (int): Number of prepared points waiting for a solver, defaults to twice the workers.
+    current (callable): Optional; current(folder) tells, once the input is written, whether
+        that input was already solved (see SweepManifest.is_current).
+
+    Yields:
+    PointResult (and StageUpdate when stream is set), as run_sweep() does. A point
+    whose input could not be written is reported as a failed PointResult, a point
+    found current as a successful one with the UP_TO_DATE message.
+    """
+    workers = workers or default_workers(omp_threads)
+    prepared = queue.Queue(maxsize=depth or 2 * workers)
+    # Results of the points that never reach a solver
+    reported = queue.Queue()
+    halt = threading.Event()
+    end = object()
+
+    def produce():
+        for pH, V, folder in points:
+            if halt.is_set():
+                return
+            start = time.perf_counter()
+            try:
+                prepare(pH, V, folder)
+            except Exception as e:
+                reported.put(PointResult(pH, V, folder, False, f"Input generation failed: {e}",
+                                         time.perf_counter() - start))
+                continue
+            if current is not None and current(folder):
+                reported.put(PointResult(pH, V, folder, True, UP_TO_DATE, 0.0))
+                continue
+            hand_over((pH, V, folder))
+        hand_over(end)
+
+    def hand_over(item):
+        while not halt.is_set():
+            try:
+                prepared.put(item, timeout=0.2)
+                return
+            except queue.Full:
+                continue
+
+    def consume():
+        # Advanced by run_many on a worker thread; gives up once the sweep is closing
+        while not halt.is_set():
+            try:
+                point = prepared.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if point is end:
+                return
+            yield point
+
+    producer = threading.Thread(target=produce, name="mkm-inputs", daemon=True)
+    producer.start()
+    sweep = run_sweep(consume(), workers, omp_threads, cache, timeout, stream, native, cancel)
+    try:
+        for event in sweep:
+            while not reported.empty():
+                yield reported.get()
+            yield event
+        while not reported.empty():
+            yield reported.get()
+    finally:
+        halt.set()
+        sweep.close()
+        producer.join()
+
+
+def continuation_chains(points):
+    """
+    Orders the points of a sweep for continuation: one chain per pH, in increasing V.
+
+    Args:
+    points (list): (pH, V, folder) tuples.
+
+    Returns:
+    dict: pH -> list of (V, folder) sorted by V.
+    """
+    chains = {}
+    for pH, V, folder in points:
+        chains.setdefault(pH, []).append((V, folder))
+    return {pH: sorted(chain) for pH, chain in chains.items()}
+
+
+def run_continuation(chains, prepare, workers=None, omp_threads=1, cache=None, timeout=None, stream=False,
+                     native=False, cancel=None, current=None):
+    """
+    Sweeps every pH chain along V, seeding each point from its converged neighbour.
+
+    The k-th point of every chain is solved in the same round, so the chains
+    run in parallel while the points of one chain run one after the other.
+
+    Args:
+    chains (dict): pH -> list of (V, folder), see continuation_chains().
+    prepare (callable): prepare(pH, V, folder, seed) writes the point's input_file.mkm;
+        seed is the coverage.dat of the nearest finished point of the chain, or None.
+    workers, omp_threads, cache, timeout, stream, native, cancel: As for run_sweep().
+    current (callable): As for run_pipeline(); a current point seeds the next one of its chain.
+
+    Yields:
+    PointResult (and StageUpdate when stream is set), as run_sweep() does. A point
+    whose input could not be written is reported as a failed PointResult, a point
+    found current as a successful one with the UP_TO_DATE message.
+    """
+    seeds = {pH: None for pH in chains}
+    for k in range(max((len(chain) for chain in chains.values()), default=0)):
+        if cancel is not None and cancel.is_set():
+            return
+        points = []
+        for pH, chain in chains.items():
+            if k < len(chain):
+                V, folder = chain[k]
+                start = time.perf_counter()
+                try:
+                    prepare(pH, V, folder, seeds[pH])
+                except Exception as e:
+                    yield PointResult(pH, V, folder, False, f"Input generation failed: {e}",
+                                      time.perf_counter() - start)
+                    continue
+                if current is not None and current(folder):
+                    seeds[pH] = os.path.join(folder, "run", "range", "coverage.dat")
+                    yield PointResult(pH, V, folder, True, UP_TO_DATE, 0.0)
+                    continue
+                points.append((pH, V, folder))
+        sweep = run_sweep(points, workers, omp_threads, cache, timeout, stream, native, cancel)
+        try:
+            for event in sweep:
+                if isinstance(event, PointResult) and event.success:
+                    seeds[event.pH] = os.path.join(event.folder, "run", "range", "coverage.dat")
+                yield event
+        finally:
+            sweep.close()
+
+
+def timing_summary(results, wall_time):
+    """
+    Compares the wall time of a sweep against running its points back-to-back.
+
+    Args:
+    results (list): PointResult of every run in the sweep.
+    wall_time (float): Measured wall time of the sweep in seconds.
+
+    Returns:
+    str: Human readable summary.
+    """
+    serial_time = sum(result.elapsed for result in results)
+    speedup = serial_time / wall_time if wall_time > 0 else 1.0
+    return (f"Wall time {wall_time:.2f} s for {len(results)} runs "
+            f"(serial baseline {serial_time:.2f} s, {speedup:.1f}x speed-up)")
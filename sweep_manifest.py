@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import fcntl
+import hashlib
+from contextlib import contextmanager
+from collections import namedtuple
+
+# File of a session folder that records every solved point, one JSON line per run
+MANIFEST_NAME = "manifest.jsonl"
+
+# Last recorded run of a point folder. input_hash is the sha256 of the input_file.mkm that
+# was solved, workbook the digest of the workbook it came from (None when unknown), and
+# output the coverage.dat the run produced, relative to the point folder.
+ManifestEntry = namedtuple("ManifestEntry", ["folder", "input_hash", "workbook", "status", "elapsed",
+                                             "output", "message", "finished"])
+
+DONE, FAILED = "done", "failed"
+OUTPUT = os.path.join("run", "range", "coverage.dat")
+
+
+def file_hash(path):
+    """sha256 of a file, or None when it does not exist."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SweepManifest:
+    """
+    Checkpoint of a sweep: the input hash, status, runtime and output of every point.
+
+    Entries are appended to root/manifest.jsonl as the runs finish, so a
+    crash or a container restart loses at most the runs that were in
+    flight; the last line of a folder wins. Appends and compaction take an
+    exclusive lock on root/manifest.jsonl.lock, so the page and a background
+    job can share the manifest of one session. A point is up to date when its
+    last run succeeded, its output still exists, its input_file.mkm is the
+    one that was solved and it came from the same workbook.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.path = os.path.join(self.root, MANIFEST_NAME)
+        self.entries = self._read()
+
+    def _read(self):
+        entries = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = ManifestEntry(**json.loads(line))
+                    except (ValueError, TypeError):
+                        # A line cut short by a crash
+                        continue
+                    entries[entry.folder] = entry
+        return entries
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _key(self, folder):
+        return os.path.relpath(os.path.abspath(folder), self.root)
+
+    def record(self, folder, success, elapsed, message="", workbook=None):
+        """
+        Appends the outcome of one run of a point folder.
+
+        Args:
+        folder (str): Point folder holding input_file.mkm and run/.
+        success (bool): Whether the run succeeded.
+        elapsed (float): Runtime in seconds.
+        message (str): Solver message.
+        workbook (str): Digest of the workbook the input was generated from.
+        """
+        entry = ManifestEntry(self._key(folder), file_hash(os.path.join(folder, "input_file.mkm")), workbook,
+                              DONE if success else FAILED, elapsed, OUTPUT, message, time.time())
+        self.entries[entry.folder] = entry
+        with self._locked(), open(self.path, "a") as f:
+            f.write(json.dumps(entry._asdict()) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def is_current(self, folder, workbook=None):
+        """True when the point needs no new run (see the class docstring)."""
+        entry = self.entries.get(self._key(folder))
+        if entry is None or entry.status != DONE:
+            return False
+        if workbook is not None and entry.workbook is not None and entry.workbook != workbook:
+            return False
+        if not os.path.exists(os.path.join(folder, entry.output)):
+            return False
+        return file_hash(os.path.join(folder, "input_file.mkm")) == entry.input_hash
+
+    def failed(self, folder):
+        """True when the last recorded run of the folder failed, so any run/ outputs in it are from an earlier run."""
+        entry = self.entries.get(self._key(folder))
+        return entry is not None and entry.status != DONE
+
+    def split(self, points, workbook=None):
+        """
+        Separates the points that must run from those that are up to date.
+
+        Args:
+        points (list): (pH, V, folder) tuples.
+        workbook (str): Digest of the current workbook, or None to ignore it.
+
+        Returns:
+        tuple: (points to run, up-to-date points)
+        """
+        pending, current = [], []
+        for point in points:
+            (current if self.is_current(point[2], workbook) else pending).append(point)
+        return pending, current
+
+    def compact(self):
+        """
+        Rewrites the manifest with only the last entry of every folder.
+
+        The file is read again under the lock, so entries appended by another
+        process since this manifest was loaded are kept.
+        """
+        with self._locked():
+            self.entries = self._read()
+            partial = f"{self.path}.partial"
+            with open(partial, "w") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry._asdict()) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(partial, self.path)
@@ -0,0 +1,200 @@
+import os
+import json
+import numpy as np
+
+
+def read_dat(path):
+    """
+    Reads a mkmcxx .dat output (a header line of names followed by rows of numbers) in one call.
+
+    Args:
+    path (str): Path of the .dat file.
+
+    Returns:
+    tuple: (names, values) with values a float array of shape (rows, len(names)).
+    """
+    with open(path) as f:
+        names = f.readline().split()
+    values = np.loadtxt(path, skiprows=1, ndmin=2)
+    if values.size == 0:
+        values = values.reshape(0, len(names))
+    return names, values
+
+
+def warm_start_activities(coverage_path, adsorbates, site='*'):
+    """
+    Initial activities taken from the converged coverages of a finished run.
+
+    Args:
+    coverage_path (str): coverage.dat of the neighbouring run.
+    adsorbates (list): Adsorbates in the order of the #adsorbates block.
+    site (str): Name of the free site.
+
+    Returns:
+    tuple: (activities, site_activity); (None, 1.0), i.e. a clean surface, when the file is missing or empty.
+    """
+    if not coverage_path or not os.path.exists(coverage_path):
+        return None, 1.0
+    names, values = read_dat(coverage_path)
+    if not len(values):
+        return None, 1.0
+    final = dict(zip(names, values[-1]))
+    activities = [final.get(name, 0.0) for name in adsorbates]
+    return activities, final.get(site, max(0.0, 1.0 - sum(activities)))
+
+
+def outdated(path, sources):
+    """
+    True when a saved store is missing or older than any of the files it was built from.
+
+    Args:
+    path (str): Sidecar of the store, e.g. results.json.
+    sources (iterable): Paths of the inputs of the store; missing ones are ignored.
+
+    Returns:
+    bool: Whether the store has to be collected again.
+    """
+    if not os.path.exists(path):
+        return True
+    saved = os.stat(path).st_mtime_ns
+    return any(os.path.exists(source) and os.stat(source).st_mtime_ns > saved for source in sources)
+
+
+class SweepResults:
+    """
+    Results of a whole pH x V sweep as fixed-layout arrays.
+
+    `coverage` is indexed by (pH, V, species) and holds the last row of every
+    coverage.dat, i.e. the final state of the run. `rates`, when present, is
+    indexed by (pH, V, reaction) and holds the net rate of every reaction.
+    Points without results hold NaN.
+
+    On disk every array is a .npy file next to a JSON sidecar naming its
+    axes; load() memory-maps them, so slices are read without loading the
+    whole sweep.
+    """
+
+    def __init__(self, pH_list, V_list, species, coverage=None, reactions=None, rates=None):
+        self.pH = np.asarray(pH_list, dtype=float)
+        self.V = np.asarray(V_list, dtype=float)
+        self.species = list(species)
+        self.reactions = list(reactions or [])
+        if coverage is None:
+            coverage = np.full((len(self.pH), len(self.V), len(self.species)), np.nan)
+        if rates is None and self.reactions:
+            rates = np.full((len(self.pH), len(self.V), len(self.reactions)), np.nan)
+        self.coverage = coverage
+        self.rates = rates
+
+    @classmethod
+    def collect(cls, pH_list, V_list, path_of, rates_of=None, skip=None):
+        """
+        Reads the coverage.dat of every grid point.
+
+        Args:
+        pH_list (list): pH values.
+        V_list (list): Potential values.
+        path_of (callable): Maps (pH, V) to the path of that point's coverage.dat.
+        rates_of (callable): Optional; maps (pH, V) to a dict of reaction -> net rate, or None.
+        skip (callable): Optional; skip(pH, V) is True for points whose outputs on disk must not be
+            read, e.g. those left over from before a failed rerun. They stay NaN.
+
+        Returns:
+        SweepResults: Store holding every point found on disk.
+        """
+        found = {}
+        species = {}
+        found_rates = {}
+        reactions = {}
+        for i, pH in enumerate(pH_list):
+            for j, V in enumerate(V_list):
+                if skip is not None and skip(pH, V):
+                    continue
+                path = path_of(pH, V)
+                if os.path.exists(path):
+                    names, values = read_dat(path)
+                    if len(values):
+                        found[i, j] = (names, values[-1])
+                        species.update(dict.fromkeys(names))
+                if rates_of is not None:
+                    rates = rates_of(pH, V)
+                    if rates:
+                        found_rates[i, j] = rates
+                        reactions.update(dict.fromkeys(rates))
+        results = cls(pH_list, V_list, species, reactions=reactions)
+        index = {name: k for k, name in enumerate(results.species)}
+        for (i, j), (names, row) in found.items():
+            results.coverage[i, j, [index[name] for name in names]] = row
+        index = {name: k for k, name in enumerate(results.reactions)}
+        for (i, j), rates in found_rates.items():
+            results.rates[i, j, [index[name] for name in rates]] = list(rates.values())
+        return results
+
+    def adsorbates(self):
+        """Names of the surface species (containing '*')."""
+        return [name for name in self.species if '*' in name]
+
+    def species_index(self, name):
+        """Position of a species on the last axis of `coverage`."""
+        return self.species.index(name)
+
+    def reaction_index(self, name):
+        """Position of a reaction on the last axis of `rates`."""
+        return self.reactions.index(name)
+
+    def coverage_of(self, name):
+        """(pH, V) coverage of one species; a view, so memory-mapped stores are not read in full."""
+        return self.coverage[:, :, self.species_index(name)]
+
+    def save(self, path):
+        """
+        Saves the store as .npy arrays and a JSON sidecar.
+
+        Args:
+        path (str): Path of the sidecar, e.g. results.json; the arrays are written
+            next to it as results.coverage.npy and results.rates.npy.
+        """
+        base = os.path.splitext(path)[0]
+        arrays = {"coverage": (self.coverage, ["pH", "V", "species"])}
+        if self.rates is not None:
+            arrays["rates"] = (self.rates, ["pH", "V", "reactions"])
+        metadata = {"format": 1, "pH": self.pH.tolist(), "V": self.V.tolist(),
+                    "species": self.species, "reactions": self.reactions, "arrays": {}}
+        for name, (array, axes) in arrays.items():
+            file_name = f"{os.path.basename(base)}.{name}.npy"
+            partial = os.path.join(os.path.dirname(path), file_name + ".partial")
+            # Fixed little-endian float64 layout, written through a memory map and renamed into place
+            out = np.lib.format.open_memmap(partial, mode="w+", dtype="<f8", shape=array.shape)
+            out[...] = array
+            out.flush()
+            del out
+            os.replace(partial, os.path.join(os.path.dirname(path), file_name))
+            metadata["arrays"][name] = {"file": file_name, "axes": axes, "shape": list(array.shape), "dtype": "<f8"}
+        with open(path + ".partial", "w") as f:
+            json.dump(metadata, f, indent=1)
+        os.replace(path + ".partial", path)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """
+        Opens a store written by save().
+
+        Args:
+        path (str): Path of the JSON sidecar.
+        mmap_mode (str): Memory-map mode for the arrays, or None to read them into memory.
+
+        Returns:
+        SweepResults: Store whose arrays are memory-mapped.
+        """
+        with open(path) as f:
+            metadata = json.load(f)
+        folder = os.path.dirname(path)
+        arrays = {name: np.load(os.path.join(folder, entry["file"]), mmap_mode=mmap_mode)
+                  for name, entry in metadata["arrays"].items()}
+        return cls(metadata["pH"], metadata["V"], metadata["species"], arrays["coverage"],
+                   metadata.get("reactions"), arrays.get("rates"))
+
+    def matches(self, pH_list, V_list):
+        """True when the store covers exactly the given grid."""
+        return (np.array_equal(self.pH, np.asarray(pH_list, dtype=float))
+                and np.array_equal(self.V, np.asarray(V_list, dtype=float)))
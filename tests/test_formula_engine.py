@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from conftest import ROOT
+from formula_engine import FormulaEngine, FormulaError, parse_formula
+from workbook import SHEETS, load_mkm_workbook
+
+
+def engine_for(formulas, pH=7.0, V=-0.5):
+    # Minimal workbook: the pH and V inputs, and one formula per row of column A below them
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "Local Environment"
+    sheet.append(["pH", "V"])
+    sheet.append([pH, V])
+    for formula in formulas:
+        sheet.append([formula])
+    cells = [("Local Environment", f"A{row}") for row in range(3, 3 + len(formulas))]
+    return FormulaEngine(workbook).compile(cells)
+
+
+def test_matches_values_cached_by_excel():
+    path = os.path.join(ROOT, "test.xlsx")
+    workbook = load_mkm_workbook(path)
+    cached = load_workbook(path, data_only=True)
+    cells = [(name, cell.coordinate) for name in SHEETS for row in workbook.workbook[name].iter_rows()
+             for cell in row if isinstance(cell.value, str) and cell.value.startswith("=")]
+    assert cells
+    expected = [cached[name][coordinate].value for name, coordinate in cells]
+    computed = workbook.engine.compile(cells)(workbook.pH, workbook.V)
+    np.testing.assert_allclose(computed, expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize("formula, value", [
+    ("=-2^2", 4.0),             # unary minus binds tighter than ^
+    ("=2+3*4^2", 50.0),
+    ("=2^3^2", 64.0),           # ^ is left-associative
+    ("=10-4-3", 3.0),
+    ("=-A2^2", 49.0),
+    ("=A2*B2", -3.5),
+    ("=LOG(100)", 2.0),
+    ("=SUM(A2:B2)*2", 13.0),
+])
+def test_excel_precedence(formula, value):
+    assert engine_for([formula])(7.0, -0.5)[0] == pytest.approx(value)
+
+
+def test_grid_matches_pointwise_evaluation():
+    compiled = engine_for(["=A2*B2+EXP(-A2)", "=LN(A2)-B2^2"])
+    pH_list, V_list = [1.0, 7.0, 13.0], [-1.0, 0.0, 0.5]
+    grid = compiled.grid(pH_list, V_list)
+    for i, pH in enumerate(pH_list):
+        for j, V in enumerate(V_list):
+            np.testing.assert_allclose(grid[:, i, j], compiled(pH, V))
+
+
+def test_unparsable_formula_raises():
+    with pytest.raises(FormulaError):
+        parse_formula("=2+*3")
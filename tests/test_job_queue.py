@@ -0,0 +1,18 @@
+import os
+import signal
+from contextlib import closing
+
+import job_queue
+
+
+def test_worker_still_starting_is_not_spawned_again(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite")
+    assert job_queue.ensure_worker(db_path) == 1
+    # The worker has not registered itself yet; the row inserted at spawn time counts
+    assert job_queue.ensure_worker(db_path) == 0
+    with closing(job_queue.connect(db_path)) as connection:
+        workers = connection.execute("SELECT id, pid FROM workers").fetchall()
+    assert len(workers) == 1
+
+    os.kill(workers[0][1], signal.SIGTERM)
+    os.waitpid(workers[0][1], 0)
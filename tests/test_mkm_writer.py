@@ -0,0 +1,26 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import ROOT
+from mkm_writer import runs_line
+from workbook import load_mkm_workbook
+
+
+def test_template_matches_reference_input():
+    # single_run/input_file.mkm was written from test.xlsx by the original string-building writer
+    workbook = load_mkm_workbook(os.path.join(ROOT, "test.xlsx"))
+    content = workbook.template.render(workbook.species["Concentration"].tolist(),
+                                       workbook.reactions["G_f"], workbook.reactions["G_b"],
+                                       [runs_line(workbook.local_environment["V"][0])],
+                                       np.zeros(len(workbook.network.adsorbates)))
+    with open(os.path.join(ROOT, "single_run", "input_file.mkm"), newline="") as f:
+        assert content == f.read()
+
+
+def test_render_rejects_mismatched_barriers():
+    workbook = load_mkm_workbook(os.path.join(ROOT, "test.xlsx"))
+    concentrations = workbook.species["Concentration"].tolist()
+    with pytest.raises(ValueError):
+        workbook.template.render(concentrations, [0.0], [0.0], [runs_line(0.0)])
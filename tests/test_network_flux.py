@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from network_flux import iter_flux, net_rates, write_flux
+from reaction_network import ReactionNetwork
+
+NETWORK = ReactionNetwork(["CO+*→CO*", "CO*+CO*→COCO*", "H2O+*→H2O*", "H2O*→H*+OH"])
+
+
+def test_reads_mkmcxx_layout(tmp_path):
+    path = tmp_path / "flux_01_0298K.txt"
+    path.write_text(
+        f"{'Left':>20}\t{'Right':>20}\t{'Flux':>20}\t{'R_FORW':>20}\t{'R_BACK':>20}\n"
+        f"{'{CO}':>20}\t{'{CO*}':>20}\t{2.5e-3:20.6e}\t{3.0e-3:20.6e}\t{5.0e-4:20.6e}\n"
+        f"{'{H2O*}':>20}\t{'{OH}':>20}\t{-1.0e-6:20.6e}\t{1.0e-6:20.6e}\t{2.0e-6:20.6e}\n")
+    records = list(iter_flux(str(path), NETWORK))
+    assert [(record.reaction, record.source, record.target) for record in records] == [(0, "CO", "CO*"),
+                                                                                     (3, "H2O*", "OH")]
+    assert records[0].net == pytest.approx(2.5e-3)
+    assert records[1].backward == pytest.approx(2.0e-6)
+
+
+def test_round_trip_of_native_flux_file(tmp_path):
+    folder = tmp_path / "point"
+    (folder / "run" / "networkplots").mkdir(parents=True)
+    forward, backward = np.array([3.0, 2.0, 1.0, 0.5]), np.array([1.0, 2.0, 0.25, 0.75])
+    write_flux(str(folder / "run" / "networkplots" / "flux_01_0298K.txt"), NETWORK, forward, backward)
+    rates = net_rates(str(folder), NETWORK)
+    assert rates == pytest.approx(dict(zip(NETWORK.reactions, forward - backward)))
+
+
+def test_missing_and_mismatched_flux_files(tmp_path):
+    assert net_rates(str(tmp_path), NETWORK) is None
+    (tmp_path / "run" / "networkplots").mkdir(parents=True)
+    other = ReactionNetwork(["A+*→A*"])
+    write_flux(str(tmp_path / "run" / "networkplots" / "flux_01_0298K.txt"), other, [1.0], [0.0])
+    with pytest.raises(ValueError):
+        net_rates(str(tmp_path), NETWORK)
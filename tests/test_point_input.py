@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+from conftest import ROOT
+from inp_file_multiple2 import write_point_input
+
+WORKBOOK = os.path.join(ROOT, "test.xlsx")
+
+
+def test_writes_finite_input(tmp_path):
+    path = write_point_input(WORKBOOK, str(tmp_path), 7.0, -0.5)
+    with open(path) as f:
+        content = f.read()
+    assert "inf" not in content and "nan" not in content
+
+
+def test_division_by_zero_at_ph_14_is_an_error(tmp_path):
+    # The OH input of test.xlsx divides by 1 - 10^-(14 - pH), which is zero at pH 14
+    stale = tmp_path / "input_file.mkm"
+    stale.write_text("stale input")
+    with pytest.raises(ValueError, match="Error extracting parameters or computing formulas"):
+        write_point_input(WORKBOOK, str(tmp_path), 14.0, -0.5)
+    assert not stale.exists()
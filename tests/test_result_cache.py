@@ -0,0 +1,65 @@
+import os
+
+from result_cache import ResultCache, parse_version
+
+
+def write_run(folder, text):
+    os.makedirs(os.path.join(folder, "run", "range"), exist_ok=True)
+    with open(os.path.join(folder, "run", "range", "coverage.dat"), "w") as f:
+        f.write(text)
+
+
+def test_miss_store_hit(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    input_file = tmp_path / "input_file.mkm"
+    input_file.write_text("&compounds\n")
+    key = cache.key(str(input_file), "2.15.3")
+
+    assert not cache.lookup(key, str(tmp_path / "first"))
+    write_run(str(tmp_path / "solved"), "CO*\n0.5\n")
+    cache.store(key, str(tmp_path / "solved"))
+
+    assert cache.lookup(key, str(tmp_path / "second"))
+    assert (tmp_path / "second" / "run" / "range" / "coverage.dat").read_text() == "CO*\n0.5\n"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_key_depends_on_content_and_version(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    input_file = tmp_path / "input_file.mkm"
+    input_file.write_text("&compounds\n")
+    key = cache.key(str(input_file), "2.15.3")
+    assert cache.key(str(input_file), "2.15.4") != key
+    input_file.write_text("&compounds\n\n")
+    assert cache.key(str(input_file), "2.15.3") != key
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=15)
+    for n, key in enumerate(["old", "new"]):
+        write_run(str(tmp_path / key), "x" * 10)
+        cache.store(key, str(tmp_path / key))
+        os.utime(os.path.join(cache.root, key), (n, n))
+    cache.evict()
+    assert [os.path.basename(path) for _, _, path in cache.entries()] == ["new"]
+
+
+def test_parse_version():
+    assert parse_version("Executing: mkmcxx version 2.15.3\nOpening input file") == "2.15.3"
+    assert parse_version("usage: mkmcxx -i input") is None
+
+
+def test_failed_restore_is_a_miss(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / "cache"))
+    write_run(str(tmp_path / "solved"), "CO*\n0.5\n")
+    cache.store("key", str(tmp_path / "solved"))
+
+    def vanished(source, target, dirs_exist_ok=False):
+        # As if the entry were removed halfway through the copy
+        os.makedirs(os.path.join(target, "partial"))
+        raise FileNotFoundError(source)
+
+    monkeypatch.setattr("result_cache.shutil.copytree", vanished)
+    assert not cache.lookup("key", str(tmp_path / "restored"))
+    assert not (tmp_path / "restored" / "run" / "range").exists()
+    assert cache.stats()["misses"] == 1
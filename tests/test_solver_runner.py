@@ -0,0 +1,118 @@
+import os
+import time
+import asyncio
+import threading
+
+import sweep
+from solver_runner import SolverJob, parse_stage, run_many, run_solver
+
+
+def fake_solver(tmp_path, body):
+    # Stand-in for mkmcxx: a shell script run with '-i <input>' in the scratch directory
+    path = tmp_path / "mkmcxx"
+    path.write_text("#!/bin/sh\n" + body)
+    path.chmod(0o755)
+    return str(path)
+
+
+def point(tmp_path, name="point"):
+    folder = tmp_path / name
+    folder.mkdir()
+    (folder / "input_file.mkm").write_text("&compounds\n")
+    return str(folder / "input_file.mkm"), str(folder)
+
+
+def alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def wait_until_dead(pid, seconds=5.0):
+    deadline = time.monotonic() + seconds
+    while alive(pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return not alive(pid)
+
+
+def test_streams_stdout_and_publishes_outputs(tmp_path):
+    executable = fake_solver(tmp_path, (
+        'echo "Opening input file $2"\n'
+        'echo "Performing SEQUENCERUN"\n'
+        'echo "<--THREAD-00_RUN-001-END\t(50.0%)"\n'
+        'mkdir -p run/range && printf "CO*\\n0.5\\n" > run/range/coverage.dat\n'
+        'echo "Total execution time: 0.1 s"\n'))
+    input_file, workdir = point(tmp_path)
+    lines = []
+    outcome = asyncio.run(run_solver(executable, input_file, workdir,
+                                     on_line=lambda line, stage: lines.append((line, stage))))
+    assert outcome.success and not outcome.timed_out
+    assert [stage for _, stage in lines] == [parse_stage(line) for line, _ in lines]
+    assert lines[0] == (f"Opening input file {input_file}", ("Reading input", 1 / 8))
+    assert lines[-1][1] == ("Done", 1.0)
+    with open(os.path.join(workdir, "run", "range", "coverage.dat")) as f:
+        assert f.read() == "CO*\n0.5\n"
+    # The scratch directory is removed after the run
+    assert sorted(os.listdir(workdir)) == ["input_file.mkm", "run"]
+
+
+def test_timeout_kills_the_process_group(tmp_path):
+    pid_file = tmp_path / "child.pid"
+    executable = fake_solver(tmp_path, f"sleep 30 &\necho $! > {pid_file}\nsleep 30\n")
+    input_file, workdir = point(tmp_path)
+    start = time.monotonic()
+    outcome = asyncio.run(run_solver(executable, input_file, workdir, timeout=0.5))
+    assert outcome.timed_out and not outcome.success
+    assert time.monotonic() - start < 5
+    # The solver's own children go with it
+    assert wait_until_dead(int(pid_file.read_text()))
+
+
+def test_failed_run_leaves_previous_outputs(tmp_path):
+    executable = fake_solver(tmp_path, (
+        'mkdir -p run/range && printf "new\\n" > run/range/coverage.dat\n'
+        'echo "singular matrix" >&2\nexit 1\n'))
+    input_file, workdir = point(tmp_path)
+    os.makedirs(os.path.join(workdir, "run", "range"))
+    with open(os.path.join(workdir, "run", "range", "coverage.dat"), "w") as f:
+        f.write("old\n")
+    outcome = asyncio.run(run_solver(executable, input_file, workdir))
+    assert not outcome.success and "singular matrix" in outcome.message
+    with open(os.path.join(workdir, "run", "range", "coverage.dat")) as f:
+        assert f.read() == "old\n"
+    assert not [name for name in os.listdir(workdir) if name.startswith(".run-")]
+
+
+def test_run_many_stop_cancels_running_jobs(tmp_path):
+    pid_dir = tmp_path / "pids"
+    pid_dir.mkdir()
+    executable = fake_solver(tmp_path, f'echo $$ > {pid_dir}/$$\necho "Performing SEQUENCERUN"\nsleep 30\n')
+    jobs = [SolverJob(n, *point(tmp_path, f"p{n}"), None) for n in range(3)]
+    stop = threading.Event()
+    started, done = set(), []
+
+    def on_line(job, line, stage):
+        started.add(job.tag)
+        if len(started) == 2:
+            stop.set()
+
+    start = time.monotonic()
+    asyncio.run(run_many(executable, jobs, 2, on_line=on_line, on_done=lambda *args: done.append(args), stop=stop))
+    assert time.monotonic() - start < 5
+    assert done == []
+    pids = [int(name) for name in os.listdir(pid_dir)]
+    assert len(pids) == 2 and all(wait_until_dead(pid) for pid in pids)
+
+
+def test_sweep_cancel_event_ends_a_silent_sweep(tmp_path, monkeypatch):
+    # The solvers print nothing, so only the cancel event can end the sweep early
+    monkeypatch.setattr(sweep, "EXECUTABLE_PATH", fake_solver(tmp_path, "sleep 30\n"))
+    points = [(7.0, V, os.path.dirname(point(tmp_path, f"V{V}")[0])) for V in (0.0, -0.5)]
+    cancel = threading.Event()
+    threading.Timer(0.5, cancel.set).start()
+    start = time.monotonic()
+    results = list(sweep.run_sweep(points, workers=2, cancel=cancel))
+    assert results == []
+    assert time.monotonic() - start < 5
@@ -0,0 +1,76 @@
+import os
+import numpy as np
+
+from sweep_manifest import SweepManifest, OUTPUT
+
+
+def solved_point(root, name, content="&runs\n"):
+    folder = os.path.join(root, name)
+    os.makedirs(os.path.join(folder, os.path.dirname(OUTPUT)), exist_ok=True)
+    with open(os.path.join(folder, "input_file.mkm"), "w") as f:
+        f.write(content)
+    with open(os.path.join(folder, OUTPUT), "w") as f:
+        f.write("CO*\n0.5\n")
+    return folder
+
+
+def test_split_by_input_workbook_and_status(tmp_path):
+    root = str(tmp_path)
+    same, edited, failed, other, new = (solved_point(root, name) for name in ["a", "b", "c", "d", "e"])
+    manifest = SweepManifest(root)
+    for folder in (same, edited, other):
+        manifest.record(folder, True, 1.0, workbook="w1")
+    manifest.record(failed, False, 1.0, workbook="w1")
+    manifest.record(other, True, 1.0, workbook="w2")
+    with open(os.path.join(edited, "input_file.mkm"), "w") as f:
+        f.write("&runs\n298.15\n")
+
+    points = [(7.0, V, folder) for V, folder in enumerate([same, edited, failed, other, new])]
+    pending, current = SweepManifest(root).split(points, workbook="w1")
+    assert [folder for _, _, folder in current] == [same]
+    assert [folder for _, _, folder in pending] == [edited, failed, other, new]
+
+
+def test_compact_keeps_last_entry_and_concurrent_appends(tmp_path):
+    root = str(tmp_path)
+    first, second = solved_point(root, "a"), solved_point(root, "b")
+    page = SweepManifest(root)
+    page.record(first, False, 1.0)
+    page.record(first, True, 2.0)
+    # Appended by another process after the page loaded the manifest
+    SweepManifest(root).record(second, True, 3.0)
+
+    page.compact()
+    with open(page.path) as f:
+        assert len(f.readlines()) == 2
+    reloaded = SweepManifest(root)
+    assert reloaded.is_current(first) and reloaded.is_current(second)
+    assert reloaded.entries[os.path.relpath(first, root)].elapsed == 2.0
+
+
+def test_truncated_line_is_ignored(tmp_path):
+    root = str(tmp_path)
+    folder = solved_point(root, "a")
+    SweepManifest(root).record(folder, True, 1.0)
+    with open(os.path.join(root, "manifest.jsonl"), "a") as f:
+        f.write('{"folder": "b", "input_ha')
+    assert SweepManifest(root).is_current(folder)
+
+
+def test_collect_skips_points_whose_rerun_failed(tmp_path):
+    from sweep_results import SweepResults
+
+    root = str(tmp_path)
+    solved, stale = solved_point(root, "a"), solved_point(root, "b")
+    manifest = SweepManifest(root)
+    manifest.record(solved, True, 1.0)
+    manifest.record(stale, True, 1.0)
+    # The rerun failed and left the coverage.dat of the first run in place
+    manifest.record(stale, False, 1.0, "Timed out")
+
+    folders = {0.0: solved, 1.0: stale}
+    manifest = SweepManifest(root)
+    store = SweepResults.collect([7.0], [0.0, 1.0], lambda pH, V: os.path.join(folders[V], OUTPUT),
+                                 skip=lambda pH, V: manifest.failed(folders[V]))
+    assert store.coverage_of("CO*")[0, 0] == 0.5
+    assert np.isnan(store.coverage_of("CO*")[0, 1])
@@ -0,0 +1,19 @@
+import os
+
+import workbook
+from conftest import ROOT
+from workbook import load_mkm_workbook
+
+
+def test_compiled_columns_are_bounded(monkeypatch):
+    monkeypatch.setattr(workbook, "CACHE_SIZE", 2)
+    monkeypatch.setattr(workbook, "_compiled_columns", workbook.OrderedDict())
+    mkm_workbook = load_mkm_workbook(os.path.join(ROOT, "test.xlsx"))
+    first = mkm_workbook.compile_columns([("Reactions", "G_f")])
+    mkm_workbook.compile_columns([("Reactions", "G_b")])
+    # A hit moves the layout to the back, so the next miss evicts G_b
+    assert mkm_workbook.compile_columns([("Reactions", "G_f")]) is first
+    mkm_workbook.compile_columns([("Input-Output Species", "Input MKMCXX")])
+    assert len(workbook._compiled_columns) == 2
+    assert [columns for _, columns in workbook._compiled_columns] == [
+        (("Reactions", "G_f"),), (("Input-Output Species", "Input MKMCXX"),)]
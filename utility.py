@@ -1,75 +1,153 @@
 import streamlit as st
-import pandas as pd
 import os
-import subprocess
+import asyncio
+import threading
+import uuid
 
-from inp_file import *
 from mkm_parameters import *
 import shutil
 from io import StringIO
+from solver_runner import SolverJob, run_solver, run_many
+
+# pandas, numpy and matplotlib are imported by the functions that use them, so importing
+# this module (on every page load) does not pay for them; see import_audit.py
+
+# Path to the mkmcxx executable; falls back to the copy shipped in bin/ outside the deployment
+EXECUTABLE_PATH = "/mount/src/deploy/bin/mkmcxx"
+if not os.path.exists(EXECUTABLE_PATH):
+    EXECUTABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bin", "mkmcxx")
+
+# Number of trailing solver output lines kept on screen while a run streams
+STREAMED_LINES = 40
+
+def session_folder(base):
+    """
+    Scratch folder of the current browser session under base, e.g. multiple_run/session_ab12cd34ef56.
+
+    Every session gets its own folder so concurrent users never overwrite each other's runs.
+
+    Args:
+    base (str): Parent folder, relative to the CWD.
+
+    Returns:
+    str: Absolute path of the (existing) session folder.
+    """
+    if "run_session" not in st.session_state:
+        st.session_state["run_session"] = uuid.uuid4().hex[:12]
+    folder = os.path.join(os.getcwd(), base, f"session_{st.session_state['run_session']}")
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+def point_folder(root, pH, V):
+    """
+    Folder of one grid point of a sweep: root/pH_{pH}/V_{V}.
+
+    Args:
+    root (str): Folder of the sweep.
+    pH (float): pH of the point.
+    V (float): Potential of the point.
+
+    Returns:
+    str: Path of the point folder; its solver outputs live in run/range.
+    """
+    return os.path.join(root, f"pH_{pH}", f"V_{V}")
+
+def point_coverage_path(root, pH, V):
+    """Path of the coverage.dat written for one grid point."""
+    return os.path.join(point_folder(root, pH, V), "run", "range", "coverage.dat")
+
+def solve(input_file, workdir=None, omp_threads=None, cache=None, timeout=None, native=False):
+    """
+    Runs mkmcxx on an input file without touching the Streamlit page.
+
+    Args:
+    input_file (str): Path to the .mkm input file.
+    workdir (str): Directory mkmcxx runs in; its run/ tree is written there. Defaults to the CWD.
+    omp_threads (int): Value for OMP_NUM_THREADS, or None to inherit the environment.
+    cache (ResultCache): Result cache consulted before and filled after the run, or None.
+    timeout (float): Wall-clock limit in seconds; the solver is killed when it runs longer.
+    native (bool): Solve in-process with native_solver, falling back to mkmcxx when it fails.
+
+    Returns:
+    tuple: (message, success, stdout, stderr)
+    """
+    outcome = asyncio.run(run_solver(EXECUTABLE_PATH, input_file, workdir, omp_threads, timeout, cache,
+                                     native=native))
+    return outcome.message, outcome.success, outcome.stdout, outcome.stderr
+
+def cancel_button(label, key):
+    """
+    Shows a Cancel button for a long-running solve and returns the event it sets.
+
+    The event is kept in st.session_state and set from the button's callback,
+    which Streamlit runs in the rerun the click starts while this script is
+    still waiting on the solvers; the solve polls the event and kills its runs.
+
+    Args:
+    label (str): Button label.
+    key (str): Session-state key of the event, also the widget key.
+
+    Returns:
+    threading.Event: Set once the button is pressed.
+    """
+    cancel = threading.Event()
+    st.session_state[key] = cancel
+    st.button(label, key=f"{key}_button", on_click=lambda: st.session_state[key].set())
+    return cancel
 
-# Function to run the executable and generate the required outputs
-def run_executable(input_file):
-    # Path to the executable (adjust as needed)
-    executable_path = "/mount/src/deploy/bin/mkmcxx"  # Adjust path as required
 
+# Function to run the executable and generate the required outputs
+def run_executable(input_file, workdir=None, cache=None, timeout=None, native=False, cancel=None):
     # Debugging info: Display file paths and directory contents
-    st.write("Executable Path:", executable_path)
-    st.write("Current Working Directory:", os.getcwd())
-    #st.write("Contents of Directory:", os.listdir(r"/mount/src/deploy/bin"))
-    os.system(f"chmod +x {executable_path}")
+    st.write("Executable Path:", EXECUTABLE_PATH)
+    st.write("Current Working Directory:", workdir or os.getcwd())
 
     # Check if the executable exists
-    if os.path.exists(executable_path):
-        st.write(f"Executable found at: {executable_path}")
-        try:
-            # Run the executable with the input file
-            result = subprocess.run(
-                [executable_path, '-i', input_file],
-                capture_output=True,
-                text=True
-            )
-
-            # Display the output and error in Streamlit
-            st.write("Solver Output (stdout):")
-            st.text(result.stdout)
-
-            if result.stderr:
-                st.write("Solver Error Output (stderr):")
-                st.text(result.stderr)
-
-            # Check for success or failure
-            if result.returncode == 0:
-                return "Solver ran successfully!", True
-            else:
-                return f"Error running solver: {result.stderr}", False
-
-        except Exception as e:
-            return f"Error executing command: {str(e)}", False
-    else:
+    if not native and not os.path.exists(EXECUTABLE_PATH):
         return "Executable not found at the given path.", False
+    st.write(f"Executable found at: {EXECUTABLE_PATH}")
+
+    # Stream the solver output into the page while it runs
+    st.write("Solver Output (stdout):")
+    stage_bar = st.progress(0.0, text="Starting solver...")
+    output_box = st.empty()
+    lines = []
+
+    def show_line(line, stage):
+        lines.append(line)
+        if stage is not None:
+            label, fraction = stage
+            stage_bar.progress(min(fraction, 1.0), text=label)
+        output_box.text("\n".join(lines[-STREAMED_LINES:]))
+
+    # One job through run_many, so setting cancel kills the run
+    outcomes = []
+    job = SolverJob(None, input_file, workdir, None)
+    asyncio.run(run_many(EXECUTABLE_PATH, [job], 1, timeout, cache, lambda job, line, stage: show_line(line, stage),
+                         lambda job, outcome, elapsed: outcomes.append(outcome), cancel, native))
+    if not outcomes:
+        return "Solver run cancelled.", False
+    outcome = outcomes[0]
+    if outcome.success:
+        stage_bar.progress(1.0, text="Done")
+    output_box.text(outcome.stdout)
+
+    if outcome.stderr:
+        st.write("Solver Error Output (stderr):")
+        st.text(outcome.stderr)
+
+    return outcome.message, outcome.success
     
 def get_val (cov_path):   
-    cov_file = open(cov_path)
-    cov_val = []
-    cov_lines = cov_file.readlines()
-    adsorbate_keys = cov_lines[0].strip().split()
-    cov_dat_dict = {}
-    for key in adsorbate_keys:
-        cov_dat_dict[key] = []
-    for line in cov_lines[1:]:
-        vals = line.strip().split()
-        vals = list(map(lambda x: float(x), vals))
-        c=0
-        for key in adsorbate_keys:
-            cov_dat_dict[key].append(vals[c])
-            c += 1
-    cov_file.close()
-    return cov_dat_dict
-
-def coverage():
-    coverage_file_path = "run/range/coverage.dat"
-    
+    from sweep_results import read_dat
+
+    # Parse the whole file in one call; one list of values per column
+    keys, values = read_dat(cov_path)
+    return {key: values[:, c].tolist() for c, key in enumerate(keys)}
+
+def coverage(coverage_file_path="run/range/coverage.dat"):
+    import pandas as pd
+
     if os.path.exists(coverage_file_path):
         covs = get_val(coverage_file_path)
         covs_relevant ={}
@@ -87,17 +165,18 @@ def coverage():
         st.write(covs_relevant_df)
     else:
         st.error("coverage.dat file not found in the expected directory.")  
-def coverage_V(pH, V):
-    coverage_file_path = f"run/range/pH_{pH}/V_{V}/coverage.dat"
+def coverage_V(root, pH, V):
+    import pandas as pd
+    from sweep_results import read_dat
+
+    coverage_file_path = point_coverage_path(root, pH, V)
     if os.path.exists(coverage_file_path):
         try:
-            covs = get_val(coverage_file_path)
-            covs_relevant = {key: covs[key] for key in covs.keys() if '*' in key}
+            keys, values = read_dat(coverage_file_path)
+            adsorbates = [c for c, key in enumerate(keys) if '*' in key]
             
             # Collect data in DataFrame for easier manipulation
-            covs_relevant_df = pd.DataFrame(covs_relevant).T.reset_index()
-            covs_relevant_df.columns = ['Adsorbates', 'Coverage']
-            return covs_relevant_df
+            return pd.DataFrame({'Adsorbates': [keys[c] for c in adsorbates], 'Coverage': values[-1, adsorbates]})
         except Exception as e:
             st.error(f"Error processing coverage data for pH={pH}, V={V}: {e}")
             return None
@@ -105,35 +184,38 @@ def coverage_V(pH, V):
         st.error(f"coverage.dat file not found for pH={pH}, V={V}.")
         return None
 
-def plot_coverage_data(pH_list, V_list):
-    all_data = []  # Store coverage data for all pH, V combinations
-
-    # Loop over all pH and V combinations and gather the coverage data
-    for pH in pH_list:
-        for V in V_list:
-            coverage_data = coverage_V(pH, V)
-            if coverage_data is not None:
-                # Adding the pH and V values to the DataFrame
-                coverage_data['pH'] = pH
-                coverage_data['V'] = V
-                all_data.append(coverage_data)
-
-    # Concatenate all data into a single DataFrame
-    if all_data:
-        df_all_coverage = pd.concat(all_data, ignore_index=True)
-
-        # Plot coverage for each pH and V combination
-        fig, ax = plt.subplots(figsize=(10, 6))
-
-        # Plot each adsorbate's coverage as a function of pH and V
-        for adsorbate in df_all_coverage['Adsorbates'].unique():
-            subset = df_all_coverage[df_all_coverage['Adsorbates'] == adsorbate]
-            ax.plot(subset['V'], subset['Coverage'], label=adsorbate)
-
+def plot_coverage_data(pH_list, V_list, results=None, root="multiple_run"):
+    import numpy as np
+    import matplotlib.pyplot as plt
+    from sweep_results import SweepResults
+
+    # All coverages of the sweep as one (pH, V, species) array
+    if results is None:
+        results = SweepResults.collect(pH_list, V_list, lambda pH, V: point_coverage_path(root, pH, V))
+
+    adsorbates = results.adsorbates()
+    fig, ax = plt.subplots(figsize=(10, 6))
+    plotted = False
+
+    # Plot each adsorbate's coverage as a function of V, one line per pH;
+    # only the slice of each line is read from a memory-mapped store
+    for adsorbate in adsorbates:
+        coverage_lines = results.coverage_of(adsorbate)
+        for i, pH in enumerate(results.pH):
+            label = adsorbate if len(results.pH) == 1 else f"{adsorbate} (pH={pH})"
+            # Points not run at this pH (adaptive sweeps) are left out of the line
+            values = np.asarray(coverage_lines[i])
+            known = ~np.isnan(values)
+            if known.any():
+                ax.plot(results.V[known], values[known], label=label)
+                plotted = True
+
+    if plotted:
         ax.set_xlabel('Potential (V)')
         ax.set_ylabel('Coverage')
         ax.set_title('Coverage vs. Potential (V) for each Adsorbate')
         ax.legend(title='Adsorbates')
         st.pyplot(fig)
     else:
-        st.error("No coverage data available for the given pH and V combinations.")
\ No newline at end of file
+        plt.close(fig)
+        st.error("No coverage data available for the given pH and V combinations.")
@@ -0,0 +1,159 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from formula_engine import FormulaEngine, last_row
+from reaction_network import ReactionNetwork
+from mkm_writer import MkmTemplate
+
+# Sheets every MKM workbook must provide
+SHEETS = ['Reactions', 'Local Environment', 'Input-Output Species']
+
+# Number of parsed workbooks, and of compiled formula layouts, kept in memory
+CACHE_SIZE = 8
+
+_workbooks = OrderedDict()
+_compiled_columns = OrderedDict()
+_lock = threading.Lock()
+
+
+def _read_bytes(source):
+    """Returns the raw content of a path, bytes object or file-like upload."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    if hasattr(source, 'read'):
+        data = source.read()
+        source.seek(0)
+        return data
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+class MkmWorkbook:
+    """
+    In-memory model of an uploaded MKM workbook.
+
+    The file is parsed once with openpyxl. `formulas` holds the raw cell
+    contents of every sheet, and `values` the same frames with every formula
+    evaluated at the workbook's own pH and V through the formula engine.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.digest = hashlib.sha256(data).hexdigest()
+        self.workbook = load_workbook(BytesIO(data))
+        missing = [name for name in SHEETS if name not in self.workbook.sheetnames]
+        if missing:
+            raise ValueError(f"Sheet(s) not found: {', '.join(missing)}")
+        self.engine = FormulaEngine(self.workbook)
+        self.layout_key = self.engine.layout_key()
+        self._network = None
+        self._template = None
+
+        # Raw cell contents, keeping the position of every formula cell
+        raw = {}
+        formula_cells = []
+        for name in SHEETS:
+            sheet = self.workbook[name]
+            header = [cell.value for cell in sheet[1]]
+            keep = [i for i, title in enumerate(header) if title is not None]
+            rows = []
+            for row in sheet.iter_rows(min_row=2, max_row=last_row(sheet)):
+                for j, i in enumerate(keep):
+                    if isinstance(row[i].value, str) and row[i].value.startswith('='):
+                        formula_cells.append((name, row[i].coordinate, len(rows), j))
+                rows.append([row[i].value for i in keep])
+            raw[name] = ([header[i] for i in keep], rows)
+        self.formulas = {name: pd.DataFrame(rows, columns=columns) for name, (columns, rows) in raw.items()}
+
+        environment = self.formulas['Local Environment']
+        self.pH = float(environment['pH'].iloc[0])
+        self.V = float(environment['V'].iloc[0])
+        self.pressure = environment['Pressure'].iloc[0]
+
+        # Evaluate every formula cell in one pass at the workbook's own pH and V
+        evaluated = self.engine.compile([cell[:2] for cell in formula_cells])(self.pH, self.V)
+        for (name, _, row, column), value in zip(formula_cells, evaluated):
+            raw[name][1][row][column] = float(value)
+        self.values = {name: pd.DataFrame(rows, columns=columns) for name, (columns, rows) in raw.items()}
+
+    @property
+    def network(self):
+        """ReactionNetwork parsed from the Reactions column, built on first use."""
+        if self._network is None:
+            self._network = ReactionNetwork(self.reactions['Reactions'])
+        return self._network
+
+    @property
+    def template(self):
+        """MkmTemplate with the invariant part of the .mkm file, built on first use."""
+        if self._template is None:
+            self._template = MkmTemplate(self.network, self.species['Species'].tolist(), self.pressure)
+        return self._template
+
+    @property
+    def reactions(self):
+        """'Reactions' sheet with evaluated G_f/G_b values."""
+        return self.values['Reactions']
+
+    @property
+    def local_environment(self):
+        """'Local Environment' sheet."""
+        return self.values['Local Environment']
+
+    @property
+    def species(self):
+        """'Input-Output Species' sheet with evaluated concentrations."""
+        return self.values['Input-Output Species']
+
+    def compile_columns(self, columns):
+        """
+        Compiles formula columns into a vectorized function of (pH, V).
+
+        Workbooks that only differ in their pH and V cells share one compilation.
+
+        Args:
+        columns (list): (sheet, header) tuples.
+
+        Returns:
+        CompiledColumns: Evaluator returning one array per column.
+        """
+        key = (self.layout_key, tuple(columns))
+        with _lock:
+            if key in _compiled_columns:
+                _compiled_columns.move_to_end(key)
+            else:
+                _compiled_columns[key] = self.engine.compile_columns(columns)
+                while len(_compiled_columns) > CACHE_SIZE:
+                    _compiled_columns.popitem(last=False)
+            return _compiled_columns[key]
+
+
+def load_mkm_workbook(source):
+    """
+    Returns the parsed workbook for an upload, parsing it only the first time its content is seen.
+
+    Args:
+    source (str, bytes or file): Path, raw bytes or uploaded Excel file.
+
+    Returns:
+    MkmWorkbook: Shared, cached workbook model.
+    """
+    data = _read_bytes(source)
+    digest = hashlib.sha256(data).hexdigest()
+    with _lock:
+        if digest in _workbooks:
+            _workbooks.move_to_end(digest)
+            return _workbooks[digest]
+    workbook = MkmWorkbook(data)
+    with _lock:
+        _workbooks[digest] = workbook
+        while len(_workbooks) > CACHE_SIZE:
+            _workbooks.popitem(last=False)
+    return workbook